@@ -0,0 +1,90 @@
+#backend/apps/accounts/authentication.py
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.schools.models import School
+from .models import Role
+from .tokens import AUTH_VERSION_CLAIM, get_auth_version
+
+
+class ClaimsUser(TokenUser):
+    """
+    Utilisateur construit à partir des claims d'un SchoolAccessToken.
+
+    `role` et `school` sont des instances non sauvegardées (pk et nom seulement) :
+    les permissions (role.name), les filtres (school=user.school) et
+    serializer.save(school=user.school) fonctionnent sans requête. Tout autre
+    attribut (first_name, email...) charge l'utilisateur complet, une seule fois.
+    """
+    is_active = True
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        if self.token.get('role_id') is None:
+            return None
+        return Role(pk=self.token['role_id'], name=self.token.get('role'))
+
+    @property
+    def role_id(self):
+        return self.token.get('role_id')
+
+    @cached_property
+    def school(self):
+        if self.token.get('school_id') is None:
+            return None
+        return School(pk=self.token['school_id'])
+
+    @property
+    def school_id(self):
+        return self.token.get('school_id')
+
+    @cached_property
+    def db_user(self):
+        return get_user_model().objects.select_related('role', 'school').get(pk=self.id)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.db_user, attr)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication sans lecture de l'utilisateur en base : les claims du jeton
+    suffisent, l'empreinte auth_version (en cache) détecte les comptes modifiés.
+    Les jetons sans auth_version sont authentifiés comme avant, depuis la base.
+    Les écritures reçoivent l'utilisateur complet : djoser enregistre
+    request.user (PATCH /auth/users/me/) ou vérifie son mot de passe
+    (set_password), ce qu'un TokenUser ne sait pas faire.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None and isinstance(result[0], ClaimsUser) and request.method not in SAFE_METHODS:
+            user, token = result
+            return user.db_user, token
+        return result
+
+    def get_user(self, validated_token):
+        version = validated_token.get(AUTH_VERSION_CLAIM)
+        if version is None:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        if get_auth_version(user_id) != version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return ClaimsUser(validated_token)
@@ -0,0 +1,81 @@
+#backend/apps/accounts/fieldsets.py
+"""
+Sélection de champs : ?fields= et ?expand= sur les serializers de l'API accounts.
+
+    ?fields=id,email,first_name     ne rend que ces champs
+    ?expand=school                  rend l'objet lié au lieu de son nom (champs listés dans expandable_fields)
+
+Seuls les champs de premier niveau se choisissent : pas de sélection dans les
+objets imbriqués ni de relations multiples. Sur list, SparseFieldsetViewMixin
+répercute la sélection sur le queryset : only() des colonnes rendues,
+select_related() des seules clés étrangères rendues en objet. Les écritures
+valident et rendent tous les champs.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def requested_names(request, param):
+    """Noms listés par ?<param>= (vide pour une écriture ou sans requête)."""
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+    return {name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Mixin de ModelSerializer qui ne rend que les champs choisis par ?fields= et ?expand=."""
+    # Nom du champ -> serializer de l'objet lié quand il est déplié
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.parent is not None and not isinstance(self.parent, serializers.ListSerializer):
+            return fields # Objet imbriqué : la sélection vise le serializer de la vue
+
+        request = self.context.get('request')
+        expand, only = requested_names(request, 'expand'), requested_names(request, 'fields')
+        unknown = expand - set(self.expandable_fields)
+        if unknown:
+            raise serializers.ValidationError({'expand': 'Cannot expand %s.' % ', '.join(sorted(unknown))})
+        for name in expand:
+            source = fields[name].source
+            fields[name] = self.expandable_fields[name](read_only=True, **({'source': source} if source else {}))
+
+        if not only:
+            return fields
+        unknown = only - set(fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': 'Unknown field(s): %s.' % ', '.join(sorted(unknown))})
+        return {name: field for name, field in fields.items() if name in only or name in expand}
+
+    def project(self, queryset):
+        """Le queryset ne chargeant que ce que rendent self.fields ; inchangé si un champ n'est pas une colonne."""
+        opts = self.Meta.model._meta
+        only, select_related = [opts.pk.name], []
+        for field in self.fields.values():
+            if field.write_only:
+                continue
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                return queryset
+            if model_field.many_to_many or model_field.one_to_many:
+                return queryset
+            only.append(field.source)
+            if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                select_related.append(field.source) # Rendu depuis l'objet lié (serializer imbriqué, __str__)
+        return queryset.only(*only).select_related(*select_related)
+
+
+class SparseFieldsetViewMixin:
+    """Mixin de GenericAPIView qui répercute la sélection ?fields=/?expand= sur le queryset de list."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if getattr(self, 'action', None) != 'list' or not issubclass(serializer_class, SparseFieldsetMixin):
+            return queryset
+        # Les jointures de get_queryset() sont remplacées par celles de la sélection ;
+        # retrieve les garde toutes pour les permissions objet
+        return serializer_class(context=self.get_serializer_context()).project(queryset.select_related(None))
@@ -4,14 +4,23 @@ from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from .models import User, Role
 from apps.schools.models import School
+from .fieldsets import SparseFieldsetMixin
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class SchoolSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = School
+        fields = '__all__'
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    expandable_fields = {'school': SchoolSerializer}
+
     role = RoleSerializer(read_only=True)
     role_id = serializers.PrimaryKeyRelatedField(queryset=Role.objects.all(), source='role', write_only=True)
 
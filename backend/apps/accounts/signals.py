@@ -0,0 +1,17 @@
+#backend/apps/accounts/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Role, User
+from .tokens import invalidate_auth_versions
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_auth_versions([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Role)
+def role_changed(sender, instance, **kwargs):
+    # Le nom du rôle fait partie des claims de tous ses utilisateurs
+    invalidate_auth_versions(User.objects.filter(role_id=instance.pk).values_list('pk', flat=True))
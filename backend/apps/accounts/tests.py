@@ -1,3 +1,144 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.schools.models import School
+from .models import Role, User
+from .tokens import SchoolAccessToken
+
+
+class JWTAuthenticationTests(TestCase):
+    """Jetons de /auth/jwt/create/ : révocation par auth_version, endpoints djoser de l'utilisateur courant."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name='École A', address='Abidjan', phone='0102030405')
+        cls.role = Role.objects.create(name='Directeur')
+        cls.user = User.objects.create_user('directeur@siges.ci', 'motdepasse', first_name='Awa', last_name='Koné', role=cls.role, school=cls.school)
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password='motdepasse'):
+        response = self.client.post('/auth/jwt/create/', {'email': self.user.email, 'password': password})
+        self.assertEqual(response.status_code, 200, response.content)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer %s' % response.json()['access'])
+        return client
+
+    def assertRevoked(self, client):
+        response = client.get('/auth/users/me/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token has been revoked.')
+
+    def test_me(self):
+        client = self.login()
+        self.assertEqual(client.get('/auth/users/me/').json()['email'], self.user.email)
+        response = client.patch('/auth/users/me/', {'first_name': 'Aminata'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['first_name'], 'Aminata')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Aminata')
+        # Le prénom ne fait pas partie de l'empreinte : le jeton reste valide
+        self.assertEqual(client.get('/auth/users/me/').json()['first_name'], 'Aminata')
+
+    def test_set_password(self):
+        client = self.login()
+        response = client.post('/auth/users/set_password/', {'current_password': 'faux', 'new_password': 'n0uveau-Secret'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/auth/users/set_password/', {'current_password': 'motdepasse', 'new_password': 'n0uveau-Secret'}, format='json')
+        self.assertEqual(response.status_code, 204, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('n0uveau-Secret'))
+        self.assertRevoked(client)
+        self.assertEqual(self.login('n0uveau-Secret').get('/auth/users/me/').status_code, 200)
+
+    def test_role_change_revokes_tokens(self):
+        client = self.login()
+        self.user.role = Role.objects.create(name='Enseignant')
+        self.user.save()
+        self.assertRevoked(client)
+
+    def test_role_rename_revokes_tokens(self):
+        client = self.login()
+        self.role.name = 'Directrice'
+        self.role.save()
+        self.assertRevoked(client)
+
+    def test_deactivation_revokes_tokens(self):
+        client = self.login()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRevoked(client)
+
+
+class UserFieldsetTests(TestCase):
+    """?fields= et ?expand= sur /api/accounts/users/ (voir fieldsets.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name='École A', address='Abidjan', phone='0102030405')
+        cls.admin = User.objects.create_user('admin@siges.ci', 'motdepasse', role=Role.objects.create(name='Super Admin'))
+        cls.user = User.objects.create_user('prof@siges.ci', 'motdepasse', role=Role.objects.create(name='Enseignant'), school=cls.school)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % SchoolAccessToken.for_user(self.admin))
+
+    def list(self, **params):
+        """Réponse de la liste et requête SQL qui a lu les utilisateurs."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/accounts/users/', params)
+        users = [query['sql'] for query in queries if 'FROM "accounts_user"' in query['sql'] and 'password' not in query['sql']]
+        return response, users[-1] if users else None
+
+    def row(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return next(row for row in response.json() if row['id'] == self.user.pk)
+
+    def test_all_fields(self):
+        response, sql = self.list()
+        row = self.row(response)
+        self.assertEqual(set(row), {'id', 'email', 'first_name', 'last_name', 'role', 'school', 'is_active'})
+        self.assertEqual((row['role']['name'], row['school']), ('Enseignant', 'École A'))
+        self.assertIn('"accounts_role"', sql)
+        self.assertIn('"schools_school"', sql)
+
+    def test_fields(self):
+        response, sql = self.list(fields='id,email')
+        self.assertEqual(self.row(response), {'id': self.user.pk, 'email': 'prof@siges.ci'})
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"first_name"', sql)
+
+        # Seules les clés étrangères rendues sont jointes
+        response, sql = self.list(fields='id,role')
+        self.assertEqual(self.row(response)['role']['name'], 'Enseignant')
+        self.assertIn('"accounts_role"', sql)
+        self.assertNotIn('"schools_school"', sql)
+        response, sql = self.list(fields='id,school')
+        self.assertEqual(self.row(response), {'id': self.user.pk, 'school': 'École A'})
+        self.assertNotIn('"accounts_role"', sql)
+
+    def test_expand(self):
+        response, sql = self.list(fields='id,email', expand='school')
+        row = self.row(response)
+        self.assertEqual(set(row), {'id', 'email', 'school'})
+        self.assertEqual(row['school'], {'id': self.school.pk, 'name': 'École A', 'address': 'Abidjan', 'phone': '0102030405', 'is_active': True})
+        self.assertIn('"schools_school"', sql)
+        self.assertNotIn('"accounts_role"', sql)
+        response = self.client.get('/api/accounts/users/%d/' % self.user.pk, {'expand': 'school'})
+        self.assertEqual(response.json()['school']['name'], 'École A')
+
+    def test_invalid_selection(self):
+        response = self.client.get('/api/accounts/users/', {'fields': 'id,password'})
+        self.assertEqual((response.status_code, response.json()), (400, {'fields': 'Unknown field(s): password.'}))
+        response = self.client.get('/api/accounts/users/', {'expand': 'role'})
+        self.assertEqual((response.status_code, response.json()), (400, {'expand': 'Cannot expand role.'}))
+
+    def test_writes_ignore_selection(self):
+        response = self.client.patch('/api/accounts/users/%d/?fields=id' % self.user.pk, {'first_name': 'Awa'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['first_name'], response.json()['school']), ('Awa', 'École A'))
@@ -0,0 +1,94 @@
+#backend/apps/accounts/tokens.py
+"""
+Jetons JWT portant les claims nécessaires aux permissions (rôle, établissement)
+et une empreinte `auth_version` de l'état du compte (actif, rôle, établissement,
+mot de passe). StatelessJWTAuthentication compare cette empreinte à celle
+gardée en cache : désactiver un compte ou changer son rôle révoque ses jetons.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+AUTH_VERSION_CLAIM = 'auth_version'
+
+
+def compute_auth_version(is_active, role_id, role_name, school_id, password):
+    fingerprint = '%s:%s:%s:%s:%s' % (is_active, role_id, role_name, school_id, password)
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def auth_version_key(user_id):
+    return 'accounts-auth:%s' % user_id
+
+
+def get_auth_version(user_id):
+    """Empreinte actuelle de l'utilisateur (None s'il est inactif ou supprimé), une requête si absente du cache."""
+    key = auth_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        row = get_user_model().objects.filter(pk=user_id).values(
+            'is_active', 'role_id', 'role__name', 'school_id', 'password'
+        ).first()
+        if row is None or not row['is_active']:
+            version = ''
+        else:
+            version = compute_auth_version(True, row['role_id'], row['role__name'], row['school_id'], row['password'])
+        cache.set(key, version, getattr(settings, 'AUTH_VERSION_CACHE_TIMEOUT', 300))
+    return version or None
+
+
+def invalidate_auth_versions(user_ids):
+    cache.delete_many([auth_version_key(user_id) for user_id in user_ids])
+
+
+def add_user_claims(token, user):
+    role_name = user.role.name if user.role_id else None
+    token['role_id'] = user.role_id
+    token['role'] = role_name
+    token['school_id'] = user.school_id
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[AUTH_VERSION_CLAIM] = compute_auth_version(user.is_active, user.role_id, role_name, user.school_id, user.password)
+    return token
+
+
+class SchoolAccessToken(AccessToken):
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+class SchoolRefreshToken(RefreshToken):
+    access_token_class = SchoolAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+class SchoolTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = SchoolRefreshToken
+
+
+class SchoolTokenRefreshSerializer(TokenRefreshSerializer):
+    """Le nouveau jeton d'accès reprend l'état actuel du compte, pas les claims du jeton de rafraîchissement."""
+    token_class = SchoolRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model().objects.select_related('role').filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(SchoolAccessToken.for_user(user))}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            data['refresh'] = str(self.token_class.for_user(user))
+        return data
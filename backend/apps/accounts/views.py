@@ -3,6 +3,7 @@ from rest_framework import viewsets, permissions
 from .models import User, Role
 from .serializers import UserSerializer, RoleSerializer
 from .permissions import IsSuperAdmin, IsSameSchoolOrSuperAdmin
+from .fieldsets import SparseFieldsetViewMixin
 
 
 class RoleViewSet(viewsets.ModelViewSet):
@@ -11,15 +12,18 @@ class RoleViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsSuperAdmin]
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsSameSchoolOrSuperAdmin]
 
     def get_queryset(self):
         user = self.request.user
+        # role and school are rendered for every row (RoleSerializer, StringRelatedField);
+        # list keeps only the joins of the ?fields= requested (see fieldsets.py)
+        queryset = User.objects.select_related('role', 'school')
         if user.role and user.role.name == "Super Admin":
-            return User.objects.all()
-        return User.objects.filter(school=user.school)
+            return queryset.all()
+        return queryset.filter(school=user.school)
 
     def perform_create(self, serializer):
         user = self.request.user
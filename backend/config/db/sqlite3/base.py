@@ -0,0 +1,31 @@
+"""
+Backend SQLite pour plusieurs workers gunicorn : WAL, synchronous=NORMAL, mmap,
+cache mémoire, busy_timeout, et transactions BEGIN IMMEDIATE par défaut pour
+que les écritures concurrentes attendent le verrou au lieu d'échouer avec
+"database is locked". Pragmas surchargeables via OPTIONS['pragmas'].
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024, # En Kio : 64 Mio
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000, # Millisecondes
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        if 'transaction_mode' not in self.settings_dict['OPTIONS']:
+            self.transaction_mode = 'IMMEDIATE'
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute('PRAGMA %s = %s' % (name, value))
+        return conn
@@ -0,0 +1,48 @@
+import tempfile
+from pathlib import Path
+
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from .base import DatabaseWrapper
+
+
+class DatabaseWrapperTests(SimpleTestCase):
+    """Pragmas et BEGIN IMMEDIATE d'une nouvelle connexion, sur un fichier (une base en mémoire n'a pas de WAL)."""
+    alias = 'sqlite3_backend_test'
+
+    def connect(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': str(Path(directory.name) / 'db.sqlite3'), 'OPTIONS': options}, self.alias,
+        )
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA %s' % name)
+            return cursor.fetchone()[0]
+
+    def test_new_connection(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1) # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2) # MEMORY
+
+        connections[self.alias] = wrapper
+        self.addCleanup(connections.__delitem__, self.alias)
+        with CaptureQueriesContext(wrapper) as queries, transaction.atomic(using=self.alias):
+            self.assertTrue(wrapper.connection.in_transaction)
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_options(self):
+        wrapper = self.connect(pragmas={'busy_timeout': 100, 'synchronous': 'FULL'}, transaction_mode='DEFERRED')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 100)
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2) # FULL
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
@@ -65,8 +65,10 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'config.db.sqlite3', # sqlite3 + WAL, mmap, BEGIN IMMEDIATE (voir config/db/sqlite3/base.py)
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -92,7 +94,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.StatelessJWTAuthentication', # request.user construit depuis les claims du jeton
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -105,8 +107,15 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Jetons portant rôle, établissement et auth_version (voir apps/accounts/tokens.py)
+    'AUTH_TOKEN_CLASSES': ('apps.accounts.tokens.SchoolAccessToken',),
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.accounts.tokens.SchoolTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.tokens.SchoolTokenRefreshSerializer',
 }
 
+# Durée de cache de l'empreinte auth_version d'un utilisateur
+AUTH_VERSION_CACHE_TIMEOUT = 300
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'USER_CREATE_PASSWORD_RETYPE': True,
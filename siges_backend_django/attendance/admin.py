@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import AttendanceSheet
+
+@admin.register(AttendanceSheet)
+class AttendanceSheetAdmin(admin.ModelAdmin):
+    list_display = ('school_class', 'date', 'session', 'taken_by', 'updated_at')
+    list_filter = ('session', 'date')
+    list_select_related = ('school_class', 'taken_by')
+    exclude = ('expected', 'absent')
+
+    def has_add_permission(self, request):
+        return False # Taken through /api/attendance/classes/<id>/ (see attendance/rolls.py)
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,30 @@
+"""
+Packed attendance bitmaps: bit n of a sheet's bytes (least significant bit
+first) is roster position n of its class. A class of 40 students takes 5
+bytes per bitmap, and a month of sheets unpacks into a NumPy matrix in one
+call instead of being read back row by row.
+"""
+import numpy as np
+
+
+def pack(positions, size):
+    """The bytes of a bitmap of `size` bits with these positions set."""
+    bits = np.zeros(size, dtype=bool)
+    bits[list(positions)] = True
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def unpack(data, size):
+    """Bool array of the first `size` bits of a bitmap (missing trailing bytes read as unset)."""
+    return unpack_rows([data], size)[0].astype(bool)
+
+
+def unpack_rows(blobs, size):
+    """Matrix of the first `size` bits of each bitmap: one uint8 row (0 or 1) per bitmap."""
+    width = (size + 7) // 8
+    if not blobs or not width:
+        return np.zeros((len(blobs), size), dtype=np.uint8)
+    # Bitmaps taken before the roster grew are shorter: pad them with unset bits
+    buffer = b''.join(bytes(blob)[:width].ljust(width, b'\0') for blob in blobs)
+    matrix = np.frombuffer(buffer, dtype=np.uint8).reshape(len(blobs), width)
+    return np.unpackbits(matrix, axis=1, count=size, bitorder='little')
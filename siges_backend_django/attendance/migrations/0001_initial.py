@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('schools', '0006_level_updated_at_school_updated_at_and_more'),
+        ('students', '0005_student_updated_at_student_student_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('session', models.CharField(choices=[('AM', 'Matin'), ('PM', 'Après-midi')], max_length=2)),
+                ('expected', models.BinaryField()),
+                ('absent', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school_class', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.schoolclass')),
+                ('taken_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school_class', 'date', 'session'), name='attendance_sheet_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RosterSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('school_class', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.schoolclass')),
+                ('student', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='students.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school_class', 'position'), name='roster_slot_position_unique'), models.UniqueConstraint(fields=('school_class', 'student'), name='roster_slot_student_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+
+from schools.models import SchoolClass
+from students.models import Student
+
+
+class RosterSlot(models.Model):
+    """
+    The bit of a student in the attendance bitmaps of a class. Positions are
+    handed out in order as students first appear on a roll of the class and
+    are never reused: the sheets taken before a student left the class (or
+    was deleted, leaving the slot without a student) keep reading right.
+    """
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE, related_name='+', db_index=False)
+    position = models.PositiveIntegerField()
+    student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['school_class', 'position'], name='roster_slot_position_unique'),
+            models.UniqueConstraint(fields=['school_class', 'student'], name='roster_slot_student_unique'),
+        ]
+
+    def __str__(self):
+        return '%s #%d: %s' % (self.school_class_id, self.position, self.student_id)
+
+
+class AttendanceSheet(models.Model):
+    """
+    One roll call of a class: a session (morning or afternoon) of a day, with
+    one bit per roster position (see attendance/bitmaps.py) instead of one
+    row per student. Written by attendance/rolls.py.
+    """
+    MORNING = 'AM'
+    AFTERNOON = 'PM'
+    SESSION_CHOICES = [
+        (MORNING, 'Matin'),
+        (AFTERNOON, 'Après-midi'),
+    ]
+
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE, related_name='+', db_index=False)
+    date = models.DateField()
+    session = models.CharField(max_length=2, choices=SESSION_CHOICES)
+    expected = models.BinaryField() # Bit n set: the student of roster position n was on the roll
+    absent = models.BinaryField() # Bit n set: ... and was absent
+    taken_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the index of the class and report reads (class, date range)
+            models.UniqueConstraint(fields=['school_class', 'date', 'session'], name='attendance_sheet_unique'),
+        ]
+
+    def __str__(self):
+        return '%s %s %s' % (self.school_class_id, self.date, self.session)
@@ -0,0 +1,14 @@
+from rest_framework import permissions
+from schools.access import get_access_context
+
+class CanTakeAttendance(permissions.BasePermission): # For SchoolClass objects
+    message = "You can only take the attendance of your classes or of classes in your school(s)."
+
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated and hasattr(request.user, 'role')):
+            return False
+        # Narrowed to the user's classes by has_object_permission
+        return request.user.role in ('super_admin_group', 'director', 'teacher')
+
+    def has_object_permission(self, request, view, obj): # obj is a SchoolClass instance
+        return get_access_context(request).can_take_attendance(obj)
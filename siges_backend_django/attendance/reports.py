@@ -0,0 +1,128 @@
+"""
+Monthly absence rates (GET /api/attendance/report/), computed from the
+bitmaps: the sheets of a batch of classes are read with one query, unpacked
+into one bit matrix per bitmap kind, and summed per class with
+np.add.reduceat; the per-student figures are those sums read at each
+student's roster positions. Python never loops over students x sessions.
+"""
+import numpy as np
+
+from schools.models import SchoolClass
+from sharding.shards import each_shard, shards_for_classes
+from .bitmaps import unpack_rows
+from .models import AttendanceSheet, RosterSlot
+
+# ?group_by= values: the columns identifying each row
+GROUPS = {
+    'student': ['student_id', 'first_name', 'last_name'],
+    'class': ['school_class_id', 'school_class__name'],
+    'school': ['school_id', 'school__name'],
+}
+CLASS_BATCH = 500
+
+
+def class_totals(class_ids, start, end):
+    """
+    ({class_id: (sheets, student-sessions, absences)}, {student_id: [sessions, absences, first_name, last_name]})
+    over the sheets of these classes dated from start to end.
+    """
+    sheets = list(
+        AttendanceSheet.objects.filter(school_class_id__in=class_ids, date__gte=start, date__lte=end)
+        .order_by('school_class_id').values_list('school_class_id', 'expected', 'absent')
+    )
+    if not sheets:
+        return {}, {}
+    slots = list(RosterSlot.objects.filter(school_class_id__in=class_ids, student__isnull=False).values_list(
+        'school_class_id', 'position', 'student_id', 'student__first_name', 'student__last_name'
+    ))
+    size = 8 * max(max(len(expected), len(absent)) for _, expected, absent in sheets)
+    classes, starts = np.unique(np.array([row[0] for row in sheets]), return_index=True)
+    # (classes x positions): how many sheets of the class had the position on the roll, and absent
+    expected = np.add.reduceat(unpack_rows([row[1] for row in sheets], size), starts, axis=0, dtype=np.int64)
+    absent = np.add.reduceat(unpack_rows([row[2] for row in sheets], size), starts, axis=0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(sheets)))
+    per_class = {
+        class_id: (sheet_count, sessions, absences) for class_id, sheet_count, sessions, absences in zip(
+            classes.tolist(), counts.tolist(), expected.sum(axis=1).tolist(), absent.sum(axis=1).tolist()
+        )
+    }
+
+    per_student = {}
+    if slots:
+        slot_classes = np.array([row[0] for row in slots])
+        positions = np.array([row[1] for row in slots])
+        rows = np.searchsorted(classes, slot_classes)
+        # Slots of classes without sheets this month, or added after the last one
+        kept = (rows < len(classes)) & (classes[np.minimum(rows, len(classes) - 1)] == slot_classes) & (positions < size)
+        sessions = expected[rows[kept], positions[kept]].tolist()
+        absences = absent[rows[kept], positions[kept]].tolist()
+        for (_, _, student_id, first_name, last_name), student_sessions, student_absences in zip(
+            (row for row, keep in zip(slots, kept.tolist()) if keep), sessions, absences
+        ):
+            # Students who changed class during the month add up
+            totals = per_student.setdefault(student_id, [0, 0, first_name, last_name])
+            totals[0] += student_sessions
+            totals[1] += student_absences
+    return per_class, per_student
+
+
+def rate(sessions, absences):
+    return round(absences / sessions, 4) if sessions else None
+
+
+def absence_report(classes, start, end, group_by):
+    """
+    The absence rates of these classes ({class_id: (name, school_id, school name)})
+    from start to end, one row per student, class or school.
+    """
+    per_class, per_student = {}, {}
+    by_shard = shards_for_classes(classes)
+    for alias in each_shard(sorted(set(by_shard.values())) if by_shard else None):
+        class_ids = sorted(class_id for class_id in classes if by_shard.get(class_id) == alias)
+        for index in range(0, len(class_ids), CLASS_BATCH):
+            batch_classes, batch_students = class_totals(class_ids[index:index + CLASS_BATCH], start, end)
+            per_class.update(batch_classes)
+            for student_id, (sessions, absences, first_name, last_name) in batch_students.items():
+                totals = per_student.setdefault(student_id, [0, 0, first_name, last_name])
+                totals[0] += sessions
+                totals[1] += absences
+
+    if group_by == 'student':
+        results = [
+            {'student_id': student_id, 'first_name': first_name, 'last_name': last_name,
+             'sessions': sessions, 'absences': absences, 'absence_rate': rate(sessions, absences)}
+            for student_id, (sessions, absences, first_name, last_name) in sorted(
+                per_student.items(), key=lambda item: (item[1][3], item[1][2], item[0])
+            )
+        ]
+    elif group_by == 'class':
+        results = [
+            {'school_class_id': class_id, 'school_class__name': classes[class_id][0], 'roll_calls': sheets,
+             'sessions': sessions, 'absences': absences, 'absence_rate': rate(sessions, absences)}
+            for class_id, (sheets, sessions, absences) in sorted(per_class.items())
+        ]
+    else:
+        schools = {}
+        for class_id, (sheets, sessions, absences) in per_class.items():
+            _, school_id, school_name = classes[class_id]
+            totals = schools.setdefault(school_id, [school_name, 0, 0, 0])
+            totals[1] += sheets
+            totals[2] += sessions
+            totals[3] += absences
+        results = [
+            {'school_id': school_id, 'school__name': name, 'roll_calls': sheets,
+             'sessions': sessions, 'absences': absences, 'absence_rate': rate(sessions, absences)}
+            for school_id, (name, sheets, sessions, absences) in sorted(schools.items())
+        ]
+    sessions = sum(totals[1] for totals in per_class.values())
+    absences = sum(totals[2] for totals in per_class.values())
+    return {'sessions': sessions, 'absences': absences, 'absence_rate': rate(sessions, absences), 'results': results}
+
+
+def visible_classes(school_ids, filters):
+    """{class_id: (name, school_id, school name)} of the classes matching the filters, within school_ids unless None."""
+    classes = SchoolClass.objects.filter(**filters)
+    if school_ids is not None:
+        classes = classes.filter(level__school_id__in=school_ids)
+    rows = classes.values_list('pk', 'name', 'level__school_id', 'level__school__name')
+    return {pk: (name, school_id, school_name) for pk, name, school_id, school_name in rows}
@@ -0,0 +1,109 @@
+"""
+Roll calls of a class (GET/POST /api/attendance/classes/<id>/).
+
+POST marks the whole class at once: its active students are on the roll,
+present unless listed as absent, and the sheet of that session is written
+with one upsert, whatever the size of the class. Taking the roll of a
+session again replaces the sheet.
+"""
+from django.db import IntegrityError, router, transaction
+from rest_framework import serializers
+
+from students.models import Student
+from .bitmaps import pack, unpack
+from .models import AttendanceSheet, RosterSlot
+
+
+def roster(class_id):
+    """{position: (student_id, first_name, last_name)} of a class's slots (student None once deleted)."""
+    rows = RosterSlot.objects.filter(school_class_id=class_id).values_list(
+        'position', 'student_id', 'student__first_name', 'student__last_name'
+    )
+    return {position: (student_id, first_name, last_name) for position, student_id, first_name, last_name in rows}
+
+
+def enrol(class_id, slots, students):
+    """
+    Gives the students ({student_id: (first_name, last_name)}) without a slot
+    in the class the next positions; returns the slots with theirs added.
+    """
+    slotted = {row[0] for row in slots.values()}
+    new = sorted(set(students) - slotted)
+    if not new:
+        return slots
+    start = max(slots, default=-1) + 1
+    try:
+        with transaction.atomic(using=router.db_for_write(RosterSlot)):
+            RosterSlot.objects.bulk_create([
+                RosterSlot(school_class_id=class_id, position=start + index, student_id=student_id)
+                for index, student_id in enumerate(new)
+            ])
+    except IntegrityError:
+        # A concurrent roll call of the class took these positions: read them back
+        return enrol(class_id, roster(class_id), students)
+    return {**slots, **{start + index: (student_id, *students[student_id]) for index, student_id in enumerate(new)}}
+
+
+def take_roll(school_class, date, session, absent_ids, user):
+    """
+    Writes the sheet of a session: the class's active students, present
+    unless in absent_ids. Returns the sheet and the class's slots.
+    """
+    students = {
+        pk: (first_name, last_name) for pk, first_name, last_name in Student.objects.filter(
+            school_class_id=school_class.pk, status='ACTIVE'
+        ).values_list('pk', 'first_name', 'last_name')
+    }
+    unknown = set(absent_ids) - set(students)
+    if unknown:
+        raise serializers.ValidationError({'absent': [
+            'Not active students of this class: %s.' % ', '.join(map(str, sorted(unknown)))
+        ]})
+    # No transaction around both writes: slots are never reused, so slots
+    # given out for a sheet that then fails to be written stay valid
+    slots = enrol(school_class.pk, roster(school_class.pk), students)
+    positions = {row[0]: position for position, row in slots.items() if row[0] is not None}
+    size = max(slots, default=-1) + 1
+    sheet = AttendanceSheet(
+        school_class_id=school_class.pk, date=date, session=session, taken_by_id=user.pk, # A ClaimsUser, not a CustomUser
+        expected=pack([positions[pk] for pk in students], size), absent=pack([positions[pk] for pk in absent_ids], size),
+    )
+    AttendanceSheet.objects.bulk_create(
+        [sheet], update_conflicts=True, unique_fields=['school_class', 'date', 'session'],
+        update_fields=['expected', 'absent', 'taken_by', 'updated_at'],
+    )
+    return sheet, slots
+
+
+def sheet_data(sheet, slots):
+    """The roll of a sheet, with the students it lists in name order."""
+    size = max(slots, default=-1) + 1
+    expected, absent = unpack(sheet.expected, size), unpack(sheet.absent, size)
+    students = sorted((
+        {
+            'student_id': slots[position][0],
+            'first_name': slots[position][1],
+            'last_name': slots[position][2],
+            'absent': bool(absent[position]),
+        }
+        for position in expected.nonzero()[0].tolist() if slots[position][0] is not None
+    ), key=lambda row: (row['last_name'], row['first_name'], row['student_id']))
+    return {
+        'school_class': sheet.school_class_id,
+        'date': sheet.date,
+        'session': sheet.session,
+        'taken_by': sheet.taken_by_id,
+        'present': sum(1 for row in students if not row['absent']),
+        'absent': sum(1 for row in students if row['absent']),
+        'students': students,
+    }
+
+
+def class_sheets(class_id, date, session=None):
+    """The roll calls of a class on a day (of one session when given)."""
+    sheets = AttendanceSheet.objects.filter(school_class_id=class_id, date=date).order_by('session')
+    if session:
+        sheets = sheets.filter(session=session)
+    sheets = list(sheets)
+    slots = roster(class_id) if sheets else {}
+    return [sheet_data(sheet, slots) for sheet in sheets]
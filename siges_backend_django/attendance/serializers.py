@@ -0,0 +1,48 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import AttendanceSheet
+from .reports import GROUPS
+
+
+class RollCallSerializer(serializers.Serializer):
+    """Input of POST /api/attendance/classes/<id>/ (see attendance/rolls.py)."""
+    date = serializers.DateField()
+    session = serializers.ChoiceField(choices=AttendanceSheet.SESSION_CHOICES)
+    absent = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list, max_length=1000)
+
+    def validate_date(self, value):
+        if value > timezone.localdate():
+            raise serializers.ValidationError('The roll cannot be taken for a future date.')
+        return value
+
+
+class ClassSheetsSerializer(serializers.Serializer):
+    """Query parameters of GET /api/attendance/classes/<id>/."""
+    date = serializers.DateField(required=False)
+    session = serializers.ChoiceField(choices=AttendanceSheet.SESSION_CHOICES, required=False)
+
+    def validate(self, data):
+        data.setdefault('date', timezone.localdate())
+        return data
+
+
+class AbsenceReportSerializer(serializers.Serializer):
+    """Query parameters of GET /api/attendance/report/ (see attendance/reports.py)."""
+    month = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', required=False, error_messages={'invalid': 'Expected YYYY-MM.'})
+    group_by = serializers.ChoiceField(choices=list(GROUPS), default='class')
+    school_id = serializers.IntegerField(min_value=1, required=False)
+    level_id = serializers.IntegerField(min_value=1, required=False)
+    class_id = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_month(self, value):
+        year, month = map(int, value.split('-'))
+        return datetime.date(year, month, 1)
+
+    def validate(self, data):
+        start = data.get('month') or timezone.localdate().replace(day=1)
+        data['month'] = start
+        data['end'] = (start + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+        return data
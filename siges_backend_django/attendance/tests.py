@@ -0,0 +1,155 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from schools.models import Level, School, SchoolClass
+from siges_backend_django.query_budget import query_budget
+from siges_backend_django.testing import jwt_client
+from students.models import Student
+from users.models import CustomUser
+from .bitmaps import pack, unpack
+from .models import AttendanceSheet, RosterSlot
+
+DAY = datetime.date(2024, 10, 7)
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class AttendanceTests(TestCase):
+    """Roll calls of a class as bitmaps (see attendance/rolls.py), and the monthly absence report (attendance/reports.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.teacher = CustomUser.objects.create_user(username='teacher', email='teacher@siges.ci', password='pass', role='teacher')
+        cls.other_teacher = CustomUser.objects.create_user(username='teacher2', email='teacher2@siges.ci', password='pass', role='teacher')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.classes, cls.students = [], []
+        for name, director in (('School', cls.director), ('Other', None)):
+            level = Level.objects.create(name='CP1', school=School.objects.create(name=name, address='Abidjan', director=director))
+            for class_name in ('CP1 A', 'CP1 B'):
+                school_class = SchoolClass.objects.create(name=class_name, level=level, academic_year='2024-2025')
+                cls.classes.append(school_class)
+                cls.students.append([
+                    Student.objects.create(
+                        first_name='Élève %d' % index, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1),
+                        gender='FEMALE', school_class=school_class,
+                    ) for index in range(4)
+                ])
+        cls.classes[0].teacher = cls.teacher
+        cls.classes[0].save()
+
+    def setUp(self):
+        cache.clear()
+
+    def url(self, school_class):
+        return '/api/attendance/classes/%d/' % school_class.pk
+
+    def roll(self, client, school_class, absent=(), date=DAY, session='AM'):
+        return client.post(self.url(school_class), {'date': date.isoformat(), 'session': session, 'absent': list(absent)}, format='json')
+
+    def test_bitmaps(self):
+        self.assertEqual(pack([0, 3, 9], 10), bytes([0b1001, 0b10]))
+        self.assertEqual(unpack(pack([0, 3, 9], 10), 10).nonzero()[0].tolist(), [0, 3, 9])
+        self.assertEqual(pack([], 0), b'')
+
+    def test_take_roll(self):
+        students = self.students[0]
+        response = self.roll(jwt_client(self.teacher), self.classes[0], absent=[students[1].pk])
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual((data['present'], data['absent'], data['taken_by']), (3, 1, self.teacher.pk))
+        self.assertEqual([row['student_id'] for row in data['students'] if row['absent']], [students[1].pk])
+        self.assertEqual(RosterSlot.objects.filter(school_class=self.classes[0]).count(), 4)
+
+        # Taking the roll of the session again replaces its sheet
+        client = jwt_client(self.director)
+        self.assertEqual(self.roll(client, self.classes[0], absent=[students[2].pk, students[3].pk]).json()['absent'], 2)
+        self.roll(client, self.classes[0], session='PM')
+        self.assertEqual(AttendanceSheet.objects.filter(school_class=self.classes[0]).count(), 2)
+        sheets = client.get(self.url(self.classes[0]), {'date': DAY.isoformat()}).json()
+        self.assertEqual([(sheet['session'], sheet['absent'], sheet['taken_by']) for sheet in sheets], [('AM', 2, self.director.pk), ('PM', 0, self.director.pk)])
+        self.assertEqual(len(client.get(self.url(self.classes[0]), {'date': DAY.isoformat(), 'session': 'PM'}).json()), 1)
+
+    def test_invalid_rolls(self):
+        client = jwt_client(self.director)
+        response = self.roll(client, self.classes[0], absent=[self.students[1][0].pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('absent', response.json())
+        self.assertEqual(self.roll(client, self.classes[0], date=datetime.date.today() + datetime.timedelta(days=1)).status_code, 400)
+        self.assertEqual(self.roll(client, self.classes[0], session='XX').status_code, 400)
+        self.assertFalse(AttendanceSheet.objects.exists())
+
+    def test_permissions(self):
+        self.assertEqual(self.roll(jwt_client(self.teacher), self.classes[1]).status_code, 403)
+        self.assertEqual(self.roll(jwt_client(self.other_teacher), self.classes[0]).status_code, 403)
+        self.assertEqual(self.roll(jwt_client(self.director), self.classes[2]).status_code, 403)
+        self.assertEqual(self.roll(jwt_client(self.parent), self.classes[0]).status_code, 403)
+        self.assertEqual(self.roll(jwt_client(self.admin), self.classes[2]).status_code, 200)
+        self.assertEqual(jwt_client(self.teacher).get('/api/attendance/report/').status_code, 403)
+        self.assertEqual(self.client.get(self.url(self.classes[0])).status_code, 401)
+
+    def test_roster_positions_are_kept(self):
+        client = jwt_client(self.director)
+        leaving, staying = self.students[0][0], self.students[0][1]
+        self.roll(client, self.classes[0], absent=[leaving.pk])
+        leaving.school_class = self.classes[1]
+        leaving.save()
+        newcomer = Student.objects.create(
+            first_name='Nouvelle', last_name='Bamba', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=self.classes[0],
+        )
+        data = self.roll(client, self.classes[0], absent=[newcomer.pk], session='PM').json()
+        self.assertEqual(([row['student_id'] for row in data['students'] if row['absent']], data['present']), ([newcomer.pk], 3))
+        positions = dict(RosterSlot.objects.filter(school_class=self.classes[0]).values_list('student_id', 'position'))
+        self.assertEqual(positions[newcomer.pk], 4)
+
+        # The morning sheet still reads right, the student who left included
+        morning = client.get(self.url(self.classes[0]), {'date': DAY.isoformat(), 'session': 'AM'}).json()[0]
+        self.assertEqual([row['student_id'] for row in morning['students'] if row['absent']], [leaving.pk])
+        self.assertIn(staying.pk, [row['student_id'] for row in morning['students']])
+        leaving.delete()
+        morning = client.get(self.url(self.classes[0]), {'date': DAY.isoformat(), 'session': 'AM'}).json()[0]
+        self.assertEqual((len(morning['students']), morning['absent']), (3, 0))
+
+    def test_report(self):
+        client = jwt_client(self.admin)
+        first = self.students[0][0]
+        for day in range(5):
+            date = DAY + datetime.timedelta(days=day)
+            self.roll(client, self.classes[0], absent=[first.pk] if day < 2 else [], date=date)
+            self.roll(client, self.classes[2], absent=[student.pk for student in self.students[2]], date=date)
+        self.roll(client, self.classes[0], absent=[first.pk], date=DAY + datetime.timedelta(days=31))
+
+        report = client.get('/api/attendance/report/', {'month': '2024-10', 'group_by': 'class'}).json()
+        self.assertEqual((report['sessions'], report['absences'], report['absence_rate']), (40, 22, 0.55))
+        self.assertEqual(
+            [(row['school_class_id'], row['roll_calls'], row['absences'], row['absence_rate']) for row in report['results']],
+            [(self.classes[0].pk, 5, 2, 0.1), (self.classes[2].pk, 5, 20, 1.0)],
+        )
+        rows = client.get('/api/attendance/report/', {'month': '2024-10', 'group_by': 'student', 'class_id': self.classes[0].pk}).json()['results']
+        self.assertEqual({row['student_id']: (row['sessions'], row['absences']) for row in rows}[first.pk], (5, 2))
+        self.assertEqual(len(rows), 4)
+
+        # Directors get their schools only
+        report = jwt_client(self.director).get('/api/attendance/report/', {'month': '2024-10', 'group_by': 'school'}).json()
+        self.assertEqual(
+            [(row['school_id'], row['sessions'], row['absences']) for row in report['results']],
+            [(self.classes[0].level.school_id, 20, 2)],
+        )
+        self.assertEqual(client.get('/api/attendance/report/', {'month': '2024-13'}).status_code, 400)
+        self.assertEqual(client.get('/api/attendance/report/', {'month': '2024-09'}).json()['results'], [])
+
+    def test_query_budgets(self):
+        client = jwt_client(self.teacher)
+        with query_budget(8, 'cold first roll call of a class'):
+            self.roll(client, self.classes[0])
+        cache.clear()
+        with query_budget(5, 'cold roll call of a class with its slots'):
+            self.roll(client, self.classes[0], absent=[self.students[0][0].pk])
+        cache.clear()
+        with query_budget(4, 'cold sheets of a class'):
+            client.get(self.url(self.classes[0]), {'date': DAY.isoformat()})
+        cache.clear()
+        with query_budget(5, 'cold report of a director'):
+            jwt_client(self.director).get('/api/attendance/report/', {'month': '2024-10'})
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import AbsenceReportView, ClassAttendanceView
+
+urlpatterns = [
+    path('classes/<int:class_id>/', ClassAttendanceView.as_view(), name='class_attendance'),
+    path('report/', AbsenceReportView.as_view(), name='absence_report'),
+]
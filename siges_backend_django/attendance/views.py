@@ -0,0 +1,76 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from schools.access import get_access_context
+from schools.models import SchoolClass
+from schools.permissions import CanManageSchoolContent
+from sharding.shards import on_shard, shard_for_school
+from .permissions import CanTakeAttendance
+from .reports import absence_report, visible_classes
+from .rolls import class_sheets, sheet_data, take_roll
+from .serializers import AbsenceReportSerializer, ClassSheetsSerializer, RollCallSerializer
+
+
+class ClassAttendanceView(APIView):
+    """
+    Roll calls of a class (see attendance/rolls.py).
+    GET ?date=YYYY-MM-DD (default today) [&session=AM|PM]: the sheets of that day.
+    POST {"date", "session", "absent": [student ids]}: marks the whole class,
+    every active student present unless listed; replaces the session's sheet.
+    For the class's teacher, and the directors and super admins managing it.
+    """
+    permission_classes = [CanTakeAttendance]
+    query_budget = {'get': 4, 'post': 8} # Checked by QueryBudgetMiddleware, auth included (post: 5 once every student has a slot)
+
+    def get_school_class(self):
+        school_class = get_object_or_404(SchoolClass.objects.select_related('level'), pk=self.kwargs['class_id'])
+        self.check_object_permissions(self.request, school_class)
+        return school_class
+
+    def get(self, request, class_id):
+        school_class = self.get_school_class()
+        serializer = ClassSheetsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        with on_shard(shard_for_school(school_class.level.school_id)):
+            return Response(class_sheets(school_class.pk, params['date'], params.get('session')))
+
+    def post(self, request, class_id):
+        school_class = self.get_school_class()
+        serializer = RollCallSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with on_shard(shard_for_school(school_class.level.school_id)):
+            sheet, slots = take_roll(school_class, data['date'], data['session'], data['absent'], request.user)
+        return Response(sheet_data(sheet, slots), status=status.HTTP_200_OK)
+
+
+class AbsenceReportView(APIView):
+    """
+    Monthly absence rates from the attendance bitmaps (see attendance/reports.py):
+    ?month=YYYY-MM (default this month) &group_by=student|class|school (default class)
+    within the optional school_id, level_id and class_id filters.
+    Directors get their schools, super admins the network.
+    """
+    permission_classes = [CanManageSchoolContent]
+    query_budget = 5 # Checked by QueryBudgetMiddleware, auth included (up to 500 classes, +2 per further 500 or further shard)
+
+    def get(self, request):
+        serializer = AbsenceReportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        filters = {}
+        for name, lookup in (('school_id', 'level__school_id'), ('level_id', 'level_id'), ('class_id', 'pk')):
+            if name in params:
+                filters[lookup] = params[name]
+
+        access = get_access_context(request)
+        classes = visible_classes(None if access.is_super_admin else access.school_ids, filters)
+        report = absence_report(classes, params['month'], params['end'], params['group_by'])
+        return Response({
+            'month': params['month'].strftime('%Y-%m'),
+            'group_by': params['group_by'],
+            **report,
+        })
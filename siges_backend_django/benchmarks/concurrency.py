@@ -0,0 +1,115 @@
+"""
+Multi-process SQLite contention benchmark.
+
+Each profile (a database ENGINE plus OPTIONS) gets a fresh database file in a
+temporary directory, seeded with a student-like table. N forked workers then
+run a mix for a fixed duration: reads list a class roster, writes read a row
+then update it inside atomic(), the pattern that fails with "database is
+locked" under DEFERRED transactions. Workers talk to the database through a
+connection alias built from the profile, so the real backend classes run.
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.db import DatabaseError, connections, transaction
+
+PROFILES = {
+    'stock': {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}},
+    'tuned': {'ENGINE': 'siges_backend_django.db.sqlite3', 'OPTIONS': {}},
+}
+ALIAS = 'sqlite_concurrency'
+
+
+def use_database(profile, path):
+    """Points the ALIAS connection at the profile's engine and database file."""
+    if ALIAS in connections.settings:
+        connections[ALIAS].close()
+        del connections[ALIAS]
+    # configure_settings() fills in the defaults of every other key; it insists on a 'default' entry
+    connections.settings[ALIAS] = connections.configure_settings({
+        'default': {'ENGINE': 'django.db.backends.dummy'},
+        ALIAS: {'ENGINE': profile['ENGINE'], 'NAME': path, 'OPTIONS': dict(profile['OPTIONS'])},
+    })[ALIAS]
+    return connections[ALIAS]
+
+
+def seed(connection, rows, classes):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE bench_student (id INTEGER PRIMARY KEY, class_id INTEGER NOT NULL, '
+            'name VARCHAR(100) NOT NULL, score INTEGER NOT NULL)'
+        )
+        cursor.execute('CREATE INDEX bench_student_class ON bench_student (class_id)')
+        cursor.executemany(
+            'INSERT INTO bench_student (id, class_id, name, score) VALUES (%s, %s, %s, %s)',
+            [(pk, pk % classes, 'Student %d' % pk, 0) for pk in range(1, rows + 1)],
+        )
+
+
+def worker(profile, path, duration, write_ratio, rows, classes, seed_value, results):
+    connection = use_database(profile, path)
+    rng = random.Random(seed_value)
+    stats = {'reads': 0, 'writes': 0, 'errors': 0, 'write_latencies': []}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                start = time.perf_counter()
+                with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+                    pk = rng.randint(1, rows)
+                    cursor.execute('SELECT score FROM bench_student WHERE id = %s', [pk])
+                    score = cursor.fetchone()[0]
+                    cursor.execute('UPDATE bench_student SET score = %s WHERE id = %s', [score + 1, pk])
+                stats['write_latencies'].append(time.perf_counter() - start)
+                stats['writes'] += 1
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT id, name, score FROM bench_student WHERE class_id = %s ORDER BY name',
+                        [rng.randrange(classes)],
+                    )
+                    cursor.fetchall()
+                stats['reads'] += 1
+        except DatabaseError:
+            stats['errors'] += 1
+    connection.close()
+    results.put(stats)
+
+
+def run_profile(name, workers, duration, write_ratio, rows, classes):
+    profile = PROFILES[name]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        connection = use_database(profile, path)
+        seed(connection, rows, classes)
+        connection.close()
+
+        # Fork so that workers inherit the configured Django; each opens its own connection
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(profile, path, duration, write_ratio, rows, classes, index, results))
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        stats = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    latencies = sorted(latency for worker_stats in stats for latency in worker_stats['write_latencies'])
+    reads = sum(worker_stats['reads'] for worker_stats in stats)
+    writes = sum(worker_stats['writes'] for worker_stats in stats)
+    return {
+        'profile': name,
+        'engine': profile['ENGINE'],
+        'workers': workers,
+        'reads_per_s': round(reads / duration, 1),
+        'writes_per_s': round(writes / duration, 1),
+        'errors': sum(worker_stats['errors'] for worker_stats in stats),
+        'write_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'write_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+    }
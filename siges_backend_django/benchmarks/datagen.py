@@ -0,0 +1,145 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from schools.models import Level, School, SchoolClass
+from students.models import Student
+from students.signals import students_bulk_changed
+from users.models import CustomUser
+
+# Levels of each cycle, in promotion order (Ivorian system)
+LEVELS_BY_CYCLE = {
+    'PRESCHOOL': ['PS', 'MS', 'GS'],
+    'PRIMARY': ['CP1', 'CP2', 'CE1', 'CE2', 'CM1', 'CM2'],
+}
+# Level.order of each level (promotion rank across cycles)
+LEVEL_ORDER = {name: rank for rank, name in enumerate(LEVELS_BY_CYCLE['PRESCHOOL'] + LEVELS_BY_CYCLE['PRIMARY'], 1)}
+# Age of the pupils of each level on 1 October of the academic year
+LEVEL_AGES = {'PS': 3, 'MS': 4, 'GS': 5, 'CP1': 6, 'CP2': 7, 'CE1': 8, 'CE2': 9, 'CM1': 10, 'CM2': 11}
+
+FIRST_NAMES = {
+    'MALE': ['Kouadio', 'Yao', 'Koffi', 'Moussa', 'Ibrahim', 'Jérôme', 'Adama', 'Serge', 'Aubin', 'Hervé', 'Désiré', 'Élie'],
+    'FEMALE': ['Aya', 'Adjoua', 'Awa', 'Mariam', 'Fatou', 'Élodie', 'Bérénice', 'Nadège', 'Aïcha', 'Chloé', 'Inès', 'Ruth'],
+}
+LAST_NAMES = [
+    'Koné', 'Kouassi', 'Traoré', 'Ouattara', 'Yao', "N'Guessan", 'Bamba', 'Coulibaly', 'Diabaté',
+    'Touré', 'Konan', 'Kouamé', 'Diallo', 'Séri', 'Gnagne', 'Aké', 'Brou', 'Éhouman',
+]
+CITIES = ['Abidjan', 'Bouaké', 'Yamoussoukro', 'Daloa', 'San-Pédro', 'Korhogo', 'Man', 'Gagnoa']
+
+
+class SchoolNetworkGenerator:
+    """
+    Generates a reproducible synthetic school network: schools with a director,
+    the levels of each cycle, classes per level and academic year, students with
+    one or two parents (siblings share their parents) and a super admin.
+
+    Everything is written with bulk_create, and all users share one password
+    hash so that generating thousands of parents stays fast.
+    """
+
+    def __init__(self, schools=10, classes_per_level=2, students_per_class=30, academic_years=('2024-2025',),
+                 cycles=('PRESCHOOL', 'PRIMARY'), password='siges-bench', seed=42, batch_size=2000, prefix=None,
+                 stdout=None):
+        self.schools = schools
+        self.classes_per_level = classes_per_level
+        self.students_per_class = students_per_class
+        self.academic_years = list(academic_years)
+        self.cycles = list(cycles)
+        self.password_hash = make_password(password)
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.stdout = stdout
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def make_user(self, username, role, first_name='', last_name=''):
+        return CustomUser(
+            username=username, email='%s@bench.siges.ci' % username, password=self.password_hash,
+            role=role, first_name=first_name, last_name=last_name,
+        )
+
+    @transaction.atomic
+    def generate(self):
+        # Usernames must be unique: a new prefix per run on the same database
+        prefix = self.prefix or 'bench%d' % CustomUser.objects.count()
+        CustomUser.objects.bulk_create([self.make_user('%s-admin' % prefix, 'super_admin_group')])
+
+        directors = CustomUser.objects.bulk_create([
+            self.make_user('%s-director-%d' % (prefix, index), 'director', 'Directeur', str(index))
+            for index in range(self.schools)
+        ])
+        schools = School.objects.bulk_create([
+            School(
+                name='%s %s %d' % (self.random.choice(['EPP', 'Groupe Scolaire', 'École']), self.random.choice(CITIES), index),
+                address='%s, Côte d\'Ivoire' % self.random.choice(CITIES), director=director,
+            )
+            for index, director in enumerate(directors)
+        ])
+        levels = Level.objects.bulk_create([
+            Level(name=name, school=school, cycle=cycle, order=LEVEL_ORDER[name])
+            for school in schools for cycle in self.cycles for name in LEVELS_BY_CYCLE[cycle]
+        ])
+        classes = SchoolClass.objects.bulk_create([
+            SchoolClass(name='%s %s' % (level.name, chr(ord('A') + index)), level=level, academic_year=year)
+            for level in levels for year in self.academic_years for index in range(self.classes_per_level)
+        ])
+        self.log('%d schools, %d levels, %d classes' % (len(schools), len(levels), len(classes)))
+
+        levels_by_id = {level.pk: level for level in levels}
+        students_created = parents_created = 0
+        classes_per_batch = max(1, self.batch_size // max(1, self.students_per_class))
+        for start in range(0, len(classes), classes_per_batch):
+            batch = classes[start:start + classes_per_batch]
+            students, parents = self.generate_students(prefix, batch, levels_by_id, parents_created)
+            students_created += students
+            parents_created += parents
+        students_bulk_changed.send(sender=Student, student_ids=None, class_ids={school_class.pk for school_class in classes})
+        self.log('%d students, %d parents' % (students_created, parents_created))
+        return {
+            'prefix': prefix, 'schools': len(schools), 'levels': len(levels), 'classes': len(classes),
+            'students': students_created, 'parents': parents_created,
+        }
+
+    def generate_students(self, prefix, classes, levels_by_id, parent_offset):
+        students, student_families, families = [], [], []
+        for school_class in classes:
+            level = levels_by_id[school_class.level_id]
+            birth_year = int(school_class.academic_year[:4]) - LEVEL_AGES.get(level.name, 6)
+            for _ in range(self.students_per_class):
+                # One pupil in five is the sibling of the previous one and shares their parents
+                if not families or self.random.random() >= 0.2:
+                    families.append((self.random.choice(LAST_NAMES), 1 + (self.random.random() < 0.6)))
+                gender = self.random.choice(['MALE', 'FEMALE'])
+                students.append(Student(
+                    first_name=self.random.choice(FIRST_NAMES[gender]),
+                    last_name=families[-1][0],
+                    date_of_birth=datetime.date(birth_year, self.random.randint(1, 12), self.random.randint(1, 28)),
+                    gender=gender,
+                    address='Quartier %d, %s' % (self.random.randint(1, 99), self.random.choice(CITIES)),
+                    school_class=school_class,
+                ))
+                student_families.append(len(families) - 1)
+
+        parents, parents_by_family = [], []
+        for last_name, size in families:
+            members = [
+                self.make_user('%s-parent-%d' % (prefix, parent_offset + len(parents) + index), 'parent', 'Parent', last_name)
+                for index in range(size)
+            ]
+            parents.extend(members)
+            parents_by_family.append(members)
+
+        Student.objects.bulk_create(students, batch_size=self.batch_size)
+        CustomUser.objects.bulk_create(parents, batch_size=self.batch_size)
+        Through = Student.parents.through
+        Through.objects.bulk_create([
+            Through(student_id=student.pk, customuser_id=parent.pk)
+            for student, family in zip(students, student_families) for parent in parents_by_family[family]
+        ], batch_size=self.batch_size)
+        return len(students), len(parents)
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.servers import PROFILES, access_token, run_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts gunicorn (WSGI, gthread) and uvicorn (ASGI, sync and async views) in turn against the configured "
+        "database and measures how many concurrent slow clients each serves (requests/s, latency, errors)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help="Number of concurrent clients, repeatable (default: 100 and 1000).")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run.")
+        parser.add_argument('--send-delay', type=float, default=0.5,
+                            help="Seconds between the request line and the headers (a slow uplink).")
+        parser.add_argument('--read-delay', type=float, default=0.05,
+                            help="Seconds between two reads of the response (a slow downlink, see benchmarks/servers.py).")
+        parser.add_argument('--workers', type=int, default=2, help="Server processes.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker.")
+        parser.add_argument('--role', default='director', choices=['super_admin_group', 'director', 'parent'],
+                            help="Role of the user whose token the clients send.")
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help="Profile to run, repeatable (default: all).")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        token = access_token(options['role'])
+        results = []
+        for concurrency in options['concurrency'] or [100, 1000]:
+            for profile in options['profile'] or sorted(PROFILES):
+                result = run_profile(
+                    profile, concurrency, options['duration'], options['send_delay'], options['read_delay'],
+                    options['workers'], options['threads'], token, options['page_size'],
+                )
+                results.append(result)
+                if not options['json']:
+                    self.stdout.write(
+                        '%(profile)-13s %(concurrency)5d clients  %(requests_per_s)8.1f req/s  %(errors)6d errors  '
+                        'p50 %(p50_ms)8.1f ms  p99 %(p99_ms)8.1f ms' % result
+                    )
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.readpath import CASES, compare_read_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the first N students to JSON through StudentSerializer and through the values() read path "
+        "(schools/fastread.py), and reports the median time of each and whether the payloads are identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--case', action='append', choices=sorted(CASES), help="Case to run, repeatable (default: all).")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        results = compare_read_paths(options['rows'], options['iterations'], options['case'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for result in results:
+                self.stdout.write(
+                    '%(case)-18s %(rows)6d rows  serializer %(serializer_ms)8.1f ms  values %(values_ms)8.1f ms  '
+                    'x%(speedup)-5s %(bytes)9d bytes  identical: %(identical)s' % result
+                )
+        if not all(result['identical'] for result in results):
+            raise CommandError('The two read paths rendered different payloads.')
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.concurrency import PROFILES, run_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares Django's stock sqlite3 backend with the tuned one under N concurrent worker processes "
+        "(reads/s, writes/s, 'database is locked' errors, write latency), on temporary databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, action='append',
+                            help="Number of worker processes, repeatable (default: 1, 4 and 8).")
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per run.")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Share of operations that write.")
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--classes', type=int, default=500)
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help="Profile to run, repeatable (default: all).")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        results = []
+        for workers in options['workers'] or [1, 4, 8]:
+            for profile in options['profile'] or sorted(PROFILES):
+                result = run_profile(
+                    profile, workers, options['duration'], options['write_ratio'], options['rows'], options['classes']
+                )
+                results.append(result)
+                if not options['json']:
+                    self.stdout.write(
+                        '%(profile)-6s %(workers)3d workers  %(reads_per_s)9.1f reads/s  %(writes_per_s)8.1f writes/s  '
+                        '%(errors)6d errors  write p50 %(write_p50_ms)s ms  p99 %(write_p99_ms)s ms' % result
+                    )
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.datagen import LEVELS_BY_CYCLE, SchoolNetworkGenerator
+from sharding.shards import is_enabled as sharding_enabled
+
+
+class Command(BaseCommand):
+    help = "Generates a reproducible synthetic school network (schools, levels, classes, students, parents, directors)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=10)
+        parser.add_argument('--classes-per-level', type=int, default=2)
+        parser.add_argument('--students-per-class', type=int, default=30)
+        parser.add_argument('--academic-year', action='append', dest='academic_years',
+                            help="Academic year of the generated classes, repeatable (default 2024-2025).")
+        parser.add_argument('--cycle', action='append', dest='cycles', choices=sorted(LEVELS_BY_CYCLE),
+                            help="Cycle whose levels are created, repeatable (default: all).")
+        parser.add_argument('--password', default='siges-bench', help="Password of every generated user.")
+        parser.add_argument('--prefix', help="Username prefix (default: derived from the number of users).")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if sharding_enabled():
+            # Its bulk writes are not routed to the shard of each school
+            raise CommandError('The generator does not support sharded student data yet: unset SIGES_SHARD_DBS.')
+        generator = SchoolNetworkGenerator(
+            schools=options['schools'],
+            classes_per_level=options['classes_per_level'],
+            students_per_class=options['students_per_class'],
+            academic_years=options['academic_years'] or ['2024-2025'],
+            cycles=options['cycles'] or list(LEVELS_BY_CYCLE),
+            password=options['password'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            stdout=self.stdout,
+        )
+        summary = generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            "Generated %(students)d students in %(classes)d classes of %(schools)d schools "
+            "(usernames prefixed with '%(prefix)s')." % summary
+        ))
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import BenchmarkRunner
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the API benchmark scenarios in-process against the current database and reports "
+        "p50/p95/p99 latency, throughput and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="Only run scenarios whose name contains this text, repeatable.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            only=options['scenarios'],
+            stdout=self.stderr, # Progress lines stay out of the JSON written to stdout
+        )
+        try:
+            report = runner.run()
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS('Report written to %s' % options['output']))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,67 @@
+"""
+Serializer read path vs ValuesPlan (schools/fastread.py) on the same rows.
+
+Each case renders the first N students (by id) to JSON both ways: the
+queryset as the list endpoint builds it (SparseFieldsetMixin.project(), then
+ModelSerializer and JSONRenderer), and the values() rows rendered by the plan.
+The two payloads must be byte-for-byte identical.
+"""
+import statistics
+import time
+
+from django.core.management.base import CommandError
+from rest_framework.renderers import JSONRenderer
+
+from schools.fastread import ValuesPlan
+from students.models import Student
+from students.serializers import StudentSerializer
+
+CASES = {
+    'students': {},
+    'students_narrow': {'fields': {'id': {}, 'first_name': {}, 'last_name': {}, 'school_class': {}}},
+    'students_expanded': {'expand': {'school_class': {'level': {'school': {}}}, 'parents': {}}},
+}
+
+
+def serializer_path(queryset, selection):
+    serializer = StudentSerializer(**selection)
+    instances = list(serializer.project(queryset))
+    return JSONRenderer().render(StudentSerializer(instances, many=True, **selection).data)
+
+
+def values_path(queryset, selection):
+    plan = ValuesPlan(StudentSerializer(**selection))
+    return JSONRenderer().render(plan.render(plan.values(queryset)))
+
+
+def timed(function, iterations, *args):
+    timings, output = [], None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        output = function(*args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), output
+
+
+def compare_read_paths(rows=10000, iterations=5, cases=None):
+    available = Student.objects.count()
+    if available < rows:
+        raise CommandError('Only %d students in the database; run generate_school_network first.' % available)
+    ids = list(Student.objects.order_by('id').values_list('id', flat=True)[:rows])
+    queryset = Student.objects.filter(id__in=ids).order_by('id')
+
+    results = []
+    for name in cases or CASES:
+        selection = dict({'fields': None, 'expand': {}}, **CASES[name])
+        slow, slow_output = timed(serializer_path, iterations, queryset, selection)
+        fast, fast_output = timed(values_path, iterations, queryset, selection)
+        results.append({
+            'case': name,
+            'rows': rows,
+            'serializer_ms': round(slow * 1000, 1),
+            'values_ms': round(fast * 1000, 1),
+            'speedup': round(slow / fast, 2),
+            'bytes': len(fast_output),
+            'identical': slow_output == fast_output,
+        })
+    return results
@@ -0,0 +1,132 @@
+import statistics
+import subprocess
+import time
+
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from schools.models import School, SchoolClass
+from siges_backend_django.query_budget import count_queries
+from students.models import Student
+from users.models import CustomUser
+from users.tokens import SchoolAccessToken
+from .scenarios import SCENARIOS, BenchmarkFixture
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(latencies, queries, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'iterations': len(latencies),
+        'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'queries_mean': round(statistics.fmean(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+class BenchmarkRunner:
+    """
+    Runs the scenarios against the configured database through APIClient
+    (full middleware, JWT authentication, permissions and serializers) and
+    collects per-iteration latency and query counts.
+    """
+
+    def __init__(self, iterations=200, warmup=20, only=None, stdout=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.only = only or []
+        self.stdout = stdout
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer %s' % SchoolAccessToken.for_user(user))
+        return client
+
+    def run_iteration(self, client, requests, writes):
+        """Returns (duration, queries) of one iteration; writes are rolled back."""
+        with count_queries() as counter:
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    for method, url, data in requests:
+                        response = getattr(client, method)(url, data, format='json') if data is not None else getattr(client, method)(url)
+                        if response.status_code >= 400:
+                            raise AssertionError('%s %s returned %s: %s' % (
+                                method.upper(), url, response.status_code, getattr(response, 'data', response.content)
+                            ))
+                    if writes:
+                        raise Rollback
+            except Rollback:
+                pass
+            duration = time.perf_counter() - start
+        return duration, counter.count
+
+    def run(self):
+        fixture = BenchmarkFixture()
+        missing = fixture.missing()
+        if missing:
+            raise ValueError('The database has no %s: run generate_school_network first.' % ', '.join(missing))
+
+        report = {'meta': self.meta(), 'scenarios': {}}
+        # The test client talks to "testserver"
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for scenario in SCENARIOS:
+                if self.only and not any(pattern in scenario.name for pattern in self.only):
+                    continue
+                client = self.client_for(fixture.users[scenario.role])
+                requests = scenario.build(fixture)
+                for _ in range(self.warmup):
+                    self.run_iteration(client, requests, scenario.writes)
+                latencies, queries = [], []
+                started = time.perf_counter()
+                for _ in range(self.iterations):
+                    duration, count = self.run_iteration(client, requests, scenario.writes)
+                    latencies.append(duration)
+                    queries.append(count)
+                result = summarise(latencies, queries, time.perf_counter() - started)
+                report['scenarios'][scenario.name] = result
+                self.log('%-36s p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  %6.1f queries' % (
+                    scenario.name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries_mean']
+                ))
+        return report
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'warmup': self.warmup,
+            'dataset': {
+                'schools': School.objects.count(),
+                'classes': SchoolClass.objects.count(),
+                'students': Student.objects.count(),
+                'users': CustomUser.objects.count(),
+            },
+        }
@@ -0,0 +1,80 @@
+"""
+Benchmark scenarios driving the real DRF views in-process.
+
+A scenario is a name, the role of the user issuing the requests, whether it
+writes (writes are rolled back after each iteration so that runs stay
+reproducible) and a function returning the requests of one iteration as
+(method, url, data) tuples.
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+from schools.models import Level, School, SchoolClass
+from students.models import Student
+from users.models import CustomUser
+
+
+@dataclass
+class Scenario:
+    name: str
+    role: str
+    build: Callable
+    writes: bool = False
+
+
+class BenchmarkFixture:
+    """Users and object ids the scenarios work on, picked from the existing data."""
+
+    def __init__(self):
+        self.users = {
+            'super_admin': CustomUser.objects.filter(role='super_admin_group').order_by('pk').first(),
+            'director': CustomUser.objects.filter(role='director', directed_schools__isnull=False).order_by('pk').first(),
+            'parent': CustomUser.objects.filter(role='parent', children__isnull=False).order_by('pk').first(),
+        }
+        director = self.users['director']
+        self.school = School.objects.filter(director=director).order_by('pk').first()
+        self.level = Level.objects.filter(school=self.school).order_by('pk').first()
+        self.school_class = SchoolClass.objects.filter(level=self.level).order_by('pk').first()
+        self.director_student = Student.objects.filter(school_class__level__school=self.school).order_by('pk').first()
+        self.parent_student = Student.objects.filter(parents=self.users['parent']).order_by('pk').first()
+
+    def missing(self):
+        return [name for name, value in [
+            ('super admin', self.users['super_admin']), ('director with a school', self.users['director']),
+            ('parent with a child', self.users['parent']), ('class', self.school_class),
+            ('student', self.director_student),
+        ] if value is None]
+
+
+def navigate_hierarchy(fixture):
+    return [
+        ('get', '/api/schools/', None),
+        ('get', '/api/schools/%d/levels/' % fixture.school.pk, None),
+        ('get', '/api/levels/%d/classes/' % fixture.level.pk, None),
+        ('get', '/api/students/?class_id=%d' % fixture.school_class.pk, None),
+    ]
+
+
+def create_student(fixture):
+    return [('post', '/api/students/', {
+        'first_name': 'Aya', 'last_name': 'Koné', 'date_of_birth': '2017-03-14', 'gender': 'FEMALE',
+        'school_class': fixture.school_class.pk, 'parents': [fixture.users['parent'].pk],
+    })]
+
+
+SCENARIOS = [
+    Scenario('students.list.super_admin', 'super_admin', lambda f: [('get', '/api/students/', None)]),
+    Scenario('students.list.director', 'director', lambda f: [('get', '/api/students/', None)]),
+    Scenario('students.list.parent', 'parent', lambda f: [('get', '/api/students/', None)]),
+    Scenario('students.list.school_filter', 'super_admin', lambda f: [('get', '/api/students/?school_id=%d' % f.school.pk, None)]),
+    Scenario('students.retrieve.super_admin', 'super_admin', lambda f: [('get', '/api/students/%d/' % f.director_student.pk, None)]),
+    Scenario('students.retrieve.director', 'director', lambda f: [('get', '/api/students/%d/' % f.director_student.pk, None)]),
+    Scenario('students.retrieve.parent', 'parent', lambda f: [('get', '/api/students/%d/' % f.parent_student.pk, None)]),
+    Scenario('hierarchy.navigate.super_admin', 'super_admin', navigate_hierarchy),
+    Scenario('hierarchy.navigate.director', 'director', navigate_hierarchy),
+    Scenario('hierarchy.tree.director', 'director', lambda f: [('get', '/api/schools/%d/tree/' % f.school.pk, None)]),
+    Scenario('students.create.director', 'director', create_student, writes=True),
+    Scenario('students.update.director', 'director', lambda f: [
+        ('patch', '/api/students/%d/' % f.director_student.pk, {'status': 'INACTIVE'}),
+    ], writes=True),
+]
@@ -0,0 +1,177 @@
+"""
+Concurrency of the sync (gunicorn, WSGI) and async (uvicorn, ASGI) deployments.
+
+Each profile starts a server on a free local port against the configured
+database; C concurrent clients then fetch a page of students for a fixed
+duration the way slow mobile clients do: a new connection per request, the
+request sent in two parts --send-delay apart (a slow uplink), and the
+response read READ_CHUNK bytes at a time, --read-delay apart, through a
+small receive buffer (a slow downlink). A gthread worker holds one of its
+threads until the response is written out; the async views of
+siges_backend_django/asyncapi.py hold no thread while they wait, on the
+database or on the client.
+
+    uvicorn-async   the async views (/api/async/students/) under uvicorn
+    uvicorn-sync    the DRF viewset (/api/students/) under uvicorn, run in threads by Django
+    gunicorn        the DRF viewset under gunicorn's gthread workers
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from students.models import Student
+from users.models import CustomUser
+from users.tokens import SchoolAccessToken
+from .runner import percentile
+
+PROFILES = {
+    'gunicorn': {
+        'command': [
+            'gunicorn', 'siges_backend_django.wsgi:application', '--bind', '127.0.0.1:{port}',
+            '--worker-class', 'gthread', '--workers', '{workers}', '--threads', '{threads}', '--log-level', 'warning',
+        ],
+        'path': '/api/students/',
+    },
+    'uvicorn-sync': {
+        'command': [
+            'uvicorn', 'siges_backend_django.asgi:application', '--port', '{port}',
+            '--workers', '{workers}', '--log-level', 'warning', '--no-access-log',
+        ],
+        'path': '/api/students/',
+    },
+    'uvicorn-async': {
+        'command': [
+            'uvicorn', 'siges_backend_django.asgi:application', '--port', '{port}',
+            '--workers', '{workers}', '--log-level', 'warning', '--no-access-log',
+        ],
+        'path': '/api/async/students/',
+    },
+}
+HOST = '127.0.0.1'
+# Seconds a client waits for a connection or a response before counting an error
+CLIENT_TIMEOUT = 30
+# Bytes a slow client reads at a time, and its socket receive buffer
+READ_CHUNK = 2048
+RECEIVE_BUFFER = 4096
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def access_token(role):
+    user = CustomUser.objects.filter(role=role, is_active=True).order_by('pk').first()
+    if user is None or not Student.objects.exists():
+        raise CommandError('No %s or no students in the database; run generate_school_network first.' % role)
+    return str(SchoolAccessToken.for_user(user))
+
+
+def start_server(profile, port, workers, threads):
+    command = [part.format(port=port, workers=workers, threads=threads) for part in PROFILES[profile]['command']]
+    command[0] = os.path.join(os.path.dirname(sys.executable), command[0])
+    if not os.path.exists(command[0]):
+        raise CommandError('%s is not installed.' % os.path.basename(command[0]))
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'siges_backend_django.settings'))
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise CommandError('%s exited with status %s.' % (profile, server.returncode))
+            time.sleep(0.2)
+    server.terminate()
+    raise CommandError('%s did not start listening within 30 seconds.' % profile)
+
+
+async def connect(port):
+    loop = asyncio.get_running_loop()
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+    sock.setblocking(False)
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (HOST, port)), CLIENT_TIMEOUT)
+    except BaseException:
+        sock.close()
+        raise
+    # A small stream limit too, or the transport would drain the socket into memory at once
+    return await asyncio.open_connection(sock=sock, limit=READ_CHUNK)
+
+
+async def slow_client(port, head, rest, send_delay, read_delay, deadline, stats):
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        start = time.perf_counter()
+        try:
+            reader, writer = await connect(port)
+            try:
+                writer.write(head)
+                await writer.drain()
+                await asyncio.sleep(send_delay)
+                writer.write(rest)
+                await writer.drain()
+                status_line = await asyncio.wait_for(reader.readline(), CLIENT_TIMEOUT)
+                while await asyncio.wait_for(reader.read(READ_CHUNK), CLIENT_TIMEOUT): # Connection: close
+                    await asyncio.sleep(read_delay)
+            finally:
+                writer.close()
+            status = int(status_line.split()[1])
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            stats['errors'] += 1
+            continue
+        if status == 200:
+            stats['latencies'].append(time.perf_counter() - start)
+        else:
+            stats['errors'] += 1
+
+
+async def load(port, request, concurrency, duration, send_delay, read_delay):
+    # The request line first, the headers after the delay
+    split = request.index(b'\r\n') + 2
+    stats = {'latencies': [], 'errors': 0}
+    deadline = asyncio.get_running_loop().time() + duration
+    await asyncio.gather(*[
+        slow_client(port, request[:split], request[split:], send_delay, read_delay, deadline, stats)
+        for _ in range(concurrency)
+    ])
+    return stats
+
+
+def run_profile(profile, concurrency, duration, send_delay, read_delay, workers=2, threads=8, token=None, page_size=100):
+    port = free_port()
+    request = (
+        'GET %s?page_size=%d HTTP/1.1\r\nHost: %s:%d\r\nAuthorization: Bearer %s\r\nConnection: close\r\n\r\n'
+        % (PROFILES[profile]['path'], page_size, HOST, port, token)
+    ).encode()
+    server = start_server(profile, port, workers, threads)
+    try:
+        start = time.perf_counter()
+        stats = asyncio.run(load(port, request, concurrency, duration, send_delay, read_delay))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = sorted(stats['latencies'])
+    return {
+        'profile': profile,
+        'concurrency': concurrency,
+        'workers': workers,
+        'threads': threads if profile == 'gunicorn' else None,
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'errors': stats['errors'],
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
@@ -0,0 +1,56 @@
+import io
+import json
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from schools.models import Level, School, SchoolClass
+from students.models import Student
+from users.models import CustomUser
+from .datagen import SchoolNetworkGenerator
+
+
+class SchoolNetworkGeneratorTests(TestCase):
+    def generate(self, prefix, seed=42):
+        return SchoolNetworkGenerator(schools=2, classes_per_level=1, students_per_class=5, prefix=prefix, seed=seed).generate()
+
+    def student_rows(self, prefix):
+        return list(Student.objects.filter(school_class__level__school__director__username__startswith=prefix).order_by('pk').values_list(
+            'first_name', 'last_name', 'date_of_birth', 'gender', 'school_class__name',
+        ))
+
+    def test_network_shape(self):
+        summary = self.generate('a')
+        self.assertEqual((summary['schools'], summary['levels'], summary['classes'], summary['students']), (2, 18, 18, 90))
+        self.assertEqual(School.objects.count(), 2)
+        self.assertEqual(Level.objects.filter(cycle='PRIMARY').count(), 12)
+        self.assertEqual(SchoolClass.objects.count(), 18)
+        self.assertEqual(CustomUser.objects.filter(role='parent').count(), summary['parents'])
+        self.assertFalse(Student.objects.filter(parents=None).exists())
+
+    def test_same_seed_same_network(self):
+        self.generate('a')
+        self.generate('b')
+        self.generate('c', seed=7)
+        self.assertEqual(self.student_rows('a-'), self.student_rows('b-'))
+        self.assertNotEqual(self.student_rows('a-'), self.student_rows('c-'))
+
+
+class RunBenchmarksTests(TestCase):
+    def setUp(self):
+        cache.clear() # Auth versions cached by earlier tests for the same user ids
+
+    def test_requires_data(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', iterations=1, warmup=0, stderr=io.StringIO())
+
+    def test_every_scenario_runs(self):
+        call_command('generate_school_network', schools=2, classes_per_level=1, students_per_class=3, stdout=io.StringIO())
+        stdout = io.StringIO()
+        call_command('run_benchmarks', iterations=2, warmup=0, stdout=stdout, stderr=io.StringIO())
+        report = json.loads(stdout.getvalue())
+        self.assertTrue(report['scenarios'])
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['iterations'], 2, name)
+            self.assertGreater(result['queries_max'], 0, name)
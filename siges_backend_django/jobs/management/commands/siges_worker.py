@@ -0,0 +1,32 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import handlers
+from jobs.worker import WorkerPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the background jobs (imports, exports, academic year rollovers) queued in the database "
+        "with a pool of worker processes. Stop it with SIGTERM or Ctrl+C: running jobs are finished first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=min(4, os.cpu_count() or 1),
+                            help="Worker processes (default: the CPU count, at most 4).")
+        parser.add_argument('--kind', action='append', choices=sorted(handlers),
+                            help="Only run the jobs of this kind, repeatable (default: all).")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds an idle worker waits before looking for jobs again.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once no job is ready instead of waiting for new ones.")
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1:
+            raise CommandError('--processes must be at least 1.')
+        pool = WorkerPool(
+            options['processes'], options['kind'], options['poll_interval'], options['burst'],
+            log=lambda message: self.stdout.write(message),
+        )
+        pool.run()
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A unit of background work run by siges_worker (see jobs/queue.py)."""
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'En attente'),
+        (RUNNING, 'En cours'),
+        (SUCCEEDED, 'Terminé'),
+        (FAILED, 'Échoué'),
+    ]
+
+    kind = models.CharField(max_length=100) # Name of the registered handler, e.g. 'students.import'
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    run_after = models.DateTimeField(default=timezone.now) # Not claimed before (retry backoff)
+
+    worker = models.CharField(max_length=100, blank=True, default='') # host:pid of the process running it
+    heartbeat_at = models.DateTimeField(null=True, blank=True) # A running job silent for longer than its lease is requeued
+    progress = models.PositiveSmallIntegerField(null=True, blank=True) # Percent, when the handler knows its total
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='jobs', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'), # Claiming the next ready job
+            models.Index(fields=['created_by', 'id'], name='job_owner_idx'), # A user's jobs, newest first
+        ]
+
+    def __str__(self):
+        return '%s #%s (%s)' % (self.kind, self.pk, self.status)
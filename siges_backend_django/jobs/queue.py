@@ -0,0 +1,257 @@
+"""
+Durable background jobs kept in the application database.
+
+A job is a Job row naming a registered handler (kind) and its JSON payload.
+Web requests enqueue() jobs and return at once; siges_worker processes
+(jobs/worker.py) claim the ready ones and run them:
+
+- Claiming is row-level. Where the database supports it (PostgreSQL,
+  MySQL 8) the oldest ready rows are locked with SELECT ... FOR UPDATE SKIP
+  LOCKED, so workers never wait on each other; elsewhere (SQLite) a worker
+  flips a candidate from QUEUED to RUNNING with a conditional UPDATE and
+  moves to the next candidate when another worker won it.
+- A running job is leased: its worker refreshes heartbeat_at every
+  JOB_HEARTBEAT_SECONDS, and requeue_stale_jobs() hands a job silent for
+  JOB_LEASE_SECONDS (its worker died) back to the queue, or fails it once
+  its attempts are used up.
+- A handler raising an exception is retried with exponential backoff and
+  jitter up to its max_attempts; JobFailed fails the job without retry.
+  Handlers that are not idempotent (imports, rollovers) register with
+  max_attempts=1.
+
+Handlers live in the <app>/jobs.py modules, discovered when the jobs app is
+ready. They receive the Job and return its JSON result; they report
+progress with report_progress() and act as the user who queued them
+through job_request().
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Claiming candidates per round on databases without SKIP LOCKED
+CLAIM_BATCH = 10
+# Progress is written at most this often (seconds), a job's last report aside
+PROGRESS_INTERVAL = 1.0
+
+handlers = {}
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail its job without retrying it."""
+
+
+def register(kind, max_attempts=None):
+    """Registers the decorated function as the handler of the jobs of this kind."""
+    def decorator(handler):
+        handlers[kind] = (handler, max_attempts or settings.JOB_MAX_ATTEMPTS)
+        return handler
+    return decorator
+
+
+def job_storage():
+    """Storage of the files jobs read (uploads) and write (exports)."""
+    return FileSystemStorage(location=settings.JOB_FILES_DIR)
+
+
+def enqueue(kind, payload=None, user=None, run_after=None):
+    if kind not in handlers:
+        raise ValueError('No job handler is registered for %r.' % kind)
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=handlers[kind][1],
+        run_after=run_after or timezone.now(),
+        # The request user may be a ClaimsUser built from the token, not a CustomUser row
+        created_by_id=getattr(user, 'pk', None),
+    )
+
+
+class JobRequest:
+    """
+    What AccessContext, serializers and querysets read from the HTTP request
+    of the user who queued a job: its user, query parameters and method.
+    """
+    method = 'POST'
+
+    def __init__(self, user, query_params=None):
+        self.user = user
+        self.query_params = QueryDict(urlencode(query_params or {}, doseq=True))
+
+
+def job_request(job):
+    if job.created_by is None or not job.created_by.is_active:
+        raise JobFailed('The user who queued this job no longer exists or is inactive.')
+    return JobRequest(job.created_by, job.payload.get('query_params'))
+
+
+def query_params_payload(request):
+    """The query parameters of a request, as stored in a job payload for JobRequest."""
+    return {key: values for key, values in request.query_params.lists() if key != 'background'}
+
+
+def worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def ready_jobs(kinds=None):
+    jobs = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now())
+    if kinds:
+        jobs = jobs.filter(kind__in=kinds)
+    return jobs.order_by('run_after', 'id')
+
+
+def claim_job(worker, kinds=None):
+    """Marks the oldest ready job as run by this worker and returns it, or None."""
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = ready_jobs(kinds).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claimed_fields(worker))
+    else:
+        while True:
+            candidates = list(ready_jobs(kinds).values_list('pk', flat=True)[:CLAIM_BATCH])
+            if not candidates:
+                return None
+            won = next((
+                pk for pk in candidates
+                if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**claimed_fields(worker))
+            ), None)
+            if won is not None:
+                job = Job(pk=won)
+                break
+    job.refresh_from_db()
+    return job
+
+
+def claimed_fields(worker):
+    now = timezone.now()
+    return {
+        'status': Job.RUNNING, 'worker': worker, 'attempts': F('attempts') + 1,
+        'started_at': now, 'heartbeat_at': now, 'error': '',
+    }
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts, jittered between half and all of it."""
+    ceiling = min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_BACKOFF_SECONDS)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes the lease of a running job until stopped."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+                Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, worker=self.job.worker).update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            connection.close() # The thread's own connection
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ProgressReporter:
+    """
+    Callable handed to long operations: report_progress(message, done=None,
+    total=None) writes the message (and the percent done when the total is
+    known) on the job, at most every PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.written_at = None
+
+    def __call__(self, message='', done=None, total=None):
+        now = time.monotonic()
+        finished = total is not None and done is not None and done >= total
+        if self.written_at is not None and now - self.written_at < PROGRESS_INTERVAL and not finished:
+            return
+        self.written_at = now
+        fields = {'progress_message': message[:255], 'heartbeat_at': timezone.now()}
+        if total:
+            fields['progress'] = min(100, int(100 * (done or 0) / total))
+        Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, worker=self.job.worker).update(**fields)
+
+
+def run_job(job):
+    """Runs a claimed job and records its outcome: success, retry or failure."""
+    handler = handlers.get(job.kind, (None, None))[0]
+    job.report_progress = ProgressReporter(job)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise JobFailed('No job handler is registered for %r.' % job.kind)
+        result = handler(job)
+    except Exception as exc:
+        heartbeat.stop()
+        if isinstance(exc, JobFailed):
+            logger.warning('Job %s (%s) failed: %s', job.pk, job.kind, exc)
+            error = str(exc)
+        else:
+            logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.kind, job.attempts)
+            error = traceback.format_exc()
+        if isinstance(exc, JobFailed) or job.attempts >= job.max_attempts:
+            finish(job, Job.FAILED, error=error)
+        else:
+            Job.objects.filter(pk=job.pk, worker=job.worker).update(
+                status=Job.QUEUED, worker='', error=error,
+                run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+    else:
+        heartbeat.stop()
+        finish(job, Job.SUCCEEDED, result=result, progress=100)
+    finally:
+        close_old_connections()
+
+
+def finish(job, status, **fields):
+    Job.objects.filter(pk=job.pk, worker=job.worker).update(status=status, finished_at=timezone.now(), **fields)
+
+
+def requeue_stale_jobs():
+    """
+    Hands the running jobs whose lease expired (their worker died) back to the
+    queue, or fails them once their attempts are used up. Returns how many.
+    """
+    expired = Job.objects.filter(
+        status=Job.RUNNING, heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    )
+    recovered = 0
+    for job in expired.only('pk', 'attempts', 'max_attempts', 'worker'):
+        # Conditional on the worker too: the job may have finished or been reclaimed since
+        stale = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+        if job.attempts >= job.max_attempts:
+            recovered += stale.update(
+                status=Job.FAILED, finished_at=timezone.now(), error='The worker running this job stopped responding.'
+            )
+        else:
+            recovered += stale.update(status=Job.QUEUED, worker='', run_after=timezone.now())
+    return recovered
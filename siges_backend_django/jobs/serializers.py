@@ -0,0 +1,12 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'attempts', 'max_attempts', 'progress', 'progress_message',
+            'result', 'error', 'created_at', 'started_at', 'finished_at', 'run_after',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,129 @@
+import datetime
+import gzip
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from schools.models import Level, School, SchoolClass
+from siges_backend_django.testing import jwt_client
+from students.models import Student
+from users.models import CustomUser
+from .models import Job
+from .queue import JobFailed, claim_job, enqueue, register, requeue_stale_jobs, run_job
+
+attempts_seen = []
+
+
+@register('tests.flaky', max_attempts=3)
+def flaky(job):
+    attempts_seen.append(job.attempts)
+    if job.attempts < 3:
+        raise RuntimeError('attempt %d failed' % job.attempts)
+    return {'payload': job.payload}
+
+
+@register('tests.fatal', max_attempts=5)
+def fatal(job):
+    raise JobFailed('Cannot be retried.')
+
+
+def drain():
+    """Runs the ready jobs in this thread, as a burst worker would; returns how many ran."""
+    count = 0
+    while (job := claim_job('tests')) is not None:
+        run_job(job)
+        count += 1
+    return count
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        attempts_seen.clear()
+
+    @override_settings(JOB_RETRY_BACKOFF_SECONDS=0)
+    def test_retries_until_success(self):
+        job = enqueue('tests.flaky', {'x': 1})
+        self.assertEqual(drain(), 3) # Retried at once without a backoff
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), ('SUCCEEDED', 3, {'payload': {'x': 1}}))
+        self.assertEqual(attempts_seen, [1, 2, 3])
+
+    def test_job_failed_is_not_retried(self):
+        job = enqueue('tests.fatal')
+        drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('FAILED', 1, 'Cannot be retried.'))
+
+    def test_claims_are_exclusive_and_stale_jobs_requeued(self):
+        jobs = [enqueue('tests.flaky') for _ in range(3)]
+        claimed = [claim_job('dead') for _ in range(4)]
+        self.assertEqual(sorted(job.pk for job in claimed[:3]), [job.pk for job in jobs])
+        self.assertIsNone(claimed[3])
+        Job.objects.filter(pk=jobs[0].pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=jobs[0].pk).status, 'QUEUED')
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.unknown')
+
+
+class BackgroundJobEndpointTests(TestCase):
+    """?background=true queues the export, import and rollover as jobs, for users authenticated with a JWT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.other = CustomUser.objects.create_user(username='other', email='other@siges.ci', password='pass', role='director')
+        school = School.objects.create(name='School', address='Abidjan', director=cls.director)
+        cls.school_class = SchoolClass.objects.create(
+            name='CP1 A', level=Level.objects.create(name='CP1', school=school), academic_year='2024-2025',
+        )
+        for index in range(3):
+            Student.objects.create(
+                first_name='Élève %d' % index, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+                school_class=cls.school_class,
+            )
+
+    def setUp(self):
+        cache.clear()
+        files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_dir, ignore_errors=True)
+        settings_override = override_settings(JOB_FILES_DIR=files_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = jwt_client(self.director)
+
+    def queued(self, response):
+        self.assertEqual(response.status_code, 202, response.content)
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.created_by_id, self.director.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(drain(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCEEDED', job.error)
+        return job
+
+    def test_export(self):
+        job = self.queued(self.client.get('/api/students/export/?background=true&output=csv&compress=gzip'))
+        download = self.client.get('/api/jobs/%d/download/' % job.pk)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(len(gzip.decompress(b''.join(download.streaming_content)).decode().splitlines()), 4)
+        self.assertEqual(jwt_client(self.other).get('/api/jobs/%d/' % job.pk).status_code, 404)
+
+    def test_import(self):
+        content = 'first_name;last_name;date_of_birth;gender;school_class\nAwa;Traoré;2017-05-01;FEMALE;%d\n' % self.school_class.pk
+        upload = SimpleUploadedFile('students.csv', content.encode(), content_type='text/csv')
+        job = self.queued(self.client.post('/api/students/import/?background=true', {'file': upload}, format='multipart'))
+        self.assertEqual(job.result['created'], 1)
+        self.assertTrue(Student.objects.filter(first_name='Awa').exists())
+
+    def test_rollover(self):
+        data = {'from_year': '2024-2025', 'dry_run': True}
+        job = self.queued(self.client.post('/api/schools/rollover/', {**data, 'background': True}, format='json'))
+        self.assertEqual(job.result, self.client.post('/api/schools/rollover/', data, format='json').json())
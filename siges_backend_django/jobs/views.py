@@ -0,0 +1,52 @@
+import os
+
+from django.http import FileResponse
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from schools.access import get_access_context
+from schools.pagination import KeysetPagination
+from .models import Job
+from .queue import job_storage
+from .serializers import JobSerializer
+
+
+def wants_background(request):
+    """Whether the caller asked to run the operation as a job (?background=true)."""
+    return request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted(request, job):
+    """202 response to the request that queued a job, pointing at its status endpoint."""
+    location = reverse('job-detail', kwargs={'pk': job.pk}, request=request)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of the background jobs: users see the jobs they queued, super admins all of them.
+    Clients poll GET /api/jobs/{id}/ until status is SUCCEEDED or FAILED.
+    """
+    serializer_class = JobSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 3, 'retrieve': 2, 'download': 2} # Checked by QueryBudgetMiddleware, auth included
+
+    def get_queryset(self):
+        jobs = Job.objects.all()
+        if not get_access_context(self.request).is_super_admin:
+            jobs = jobs.filter(created_by_id=self.request.user.pk)
+        return jobs.order_by('-id')
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The file a finished job produced (exports)."""
+        job = self.get_object()
+        path = (job.result or {}).get('file') if job.status == Job.SUCCEEDED else None
+        storage = job_storage()
+        if not path or not storage.exists(path):
+            raise NotFound('This job has no file to download.')
+        return FileResponse(storage.open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
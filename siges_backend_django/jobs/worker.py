@@ -0,0 +1,99 @@
+"""
+The siges_worker process pool.
+
+The parent forks N worker processes and supervises them: it restarts a
+worker that died, and periodically hands the jobs of dead workers back to
+the queue (requeue_stale_jobs). Each worker claims and runs one job at a
+time, sleeping poll_interval when the queue is empty. SIGTERM or SIGINT
+stops the pool gracefully: the parent forwards SIGTERM to the workers, which
+finish their current job and exit.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .queue import claim_job, requeue_stale_jobs, run_job, worker_name
+
+
+def work(kinds, poll_interval, burst):
+    # A process-local flag: a worker killed while waiting on a shared multiprocessing.Event would wedge it
+    stopping = threading.Event()
+    # Shutdown is the parent's call: a Ctrl+C reaching the whole process group must not cut a job short
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    name = worker_name()
+    try:
+        while not stopping.is_set():
+            job = claim_job(name, kinds)
+            if job is not None:
+                run_job(job)
+            elif burst:
+                break
+            else:
+                stopping.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+class WorkerPool:
+    def __init__(self, processes, kinds=None, poll_interval=1.0, burst=False, log=None):
+        self.processes = processes
+        self.kinds = kinds
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.log = log or (lambda message: None)
+        self.context = multiprocessing.get_context('fork')
+        self.stopping = False
+        self.workers = {}
+
+    def start_worker(self, index):
+        process = self.context.Process(
+            target=work, args=(self.kinds, self.poll_interval, self.burst),
+            name='siges-worker-%d' % index, daemon=False,
+        )
+        process.start()
+        self.workers[index] = process
+        self.log('Worker %d started (pid %d).' % (index, process.pid))
+
+    def stop(self, signum=None, frame=None):
+        if not self.stopping:
+            self.log('Stopping: the workers finish their current job.')
+            self.stopping = True
+            for process in self.workers.values():
+                process.terminate() # SIGTERM, handled by work()
+
+    def run(self):
+        # Children must not share the parent's database connections
+        connections.close_all()
+        previous = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self.recover()
+            for index in range(self.processes):
+                self.start_worker(index)
+            next_recovery = time.monotonic() + settings.JOB_LEASE_SECONDS / 2
+            while self.workers:
+                for index, process in list(self.workers.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    del self.workers[index]
+                    if process.exitcode != 0 and not self.stopping:
+                        self.log('Worker %d exited with status %s, restarting it.' % (index, process.exitcode))
+                        self.start_worker(index)
+                if time.monotonic() >= next_recovery:
+                    self.recover()
+                    next_recovery = time.monotonic() + settings.JOB_LEASE_SECONDS / 2
+                time.sleep(min(self.poll_interval, 1.0))
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            connections.close_all()
+
+    def recover(self):
+        recovered = requeue_stale_jobs()
+        if recovered:
+            self.log('Recovered %d job(s) whose worker stopped responding.' % recovered)
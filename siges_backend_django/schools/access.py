@@ -0,0 +1,146 @@
+from functools import cached_property
+
+from django.apps import apps
+
+from sharding.shards import each_shard
+from .models import School
+
+
+class AccessContext:
+    """
+    What the requesting user is allowed to reach, resolved at most once per request.
+
+    Permission classes, serializers and views consult this object instead of
+    running their own directed_schools/parents queries, so authorisation costs
+    a constant number of queries however many objects are checked:
+    one query for a director's schools and levels (none for the schools alone
+    when the token carries them), one for a parent's children, none for a
+    super admin.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.user_id = getattr(user, 'pk', None)
+        self.role = getattr(user, 'role', None) if user and user.is_authenticated else None
+
+    @property
+    def is_super_admin(self):
+        return self.role == 'super_admin_group'
+
+    @property
+    def is_director(self):
+        return self.role == 'director'
+
+    @property
+    def is_parent(self):
+        return self.role == 'parent'
+
+    @property
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+    def _director_scope_rows(self):
+        # LEFT JOIN on levels: one round-trip gives both sets, schools without levels included
+        return School.objects.filter(director_id=self.user_id).values_list('pk', 'levels__pk')
+
+    @staticmethod
+    def _scope_of_rows(rows):
+        school_ids, level_ids = set(), set()
+        for school_id, level_id in rows:
+            school_ids.add(school_id)
+            if level_id is not None:
+                level_ids.add(level_id)
+        return frozenset(school_ids), frozenset(level_ids)
+
+    @cached_property
+    def _director_scope(self):
+        return self._scope_of_rows(self._director_scope_rows() if self.is_director else ())
+
+    def _child_ids_query(self):
+        Student = apps.get_model('students', 'Student')
+        through = Student.parents.through
+        return through.objects.filter(customuser_id=self.user_id).values_list('student_id', flat=True)
+
+    async def aload(self):
+        """
+        Resolves, through the async ORM, what the properties would query, so
+        that async views can use them (sync queries cannot run there).
+        """
+        if self.is_director and '_director_scope' not in self.__dict__:
+            self.__dict__['_director_scope'] = self._scope_of_rows([row async for row in self._director_scope_rows()])
+        if self.is_parent and 'child_ids' not in self.__dict__:
+            child_ids = set()
+            for _ in each_shard(): # Every shard, with sharding
+                child_ids.update([pk async for pk in self._child_ids_query()])
+            self.__dict__['child_ids'] = frozenset(child_ids)
+        return self
+
+    @property
+    def school_ids(self):
+        """Ids of the schools directed by the user (empty for other roles)."""
+        if not self.is_director:
+            return frozenset()
+        # Users authenticated from a SchoolAccessToken carry their schools as a claim
+        claimed = getattr(self.user, 'school_ids', None)
+        if claimed is not None:
+            return claimed
+        return self._director_scope[0]
+
+    @property
+    def level_ids(self):
+        """Ids of the levels belonging to the user's directed schools."""
+        return self._director_scope[1]
+
+    @cached_property
+    def child_ids(self):
+        """Ids of the students the user is a parent of (empty for other roles)."""
+        if not self.is_parent:
+            return frozenset()
+        return frozenset(pk for _ in each_shard() for pk in self._child_ids_query()) # Every shard, with sharding
+
+    def can_manage_school(self, school_id):
+        if self.is_super_admin:
+            return True
+        return self.is_director and school_id in self.school_ids
+
+    def can_manage_level(self, level_id):
+        if self.is_super_admin:
+            return True
+        return self.is_director and level_id in self.level_ids
+
+    def can_take_attendance(self, school_class):
+        """Teachers take the roll of the classes they teach; directors and super admins of the classes they manage."""
+        if self.is_teacher:
+            return school_class.teacher_id == self.user_id
+        # From the school of the class (school_class.level loaded): the token's schools, no level query
+        return self.can_manage_school(school_class.level.school_id)
+
+    def can_view_student(self, student):
+        """
+        Parents see their own children; directors and super admins see what they manage.
+        For directors, student.school_class should already be loaded (select_related).
+        """
+        if self.is_parent:
+            return student.pk in self.child_ids
+        return self.can_manage_student(student)
+
+    def can_manage_student(self, student):
+        if self.is_super_admin:
+            return True
+        return self.is_director and student.school_class.level_id in self.level_ids
+
+
+def get_access_context(request):
+    """
+    Returns the AccessContext of the request, creating it on first use.
+
+    The context is stored on the underlying HttpRequest so that the DRF
+    Request, the permission classes and the serializers all share it.
+    """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    context = getattr(http_request, 'siges_access_context', None)
+    if context is None or context.user is not user:
+        context = AccessContext(user)
+        http_request.siges_access_context = context
+    return context
@@ -6,6 +6,7 @@ class SchoolAdmin(admin.ModelAdmin):
     list_display = ('name', 'address', 'director', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('name', 'director__email')
+    list_select_related = ('director',)
 
 @admin.register(Level)
 class LevelAdmin(admin.ModelAdmin):
@@ -14,6 +15,10 @@ class LevelAdmin(admin.ModelAdmin):
     search_fields = ('name', 'school__name')
     ordering = ('school__name', 'name')
 
+    def get_queryset(self, request):
+        # Level.__str__ uses school.name (changelist, autocomplete and related widgets)
+        return super().get_queryset(request).select_related('school')
+
 @admin.register(SchoolClass)
 class SchoolClassAdmin(admin.ModelAdmin):
     list_display = ('name', 'level_display', 'academic_year')
@@ -21,6 +26,10 @@ class SchoolClassAdmin(admin.ModelAdmin):
     search_fields = ('name', 'level__name', 'academic_year')
     ordering = ('level__school__name', 'level__name', 'name')
 
+    def get_queryset(self, request):
+        # level_display and SchoolClass.__str__ (used by the Student autocomplete) walk level.school
+        return super().get_queryset(request).select_related('level__school')
+
     def level_display(self, obj):
         return f"{obj.level.name} ({obj.level.school.name})"
     level_display.short_description = "Level (School)"
@@ -0,0 +1,33 @@
+"""Async school hierarchy tree (see siges_backend_django/asyncapi.py), the payload and ETag of SchoolViewSet.tree."""
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import NotFound, PermissionDenied
+
+from siges_backend_django.asyncapi import AsyncAPIView, etag_matches
+from .access import get_access_context
+from .hierarchy import aget_school_tree, aget_tree_version, tree_etag
+from .models import School
+from .permissions import IsDirector, IsSuperAdminGroup
+
+
+class AsyncSchoolTreeView(AsyncAPIView):
+    permission_classes = [IsSuperAdminGroup | IsDirector] # Narrowed to the director's schools in get()
+    query_budget = 6 # As SchoolViewSet.tree, +1 for the director's levels loaded by AccessContext.aload()
+    read_from_replica = True
+
+    async def get(self, request, pk):
+        try:
+            school = await School.objects.only('id', 'name').aget(pk=pk)
+        except School.DoesNotExist:
+            raise NotFound('No School matches the given query.')
+        if not get_access_context(request).can_manage_school(school.pk):
+            raise PermissionDenied("You can only read the tree of your school(s).")
+        academic_year = request.query_params.get('academic_year')
+        version = await aget_tree_version(school.pk)
+        etag = tree_etag(school.pk, version, academic_year)
+
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+        return self.render(await aget_school_tree(school, version, academic_year), headers={'ETag': etag})
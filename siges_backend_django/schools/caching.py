@@ -0,0 +1,35 @@
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    Returns the current value of a version (generation) counter stored in the cache.
+
+    Cached data is stored under keys that embed this version, so bumping the
+    counter invalidates every entry at once without having to find them.
+    A missing counter is initialised from the clock rather than from 1, so an
+    evicted counter never goes back to a version that is still cached.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    """get_version() for async views."""
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError: # Counter missing or evicted
+        cache.set(key, int(time.time() * 1000), None)
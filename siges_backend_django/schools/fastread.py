@@ -0,0 +1,207 @@
+"""
+Fast read path for list endpoints: rows rendered from values() instead of
+serializer.to_representation().
+
+ModelSerializer renders every row through one get_attribute() and one
+to_representation() call per field, and PrimaryKeyRelatedField(many=True)
+walks prefetched model instances. A ValuesPlan is built once per request from
+the serializer's fields (so ?fields=/?expand= apply) and renders plain dicts
+from values() rows: conversions are only applied where the serializer field
+would change the value (dates), every to-many field costs one grouped query
+for the page, and the JSON is the same as the serializer's, key order included.
+
+Serializers whose fields cannot be read from columns (methods, properties,
+source='*', overridden to_representation) are not planned: the view falls
+back to the serializer. Retrieve stays on the serializer, which renders the
+instance the object permissions were checked against.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .fieldsets import related_ordering
+
+# to_representation() implementations returning the database value unchanged (None is never converted)
+IDENTITY_REPRESENTATIONS = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.ChoiceField.to_representation,
+    serializers.ReadOnlyField.to_representation,
+    PrimaryKeyRelatedField.to_representation,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+def representation(field):
+    """The field's conversion of a non-null database value, None when it is the identity."""
+    method = type(field).to_representation
+    if method not in IDENTITY_REPRESENTATIONS:
+        return field.to_representation
+    if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is not None:
+        return field.to_representation
+    return None
+
+
+class ToMany:
+    """A rendered to-many field: the related pks, or the related objects when expanded."""
+
+    def __init__(self, model_field, plan):
+        self.related_model = model_field.related_model
+        # Lookup from the related model back to the owner
+        self.owner_lookup = model_field.field.name if model_field.auto_created else model_field.related_query_name()
+        self.plan = plan
+
+    def query(self, owner_ids):
+        related = self.related_model._default_manager.filter(**{self.owner_lookup + '__in': owner_ids}) \
+            .order_by(*related_ordering(self.related_model))
+        if self.plan is None:
+            return related.values_list(self.owner_lookup, 'pk')
+        return related.values(self.owner_lookup, *self.plan.columns)
+
+    def group(self, rows):
+        items = {}
+        if self.plan is None:
+            for owner_id, pk in rows:
+                items.setdefault(owner_id, []).append(pk)
+            return items
+        for row in rows:
+            items.setdefault(row[self.owner_lookup], []).append(self.plan.render_row(row))
+        return items
+
+    def load(self, owner_ids):
+        """{owner id: [rendered item, ...]} with one query."""
+        rows = list(self.query(owner_ids))
+        if self.plan is not None:
+            self.plan.load(rows)
+        return self.group(rows)
+
+    async def aload(self, owner_ids):
+        # values_list() runs its query when aiterator() starts: fetched whole, through the async interface
+        rows = [row async for row in self.query(owner_ids)]
+        if self.plan is not None:
+            await self.plan.aload(rows)
+        return self.group(rows)
+
+
+class ValuesPlan:
+    """How to render a serializer's fields from values() rows, columns prefixed for nested objects."""
+
+    def __init__(self, serializer, prefix=''):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise Unsupported('%s overrides to_representation()' % type(serializer).__name__)
+        opts = serializer.Meta.model._meta
+        self.pk_column = prefix + opts.pk.name
+        self.columns = [self.pk_column]
+        self.fields = [] # (name, column, conversion) | (name, ValuesPlan, None) | (name, ToMany, None)
+        self.to_many = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                raise Unsupported('%s.%s is not a model field' % (type(serializer).__name__, name))
+
+            if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+                if not (model_field.many_to_many or model_field.one_to_many):
+                    raise Unsupported('%s.%s is not a to-many relation' % (type(serializer).__name__, name))
+                if isinstance(field, serializers.ListSerializer):
+                    to_many = ToMany(model_field, ValuesPlan(field.child))
+                elif representation(field.child_relation) is None and isinstance(field.child_relation, PrimaryKeyRelatedField):
+                    to_many = ToMany(model_field, None)
+                else:
+                    raise Unsupported('%s.%s renders related objects' % (type(serializer).__name__, name))
+                self.to_many.append((name, to_many))
+                self.fields.append((name, to_many, None))
+            elif isinstance(field, serializers.BaseSerializer):
+                plan = ValuesPlan(field, prefix + field.source + '__')
+                self.columns += [column for column in plan.columns if column not in self.columns]
+                self.fields.append((name, plan, None))
+            else:
+                if model_field.is_relation and not isinstance(field, PrimaryKeyRelatedField):
+                    raise Unsupported('%s.%s renders the related object' % (type(serializer).__name__, name))
+                column = prefix + field.source
+                if column not in self.columns:
+                    self.columns.append(column)
+                self.fields.append((name, column, representation(field)))
+
+    def load(self, rows):
+        """Runs the grouped queries of the to-many fields for these rows (nested objects included)."""
+        self.related = {}
+        owner_ids = {row[self.pk_column] for row in rows} - {None}
+        for name, to_many in self.to_many:
+            self.related[name] = to_many.load(owner_ids) if owner_ids else {}
+        for name, plan, _ in self.fields:
+            if isinstance(plan, ValuesPlan):
+                plan.load(rows)
+
+    async def aload(self, rows):
+        """load() for async views."""
+        self.related = {}
+        owner_ids = {row[self.pk_column] for row in rows} - {None}
+        for name, to_many in self.to_many:
+            self.related[name] = await to_many.aload(owner_ids) if owner_ids else {}
+        for name, plan, _ in self.fields:
+            if isinstance(plan, ValuesPlan):
+                await plan.aload(rows)
+
+    def render_row(self, row):
+        if row[self.pk_column] is None:
+            return None # Null foreign key of a nested object
+        data = {}
+        for name, source, conversion in self.fields:
+            if isinstance(source, str):
+                value = row[source]
+                data[name] = conversion(value) if conversion is not None and value is not None else value
+            elif isinstance(source, ValuesPlan):
+                data[name] = source.render_row(row)
+            else:
+                data[name] = self.related[name].get(row[self.pk_column], [])
+        return data
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def render(self, rows):
+        rows = list(rows)
+        self.load(rows)
+        return [self.render_row(row) for row in rows]
+
+    async def arender(self, rows):
+        await self.aload(rows)
+        return [self.render_row(row) for row in rows]
+
+
+def get_values_plan(serializer):
+    """The ValuesPlan of the serializer, None when its fields need the serializer path."""
+    try:
+        return ValuesPlan(serializer)
+    except Unsupported:
+        return None
+
+
+class FastReadViewMixin:
+    """
+    ListModelMixin override rendering list pages with a ValuesPlan. Views opt
+    in with fast_read = True; ?fast_read=0 forces the serializer path.
+    """
+    fast_read = False
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read or request.query_params.get('fast_read') == '0':
+            return super().list(request, *args, **kwargs)
+        plan = get_values_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = plan.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+        return Response(plan.render(queryset))
@@ -0,0 +1,174 @@
+"""
+Sparse fieldsets: ?fields= and ?expand= on the API's model serializers.
+
+    ?fields=id,first_name,last_name        render these fields only
+    ?expand=school_class.level             render the class instead of its pk, and the class's level
+    ?expand=school_class&fields=id,school_class.name
+                                           dotted fields narrow an expanded object
+
+Serializers opt in with SparseFieldsetMixin and declare their
+expandable_fields. Viewsets with SparseFieldsetViewMixin push the selection
+down into the queryset: only() the columns rendered, select_related() the
+foreign keys that are expanded (or rendered as objects), prefetch_related()
+the to-many fields that are rendered, so that a narrow request reads narrow
+rows and an expansion costs no extra query per row.
+
+Selections only apply to safe requests; writes validate and render the
+serializer's full field set.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_paths(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in path.split('.'):
+            name = name.strip()
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def requested_fieldsets(request):
+    """(fields, expand) trees of the request; fields is None when every field is wanted."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    fields = request.query_params.get('fields')
+    return (parse_field_paths(fields) or None) if fields else None, parse_field_paths(request.query_params.get('expand'))
+
+
+def related_ordering(model):
+    """Order of the related objects of a rendered to-many field (the model's, else pk): stable output."""
+    return list(model._meta.ordering) or [model._meta.pk.name]
+
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin rendering the fields selected by ?fields= and ?expand=.
+
+    The selection is read from the request of the serializer's context, or
+    given explicitly with the fields= and expand= arguments (trees as returned
+    by parse_field_paths(); nested expansions receive theirs this way).
+    """
+    # Field name -> serializer class rendering the related object(s) when expanded
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            fields, expand = requested_fieldsets(self.context.get('request'))
+        self.requested_fields = fields
+        self.requested_expand = expand or {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        unknown = set(self.requested_expand) - set(self.expandable_fields)
+        if unknown:
+            raise serializers.ValidationError({'expand': 'Cannot expand %s.' % ', '.join(sorted(unknown))})
+
+        for name, nested_expand in self.requested_expand.items():
+            field = fields[name]
+            nested_fields = (self.requested_fields or {}).get(name) or None
+            fields[name] = self.expandable_fields[name](
+                many=isinstance(field, serializers.ManyRelatedField), read_only=True,
+                fields=nested_fields, expand=nested_expand, **({'source': field.source} if field.source else {}),
+            )
+
+        if self.requested_fields is None:
+            return fields
+        unknown = set(self.requested_fields) - set(fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': 'Unknown field(s): %s.' % ', '.join(sorted(unknown))})
+        narrowed = sorted(name for name, nested in self.requested_fields.items() if nested and name not in self.requested_expand)
+        if narrowed:
+            raise serializers.ValidationError({'fields': 'Expand %s to select its fields.' % ', '.join(narrowed)})
+        return {
+            name: field for name, field in fields.items()
+            if name in self.requested_fields or name in self.requested_expand
+        }
+
+    def get_projection(self):
+        """
+        (only, select_related, prefetch_related) lookups, relative to Meta.model,
+        reading what self.fields render. only is None when a field is not a
+        model field (a method, a property, source='*'): every column is loaded.
+        """
+        opts = self.Meta.model._meta
+        only, select_related, prefetch_related = [opts.pk.name], [], []
+        for field in self.fields.values():
+            if field.write_only:
+                continue
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                only = None
+                continue
+            to_many = model_field.many_to_many or model_field.one_to_many
+            child = getattr(field, 'child', None) or getattr(field, 'child_relation', None) or field
+
+            if to_many:
+                related_model = model_field.related_model
+                # A reverse foreign key needs its column to match the prefetched rows to their instance
+                required = [model_field.field.name] if model_field.one_to_many else []
+                related = related_model._default_manager.order_by(*related_ordering(related_model))
+                if isinstance(child, SparseFieldsetMixin):
+                    related = child.project(related, required=required)
+                elif isinstance(child, serializers.PrimaryKeyRelatedField):
+                    related = related.only(related_model._meta.pk.name, *required)
+                prefetch_related.append(Prefetch(field.source, queryset=related))
+            elif model_field.is_relation:
+                if only is not None:
+                    only.append(field.source)
+                if isinstance(child, SparseFieldsetMixin):
+                    nested_only, nested_select, nested_prefetch = child.get_projection()
+                    select_related += [field.source] + ['%s__%s' % (field.source, lookup) for lookup in nested_select]
+                    if only is not None and nested_only is not None:
+                        only += ['%s__%s' % (field.source, lookup) for lookup in nested_only]
+                    prefetch_related += [
+                        Prefetch('%s__%s' % (field.source, prefetch.prefetch_through), queryset=prefetch.queryset)
+                        for prefetch in nested_prefetch
+                    ]
+                elif not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    select_related.append(field.source) # Rendered from the related object (nested serializer, __str__)
+            elif only is not None:
+                only.append(field.source)
+        return only, select_related, prefetch_related
+
+    def project(self, queryset, defer=True, required=()):
+        """
+        The queryset loading what the selected fields render, plus the required
+        columns; defer=False keeps every column.
+        """
+        only, select_related, prefetch_related = self.get_projection()
+        if defer and only is not None:
+            queryset = queryset.only(*only, *required)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class SparseFieldsetViewMixin:
+    """
+    GenericAPIView mixin pushing the serializer's ?fields=/?expand= selection
+    down into the queryset of list and retrieve.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        action = getattr(self, 'action', None)
+        serializer_class = self.get_serializer_class()
+        if action not in ('list', 'retrieve') or not issubclass(serializer_class, SparseFieldsetMixin):
+            return queryset
+        serializer = serializer_class(context=self.get_serializer_context())
+        if action == 'list':
+            # What get_queryset() joined or prefetched for rendering is replaced by what the selection needs
+            return serializer.project(queryset.select_related(None).prefetch_related(None))
+        # Object permissions may read any column or join of the instance: keep them, prefetches are replaced
+        return serializer.project(queryset.prefetch_related(None), defer=False)
@@ -0,0 +1,102 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from sharding.shards import shard_for_school
+from .caching import aget_version, bump_version, get_version
+from .models import Level, SchoolClass
+
+
+def tree_version_key(school_id):
+    return 'school-tree-version:%s' % school_id
+
+
+def get_tree_version(school_id):
+    return get_version(tree_version_key(school_id))
+
+
+async def aget_tree_version(school_id):
+    return await aget_version(tree_version_key(school_id))
+
+
+def tree_etag(school_id, version, academic_year=None):
+    return '"tree-%s-%s-%s"' % (school_id, version, academic_year or '')
+
+
+def invalidate_school_trees(school_ids):
+    for school_id in set(school_ids):
+        if school_id is not None:
+            bump_version(tree_version_key(school_id))
+
+
+def tree_queries(school, academic_year=None):
+    """The levels, classes and active-student counts queries of a school tree."""
+    Student = apps.get_model('students', 'Student')
+    levels = Level.objects.filter(school=school).order_by('name').values('id', 'name', 'cycle')
+    classes = SchoolClass.objects.filter(level__school=school).order_by('name')
+    counts = Student.objects.filter(school_class__level__school=school, status='ACTIVE')
+    shard = shard_for_school(school.pk)
+    if shard is not None:
+        counts = counts.using(shard) # The school's students are on its shard
+    if academic_year:
+        classes = classes.filter(academic_year=academic_year)
+        counts = counts.filter(school_class__academic_year=academic_year)
+    return levels, classes.values('id', 'name', 'academic_year', 'level_id'), \
+        counts.order_by().values_list('school_class_id').annotate(total=Count('id'))
+
+
+def assemble_school_tree(school, levels, classes, counts):
+    counts = dict(counts)
+    classes_by_level = {}
+    for school_class in classes:
+        level_id = school_class.pop('level_id')
+        school_class['active_students'] = counts.get(school_class['id'], 0)
+        classes_by_level.setdefault(level_id, []).append(school_class)
+    for level in levels:
+        level['classes'] = classes_by_level.get(level['id'], [])
+    return {'id': school.pk, 'name': school.name, 'levels': levels}
+
+
+def build_school_tree(school, academic_year=None):
+    """
+    Builds the School -> Level -> SchoolClass tree with the number of active students per class.
+    Three queries: levels, classes and one grouped Count over students.
+    """
+    levels, classes, counts = tree_queries(school, academic_year)
+    return assemble_school_tree(school, list(levels), classes, counts)
+
+
+async def abuild_school_tree(school, academic_year=None):
+    """build_school_tree() for async views."""
+    levels, classes, counts = tree_queries(school, academic_year)
+    return assemble_school_tree(
+        school,
+        [level async for level in levels.aiterator()],
+        [school_class async for school_class in classes.aiterator()],
+        [count async for count in counts], # values_list() cannot be streamed with aiterator()
+    )
+
+
+def school_tree_key(school, version, academic_year=None):
+    return 'school-tree:%s:%s:%s' % (school.pk, version, academic_year or '')
+
+
+def get_school_tree(school, version, academic_year=None):
+    """Returns the tree from the cache, building it once per version of the school's structure."""
+    key = school_tree_key(school, version, academic_year)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_school_tree(school, academic_year)
+        cache.set(key, tree, getattr(settings, 'SCHOOL_TREE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return tree
+
+
+async def aget_school_tree(school, version, academic_year=None):
+    """get_school_tree() for async views."""
+    key = school_tree_key(school, version, academic_year)
+    tree = await cache.aget(key)
+    if tree is None:
+        tree = await abuild_school_tree(school, academic_year)
+        await cache.aset(key, tree, getattr(settings, 'SCHOOL_TREE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return tree
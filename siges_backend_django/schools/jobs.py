@@ -0,0 +1,16 @@
+"""Background jobs of the schools app (see jobs/queue.py)."""
+from jobs.queue import JobFailed, register
+from .rollover import AcademicYearRollover, RolloverError
+
+
+@register('schools.rollover', max_attempts=1) # Runs in one transaction, but a retry after a commit would roll over twice
+def rollover(job):
+    """Runs the academic year rollover validated by POST /api/schools/rollover/."""
+    payload = job.payload
+    try:
+        rollover = AcademicYearRollover(
+            payload['from_year'], payload.get('to_year'), payload.get('school_ids'), progress=job.report_progress
+        )
+        return rollover.run(dry_run=payload.get('dry_run', False))
+    except RolloverError as error:
+        raise JobFailed(str(error))
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database onto the replica aliases (settings.DATABASE_REPLICAS) with "
+        "SQLite's online backup API: a local stand-in for replication, repeated with --interval to simulate lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Copy again every INTERVAL seconds until interrupted.")
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError("No replica configured: set SIGES_REPLICA_DB to the replica's file path.")
+        for alias in [DEFAULT_DB_ALIAS] + replicas:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError("'%s' is not an SQLite database." % alias)
+
+        while True:
+            start = time.perf_counter()
+            primary = connections[DEFAULT_DB_ALIAS]
+            primary.ensure_connection()
+            for alias in replicas:
+                # Writes through a plain connection: the replica's own connections are query_only
+                target = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+            self.stdout.write('Copied the primary to %s in %.2fs' % (', '.join(replicas), time.perf_counter() - start))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.rollover import AcademicYearRollover, RolloverError
+
+
+class Command(BaseCommand):
+    help = (
+        "Closes an academic year: clones its classes into the next year, promotes the active students "
+        "to the successor level and graduates those of the last level, in one transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_year', help="Academic year being closed, e.g. 2024-2025.")
+        parser.add_argument('--to-year', help="New academic year (default: the following one).")
+        parser.add_argument('--school', type=int, action='append', dest='school_ids',
+                            help="Only roll over this school, repeatable (default: every school).")
+        parser.add_argument('--dry-run', action='store_true', help="Print what would change without writing anything.")
+        parser.add_argument('--json', action='store_true', help="Print the full report (every move) as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            rollover = AcademicYearRollover(
+                options['from_year'], options['to_year'], options['school_ids'],
+                progress=lambda message: self.stderr.write(message),
+            )
+            report = rollover.run(dry_run=options['dry_run'])
+        except RolloverError as error:
+            raise CommandError(str(error))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for move in report['moves']:
+            self.stdout.write('  %(level)s %(class)s -> %(to_level)s %(to_class)s: %(students)d students' % move)
+        for graduation in report['graduations']:
+            self.stdout.write('  %(level)s %(class)s: %(students)d students graduate' % graduation)
+        for entry in report['skipped']:
+            self.stdout.write(self.style.WARNING('  %(level)s %(class)s: %(students)d students left in place (%(reason)s)' % entry))
+        summary = (
+            '%(from_year)s -> %(to_year)s, %(schools)d schools: %(students_promoted)d students promoted, '
+            '%(students_graduated)d graduated, %(students_skipped)d left in place, ' % report
+        ) + '%d classes created.' % len(report['classes_to_create'])
+        if report['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run, nothing written. ' + summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0003_alter_school_director_level_schoolclass'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='level',
+            index=models.Index(fields=['school', 'name', 'id'], name='level_school_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['name', 'id'], name='school_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolclass',
+            index=models.Index(fields=['level', 'name', 'id'], name='class_level_name_idx'),
+        ),
+    ]
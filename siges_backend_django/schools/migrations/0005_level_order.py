@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+# Promotion order of the standard levels; other levels keep 0 and are left out of rollovers
+STANDARD_LEVEL_ORDER = {'PS': 1, 'MS': 2, 'GS': 3, 'CP1': 4, 'CP2': 5, 'CE1': 6, 'CE2': 7, 'CM1': 8, 'CM2': 9}
+
+
+def set_standard_level_order(apps, schema_editor):
+    Level = apps.get_model('schools', 'Level')
+    for name, order in STANDARD_LEVEL_ORDER.items():
+        Level.objects.filter(name__iexact=name).update(order=order)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0004_level_level_school_name_idx_school_school_name_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='level',
+            name='order',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(set_standard_level_order, migrations.RunPython.noop),
+    ]
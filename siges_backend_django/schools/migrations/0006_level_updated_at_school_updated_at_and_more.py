@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0005_level_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='level',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='level',
+            index=models.Index(fields=['updated_at', 'id'], name='level_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['updated_at', 'id'], name='school_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolclass',
+            index=models.Index(fields=['updated_at', 'id'], name='class_updated_idx'),
+        ),
+    ]
@@ -15,6 +15,13 @@ class School(models.Model):
     )
     logo_url = models.URLField(max_length=200, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True) # Delta sync (see sync/changes.py)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='school_name_idx'), # Keyset pagination key
+            models.Index(fields=['updated_at', 'id'], name='school_updated_idx'), # Delta sync key
+        ]
 
     def __str__(self):
         return self.name
@@ -28,10 +35,17 @@ class Level(models.Model):
     name = models.CharField(max_length=100) # Ex: CP1, CE2, CM2
     school = models.ForeignKey(School, related_name='levels', on_delete=models.CASCADE)
     cycle = models.CharField(max_length=20, choices=CYCLE_CHOICES, default='PRIMARY')
+    # Rang de promotion dans l'école, tous cycles confondus (PS=1 ... CM2=9) ; 0 = hors passage de classe
+    order = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True) # Delta sync (see sync/changes.py)
 
     class Meta:
         unique_together = ('name', 'school') # Un niveau est unique par nom au sein d'une école
         ordering = ['school', 'name']
+        indexes = [
+            models.Index(fields=['school', 'name', 'id'], name='level_school_name_idx'), # Keyset pagination key
+            models.Index(fields=['updated_at', 'id'], name='level_updated_idx'), # Delta sync key
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.school.name})"
@@ -40,20 +54,25 @@ class SchoolClass(models.Model): # Renommé pour éviter conflit avec 'class'
     name = models.CharField(max_length=100) # Ex: CM2 A, CE1 B
     level = models.ForeignKey(Level, related_name='classes', on_delete=models.CASCADE)
     academic_year = models.CharField(max_length=9, help_text="Ex: 2023-2024") # Simple CharField pour MVP
-    # teacher = models.ForeignKey(
-    #     settings.AUTH_USER_MODEL,
-    #     on_delete=models.SET_NULL,
-    #     null=True,
-    #     blank=True,
-    #     related_name='taught_classes',
-    #     limit_choices_to={'role': 'teacher'}
-    # ) # Optionnel pour cette étape
+    teacher = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='taught_classes',
+        limit_choices_to={'role': 'teacher'}
+    ) # Takes the roll of the class (see attendance/permissions.py)
+    updated_at = models.DateTimeField(auto_now=True) # Delta sync (see sync/changes.py)
 
     class Meta:
         verbose_name = "Class"
         verbose_name_plural = "Classes"
         unique_together = ('name', 'level', 'academic_year') # Une classe est unique par nom, niveau et année scolaire
         ordering = ['level__school__name', 'level__name', 'name'] # Corrected ordering for deeper relation
+        indexes = [
+            models.Index(fields=['level', 'name', 'id'], name='class_level_name_idx'), # Keyset pagination key
+            models.Index(fields=['updated_at', 'id'], name='class_updated_idx'), # Delta sync key
+        ]
 
 
     def __str__(self):
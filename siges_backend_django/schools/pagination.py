@@ -0,0 +1,196 @@
+import base64
+import functools
+import heapq
+import itertools
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over the queryset's full composite ordering.
+
+    The ordering is read from the queryset returned by the view's
+    get_queryset() (falling back to the model's Meta.ordering), and 'id' is
+    appended as a final tie-breaker. The opaque cursor holds the complete
+    ordering key of the boundary row, so every page is fetched with a plain
+    "WHERE key > cursor ORDER BY key LIMIT n" and page N costs the same as
+    page 1 (no OFFSET scans).
+
+    Ordering fields must be non-nullable for the comparisons to be exact.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    key_prefix = '_keyset_'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'KEYSET_PAGINATION_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'KEYSET_PAGINATION_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views."""
+        return self.set_page([row async for row in self.page_queryset(queryset, request).aiterator()])
+
+    def page_queryset(self, queryset, request):
+        """The query of the requested page, with one row more than the page to tell whether another follows."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.key_values, self.reverse = self.decode_cursor(request)
+
+        queryset = queryset.annotate(**{
+            self.key_prefix + str(index): F(field) for index, (field, _) in enumerate(self.ordering)
+        })
+        if self.key_values is not None:
+            queryset = queryset.filter(self.build_keyset_filter(self.key_values, self.reverse))
+        queryset = queryset.order_by(*[
+            ('-' if descending != self.reverse else '') + field for field, descending in self.ordering
+        ])
+        return queryset[:self.limit + 1]
+
+    def merge_pages(self, pages):
+        """
+        paginate_queryset() for the page_queryset() rows of several databases
+        (see sharding/views.py): merged in key order, then paged as one.
+        """
+        merged = heapq.merge(*pages, key=functools.cmp_to_key(self.compare_rows))
+        return self.set_page(list(itertools.islice(merged, self.limit + 1)))
+
+    def compare_rows(self, row, other):
+        """Compares two rows as the ORDER BY of page_queryset() does."""
+        for (field, descending), value, other_value in zip(self.ordering, self.get_key(row), self.get_key(other)):
+            if value != other_value:
+                order = -1 if value < other_value else 1
+                return -order if descending != self.reverse else order
+        return 0
+
+    def set_page(self, results):
+        key_values = self.key_values
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = key_values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = key_values is not None
+
+        self.first_key = self.get_key(results[0]) if results else key_values
+        self.last_key = self.get_key(results[-1]) if results else key_values
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return min(self.page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Returns the ordering as a list of (field, descending) pairs, always
+        ending with 'id' so that the key is unique.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        result = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?':
+                raise ImproperlyConfigured(
+                    'KeysetPagination only supports plain field names in order_by(), got %r.' % (item,)
+                )
+            descending = item.startswith('-')
+            field = item.lstrip('-')
+            if field == 'pk':
+                field = 'id'
+            result.append((field, descending))
+        if 'id' not in [field for field, _ in result]:
+            result.append(('id', False))
+        return result
+
+    def build_keyset_filter(self, key_values, reverse):
+        """
+        Expands (a, b, c) > (x, y, z) into
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        flipping the comparison for descending fields and previous pages.
+        """
+        if len(key_values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        keyset_filter = Q()
+        equal_so_far = Q()
+        for (field, descending), value in zip(self.ordering, key_values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            keyset_filter |= equal_so_far & Q(**{'%s__%s' % (field, lookup): value})
+            equal_so_far &= Q(**{field: value})
+        return keyset_filter
+
+    def get_key(self, row):
+        keys = [self.key_prefix + str(index) for index in range(len(self.ordering))]
+        if isinstance(row, dict):
+            return [row[key] for key in keys]
+        return [getattr(row, key) for key in keys]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return list(payload['k']), bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key_values, reverse=False):
+        payload = {'k': key_values}
+        if reverse:
+            payload['r'] = True
+        data = json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+        encoded = base64.urlsafe_b64encode(data).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor(self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self.encode_cursor(self.first_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
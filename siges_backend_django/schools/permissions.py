@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from .models import Level, SchoolClass # Import models for isinstance check
+from .access import get_access_context
 
 class IsSuperAdminGroup(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -9,6 +10,10 @@ class IsDirector(permissions.BasePermission): # Generally for view-level checks
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and hasattr(request.user, 'role') and request.user.role == 'director'
 
+class IsParent(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and hasattr(request.user, 'role') and request.user.role == 'parent'
+
 class IsDirectorOfSchoolOrSuperAdminGroup(permissions.BasePermission): # For School objects
     def has_object_permission(self, request, view, obj): 
         if request.method in permissions.SAFE_METHODS: 
@@ -17,8 +22,8 @@ class IsDirectorOfSchoolOrSuperAdminGroup(permissions.BasePermission): # For Sch
             return False
         if request.user.role == 'super_admin_group':
             return True
-        # obj is a School instance
-        return request.user.role == 'director' and obj.director == request.user
+        # obj is a School instance; compare ids so the director row is not fetched
+        return request.user.role == 'director' and obj.director_id == request.user.pk
 
 class CanManageSchoolContent(permissions.BasePermission): # For Level and SchoolClass objects
     def has_permission(self, request, view): 
@@ -38,14 +43,12 @@ class CanManageSchoolContent(permissions.BasePermission): # For Level and School
             return False
         if request.user.role == 'super_admin_group':
             return True
-        
-        school_of_object = None
-        if isinstance(obj, Level):
-            school_of_object = obj.school
-        elif isinstance(obj, SchoolClass):
-            school_of_object = obj.level.school
-        
-        if school_of_object and request.user.role == 'director':
-            # Check if the object's school is one of the schools directed by the user
-            return request.user.directed_schools.filter(pk=school_of_object.pk).exists()
+
+        if request.user.role == 'director':
+            # Checked in memory against the schools/levels resolved once for this request
+            access = get_access_context(request)
+            if isinstance(obj, Level):
+                return access.can_manage_school(obj.school_id)
+            elif isinstance(obj, SchoolClass):
+                return access.can_manage_level(obj.level_id)
         return False
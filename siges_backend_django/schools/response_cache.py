@@ -0,0 +1,128 @@
+"""
+Response cache of the hierarchy reads (schools, levels, classes).
+
+A response is cached under its full URI (path and query parameters), the
+caller's role and reachable schools, and the generation counters of the
+schools it depends on (schools.caching): one counter per school, plus a
+network counter for the responses spanning every school. Any change to a
+school, level or class bumps the school's counter and the network counter
+once the transaction commits (see schools/signals.py), so the next read
+misses and rebuilds; older entries age out of the cache.
+
+Entries live in the settings.RESPONSE_CACHE_ALIAS cache (a LocMemCache is
+LRU-evicted past MAX_ENTRIES, and every backend applies its TIMEOUT, which
+also bounds how long a replica lagging behind an invalidation can be
+cached). Concurrent misses on the same key are coalesced: one request
+builds the response while the others wait for it (single-flight). Lookups
+are counted in the metrics registry by view and result.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from siges_backend_django.metrics import registry
+from .access import get_access_context
+from .caching import bump_version, get_version
+
+NETWORK_VERSION_KEY = 'response-cache-version:network'
+# A builder holding the lock longer than this is presumed dead: waiters build the response themselves
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.01
+
+
+def school_version_key(school_id):
+    return 'response-cache-version:school:%s' % school_id
+
+
+def invalidate_responses(school_ids=()):
+    """Invalidates the responses of these schools and those spanning the network, after commit."""
+    keys = [school_version_key(school_id) for school_id in set(school_ids) - {None}] + [NETWORK_VERSION_KEY]
+    transaction.on_commit(lambda: [bump_version(key) for key in keys])
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_or_build(cache, key, build, timeout=None):
+    """
+    Returns (value, outcome): the cached value ('hit'), the value built by
+    this call ('miss'), or by a concurrent call this one waited for
+    ('coalesced'). build() may return None to have nothing cached.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value, 'hit'
+    lock_key = key + ':lock'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value, 'coalesced'
+        if time.monotonic() > deadline:
+            return build(), 'miss'
+    try:
+        # The previous holder may have finished between our get() and add()
+        value = cache.get(key)
+        if value is not None:
+            return value, 'coalesced'
+        value = build()
+        if value is not None:
+            cache.set(key, value, timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return value, 'miss'
+    finally:
+        cache.delete(lock_key)
+
+
+class ResponseCacheMixin:
+    """
+    Viewset mixin caching the 200 responses of the actions listed in
+    cached_actions. Views narrow the counters a response depends on with
+    get_response_cache_schools().
+    """
+    cached_actions = ()
+
+    def get_response_cache_schools(self, request):
+        """Ids of the schools the response depends on; None when it spans the network."""
+        return None
+
+    def response_cache_key(self, request):
+        access = get_access_context(request)
+        reachable = '*' if access.is_super_admin else ','.join(map(str, sorted(access.school_ids)))
+        schools = self.get_response_cache_schools(request)
+        if schools is None:
+            versions = [get_version(NETWORK_VERSION_KEY)]
+        else:
+            versions = [get_version(school_version_key(school_id)) for school_id in sorted(schools)]
+        fingerprint = '%s|%s|%s|%s' % (request.build_absolute_uri(), access.role, reachable, versions)
+        return 'response:%s' % hashlib.sha256(fingerprint.encode()).hexdigest()
+
+    def cached(self, handler, request, *args, **kwargs):
+        if self.action not in self.cached_actions or request.method != 'GET':
+            return handler(request, *args, **kwargs)
+
+        built = []
+
+        def build():
+            built.append(handler(request, *args, **kwargs))
+            return built[-1].data if built[-1].status_code == 200 else None
+
+        data, outcome = get_or_build(get_response_cache(), self.response_cache_key(request), build)
+        registry.inc(
+            'siges_response_cache_total', (('view', '%s.%s' % (type(self).__name__, self.action)), ('result', outcome)),
+            help_text='Response cache lookups of the hierarchy reads, by result (hit, miss, coalesced).',
+        )
+        if data is None:
+            return built[-1] # Not a 200: nothing was cached, the response goes out as built
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,198 @@
+"""
+Academic-year rollover of a school network, set-based.
+
+For every level with a promotion order, the classes of the closing year are
+cloned into the new year, and the ACTIVE students of each class move to the
+class with the same position (by name) in the successor level, the level of
+the same school with the next order. Students of a school's last level are
+marked GRADUATED and keep their class. The whole operation is a handful of
+SELECTs, one INSERT and a few UPDATEs in one transaction, whatever the number
+of students; a dry run returns the same report without writing anything.
+"""
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, Count, Value, When
+from django.utils import timezone
+
+from sharding.shards import is_enabled as sharding_enabled
+from .hierarchy import invalidate_school_trees
+from .response_cache import invalidate_responses
+from .models import Level, SchoolClass
+
+ACADEMIC_YEAR_RE = re.compile(r'^(\d{4})-(\d{4})$')
+# Classes moved per UPDATE (one WHEN per class)
+UPDATE_CHUNK_SIZE = 500
+
+
+class RolloverError(ValueError):
+    pass
+
+
+def academic_year_start(year):
+    match = ACADEMIC_YEAR_RE.match(year or '')
+    if not match or int(match.group(2)) != int(match.group(1)) + 1:
+        raise RolloverError("'%s' is not an academic year such as 2024-2025." % year)
+    return int(match.group(1))
+
+
+def next_academic_year(year):
+    start = academic_year_start(year) + 1
+    return '%d-%d' % (start, start + 1)
+
+
+class AcademicYearRollover:
+    def __init__(self, from_year, to_year=None, school_ids=None, progress=None):
+        if sharding_enabled():
+            # Its queries join the students with the catalogue in one database
+            raise RolloverError('The academic year rollover does not support sharded student data yet.')
+        self.from_year = from_year
+        self.to_year = next_academic_year(from_year) if to_year is None else to_year
+        if academic_year_start(self.to_year) <= academic_year_start(self.from_year):
+            raise RolloverError('The new academic year must follow the closing one.')
+        self.school_ids = None if school_ids is None else set(school_ids)
+        self.progress = progress
+
+    def log(self, message):
+        if self.progress:
+            self.progress(message)
+
+    def load(self):
+        levels = Level.objects.all()
+        if self.school_ids is not None:
+            levels = levels.filter(school_id__in=self.school_ids)
+        self.levels = {level['id']: level for level in levels.values('id', 'school_id', 'name', 'order')}
+
+        classes = SchoolClass.objects.filter(level_id__in=list(self.levels))
+        self.source_classes = list(
+            classes.filter(academic_year=self.from_year).order_by('level_id', 'name').values('id', 'name', 'level_id')
+        )
+        self.target_classes = {
+            (school_class['level_id'], school_class['name']): school_class['id']
+            for school_class in classes.filter(academic_year=self.to_year).values('id', 'name', 'level_id')
+        }
+        Student = apps.get_model('students', 'Student')
+        self.active_counts = dict(
+            Student.objects.filter(school_class_id__in=[school_class['id'] for school_class in self.source_classes], status='ACTIVE')
+            .order_by().values_list('school_class_id').annotate(total=Count('id'))
+        )
+        self.log('%d levels, %d classes in %s, %d active students' % (
+            len(self.levels), len(self.source_classes), self.from_year, sum(self.active_counts.values())
+        ))
+
+    def successors(self):
+        """Level id -> id of the next level of the same school (None for the last level, missing when unordered)."""
+        by_school = defaultdict(list)
+        for level in self.levels.values():
+            if level['order'] > 0:
+                by_school[level['school_id']].append(level)
+        successors = {}
+        for school_levels in by_school.values():
+            school_levels.sort(key=lambda level: (level['order'], level['name']))
+            for current, following in zip(school_levels, school_levels[1:] + [None]):
+                successors[current['id']] = following['id'] if following else None
+        return successors
+
+    def plan(self):
+        """Computes the classes to create, the moves and the graduations without writing anything."""
+        self.load()
+        successors = self.successors()
+        classes_by_level = defaultdict(list)
+        for school_class in self.source_classes:
+            classes_by_level[school_class['level_id']].append(school_class)
+
+        # New-year classes of every level, in name order: existing ones plus clones of the closing year's
+        to_create = [
+            (school_class['level_id'], school_class['name']) for school_class in self.source_classes
+            if (school_class['level_id'], school_class['name']) not in self.target_classes
+        ]
+        targets_by_level = defaultdict(set)
+        for level_id, name in list(self.target_classes) + to_create:
+            targets_by_level[level_id].add(name)
+
+        moves, graduations, skipped = [], [], []
+        for level_id, level_classes in classes_by_level.items():
+            level = self.levels[level_id]
+            for position, school_class in enumerate(level_classes):
+                students = self.active_counts.get(school_class['id'], 0)
+                entry = {
+                    'school_id': level['school_id'], 'class_id': school_class['id'],
+                    'class': school_class['name'], 'level': level['name'], 'students': students,
+                }
+                if level_id not in successors:
+                    skipped.append(dict(entry, reason='Level %s has no promotion order.' % level['name']))
+                elif successors[level_id] is None:
+                    graduations.append(entry)
+                else:
+                    successor = self.levels[successors[level_id]]
+                    names = sorted(targets_by_level[successor['id']])
+                    if not names:
+                        skipped.append(dict(entry, reason='Level %s has no class in %s.' % (successor['name'], self.to_year)))
+                        continue
+                    moves.append(dict(
+                        entry, to_level_id=successor['id'], to_level=successor['name'],
+                        to_class=names[position % len(names)],
+                    ))
+        return {
+            'from_year': self.from_year,
+            'to_year': self.to_year,
+            'schools': len({level['school_id'] for level in self.levels.values()}),
+            'classes_to_create': [
+                {'level_id': level_id, 'level': self.levels[level_id]['name'], 'class': name} for level_id, name in to_create
+            ],
+            'moves': moves,
+            'graduations': graduations,
+            'skipped': skipped,
+            'students_promoted': sum(move['students'] for move in moves),
+            'students_graduated': sum(graduation['students'] for graduation in graduations),
+            'students_skipped': sum(entry['students'] for entry in skipped),
+        }
+
+    def run(self, dry_run=False):
+        with transaction.atomic():
+            report = self.plan()
+            report['dry_run'] = dry_run
+            if dry_run:
+                return report
+            self.apply(report)
+        return report
+
+    def apply(self, report):
+        Student = apps.get_model('students', 'Student')
+        created = SchoolClass.objects.bulk_create([
+            SchoolClass(level_id=entry['level_id'], name=entry['class'], academic_year=self.to_year)
+            for entry in report['classes_to_create']
+        ])
+        for school_class in created:
+            self.target_classes[(school_class.level_id, school_class.name)] = school_class.pk
+        self.log('%d classes created for %s' % (len(created), self.to_year))
+
+        destinations = {
+            move['class_id']: self.target_classes[(move['to_level_id'], move['to_class'])]
+            for move in report['moves'] if move['students']
+        }
+        source_ids = list(destinations)
+        for start in range(0, len(source_ids), UPDATE_CHUNK_SIZE):
+            chunk = source_ids[start:start + UPDATE_CHUNK_SIZE]
+            # One UPDATE for the whole chunk: every WHEN is evaluated against the rows' original class
+            Student.objects.filter(school_class_id__in=chunk, status='ACTIVE').update(school_class_id=Case(
+                *[When(school_class_id=source_id, then=Value(destinations[source_id])) for source_id in chunk]
+            ), updated_at=timezone.now())
+            self.log('Promoted the students of %d/%d classes' % (min(start + UPDATE_CHUNK_SIZE, len(source_ids)), len(source_ids)))
+
+        graduating_ids = [graduation['class_id'] for graduation in report['graduations']]
+        graduated = Student.objects.filter(school_class_id__in=graduating_ids, status='ACTIVE').update(status='GRADUATED', updated_at=timezone.now())
+        self.log('%d students graduated' % graduated)
+
+        # Set-based writes skip post_save: refresh the trees and the parents' read model
+        from students.signals import students_bulk_changed
+        students_bulk_changed.send(
+            sender=Student,
+            student_ids=None,
+            class_ids=set(destinations) | set(destinations.values()) | set(graduating_ids),
+        )
+        created_school_ids = {self.levels[school_class.level_id]['school_id'] for school_class in created}
+        invalidate_school_trees(created_school_ids)
+        invalidate_responses(created_school_ids)
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from .models import School, Level, SchoolClass
 from users.models import CustomUser # Nécessaire si on utilise PrimaryKeyRelatedField avec queryset explicite
+from .access import get_access_context
+from .fieldsets import SparseFieldsetMixin
 
-class SchoolSerializer(serializers.ModelSerializer):
+class SchoolSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = School
         fields = ['id', 'name', 'address', 'contact_info', 'director', 'logo_url', 'is_active']
@@ -14,40 +16,44 @@ class SchoolSerializer(serializers.ModelSerializer):
             }
         }
 
-class LevelSerializer(serializers.ModelSerializer):
+class LevelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # school = serializers.PrimaryKeyRelatedField(queryset=School.objects.all(), required=False) 
     # School will be set in the view based on URL or user (director) context for POST
     # For GET, it will be serialized based on the model instance.
-    
+    expandable_fields = {'school': SchoolSerializer} # ?expand= (see fieldsets.py)
+
     class Meta:
         model = Level
-        fields = ['id', 'name', 'school', 'cycle']
+        fields = ['id', 'name', 'school', 'cycle', 'order']
         read_only_fields = ['school'] # School is typically set by the view context, not directly by client on POST/PUT to /levels/
 
     def validate(self, data):
         # Contextual validation if school is part of the input data (e.g. for super_admin_group)
         # For directors, the view usually limits creation to their school.
-        user = self.context['request'].user
+        request = self.context['request']
+        user = request.user
         school = data.get('school') # This would be if 'school' was writable and present in input
+        school_id = school.pk if school else None
 
-        if not school and self.instance: # For updates, if school is not being changed
-            school = self.instance.school
-        elif not school and 'school_id' in self.context.get('view_kwargs', {}): # if school_id in URL
-             school_id_from_url = self.context['view_kwargs']['school_id']
-             school = School.objects.get(pk=school_id_from_url)
+        if not school_id and self.instance: # For updates, if school is not being changed
+            school_id = self.instance.school_id
+        elif not school_id and 'school_id' in self.context.get('view_kwargs', {}): # if school_id in URL
+             school_id = self.context['view_kwargs']['school_id']
 
 
         if user.role == 'director':
-            if school and not user.directed_schools.filter(pk=school.pk).exists():
+            if school_id and not get_access_context(request).can_manage_school(school_id):
                 raise serializers.ValidationError("You can only manage levels for your own school(s).")
-            if not school and self.context['request'].method == 'POST': # If creating and school not determined
+            if not school_id and request.method == 'POST': # If creating and school not determined
                  raise serializers.ValidationError("School must be specified for director.")
         return data
 
 
-class SchoolClassSerializer(serializers.ModelSerializer):
+class SchoolClassSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # level = serializers.PrimaryKeyRelatedField(queryset=Level.objects.all())
     # Level will be set in the view for POST requests to nested URL, or part of data for direct POST to /classes/
+    expandable_fields = {'level': LevelSerializer} # ?expand= (see fieldsets.py)
+
     class Meta:
         model = SchoolClass
         fields = ['id', 'name', 'level', 'academic_year']
@@ -55,19 +61,40 @@ class SchoolClassSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         # Similar to LevelSerializer, validate based on context
-        user = self.context['request'].user
+        request = self.context['request']
+        user = request.user
         level = data.get('level') # If 'level' is writable and present in input
+        level_id = level.pk if level else None
 
-        if not level and self.instance: # For updates
-            level = self.instance.level
-        elif not level and 'level_id' in self.context.get('view_kwargs', {}): # if level_id in URL
-            level_id_from_url = self.context['view_kwargs']['level_id']
-            level = Level.objects.get(pk=level_id_from_url)
+        if not level_id and self.instance: # For updates
+            level_id = self.instance.level_id
+        elif not level_id and 'level_id' in self.context.get('view_kwargs', {}): # if level_id in URL
+            level_id = self.context['view_kwargs']['level_id']
 
         if user.role == 'director':
-            if level and not user.directed_schools.filter(levels=level).exists():
+            if level_id and not get_access_context(request).can_manage_level(level_id):
                  raise serializers.ValidationError("You can only manage classes for levels in your own school(s).")
-            if not level and self.context['request'].method == 'POST':
+            if not level_id and request.method == 'POST':
                  raise serializers.ValidationError("Level must be specified for director.")
         return data
 
+
+class RolloverSerializer(serializers.Serializer):
+    """Input of POST /schools/rollover/ (see schools/rollover.py)."""
+    from_year = serializers.CharField(max_length=9)
+    to_year = serializers.CharField(max_length=9, required=False)
+    dry_run = serializers.BooleanField(default=False)
+    background = serializers.BooleanField(default=False) # Run as a job (see jobs/queue.py)
+    school_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def validate(self, data):
+        request = self.context['request']
+        access = get_access_context(request)
+        if access.is_director:
+            # Directors roll over their own schools only, all of them by default
+            requested = set(data.get('school_ids', access.school_ids))
+            if not requested <= access.school_ids:
+                raise serializers.ValidationError({'school_ids': "You can only roll over your own school(s)."})
+            data['school_ids'] = requested
+        return data
+
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .hierarchy import invalidate_school_trees
+from .models import Level, School, SchoolClass
+from .response_cache import invalidate_responses
+
+
+@receiver([post_save, post_delete], sender=School)
+def school_changed(sender, instance, **kwargs):
+    invalidate_school_trees([instance.pk])
+    invalidate_responses([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Level)
+def level_changed(sender, instance, **kwargs):
+    invalidate_school_trees([instance.school_id])
+    invalidate_responses([instance.school_id])
+
+
+@receiver([post_save, post_delete], sender=SchoolClass)
+def school_class_changed(sender, instance, **kwargs):
+    school_ids = list(Level.objects.filter(pk=instance.level_id).values_list('school_id', flat=True))
+    invalidate_school_trees(school_ids)
+    invalidate_responses(school_ids)
@@ -1,3 +1,438 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.datagen import SchoolNetworkGenerator
+from siges_backend_django.query_budget import query_budget
+from siges_backend_django.testing import jwt_client, jwt_header
+from students.models import ParentChild, Student
+from users.models import CustomUser
+from .access import get_access_context
+from .async_views import AsyncSchoolTreeView
+from .models import Level, School, SchoolClass
+from .response_cache import ResponseCacheMixin, get_or_build
+from .rollover import AcademicYearRollover, RolloverError
+
+
+class HierarchyPaginationTests(TestCase):
+    """The school, level and class lists are keyset paginated; their nested actions return plain arrays."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        for index in range(3):
+            school = School.objects.create(name='School %d' % index, address='Abidjan')
+            for name in ('CP2', 'CP1'):
+                level = Level.objects.create(name=name, school=school)
+                SchoolClass.objects.create(name='%s A' % name, level=level, academic_year='2024-2025')
+        cls.school = School.objects.get(name='School 0')
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = jwt_client(self.admin)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_lists_are_paginated_on_their_indexed_keys(self):
+        self.assertEqual(
+            self.collect('/api/schools/?page_size=2'),
+            list(School.objects.order_by('name', 'id').values_list('id', flat=True)),
+        )
+        self.assertEqual(
+            self.collect('/api/levels/?page_size=4'),
+            list(Level.objects.order_by('school_id', 'name', 'id').values_list('id', flat=True)),
+        )
+        self.assertEqual(
+            self.collect('/api/classes/?page_size=4'),
+            list(SchoolClass.objects.order_by('level_id', 'name', 'id').values_list('id', flat=True)),
+        )
+
+    def test_orderings_are_served_by_the_indexes(self):
+        self.assertIn('level_school_name_idx', Level.objects.order_by('school_id', 'name', 'id').explain())
+        self.assertIn('class_level_name_idx', SchoolClass.objects.order_by('level_id', 'name', 'id').explain())
+
+    def test_nested_lists_are_arrays(self):
+        response = self.client.get('/api/schools/%d/levels/' % self.school.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.data], ['CP1', 'CP2'])
+
+
+class AccessContextTests(TestCase):
+    """Directors reach their own schools only, resolved once per request (see schools/access.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.school = School.objects.create(name='Mine', address='Abidjan', director=cls.director)
+        cls.other_school = School.objects.create(name='Other', address='Bouaké')
+        cls.classes = {}
+        for school in (cls.school, cls.other_school):
+            level = Level.objects.create(name='CP1', school=school)
+            cls.classes[school.pk] = [
+                SchoolClass.objects.create(name=name, level=level, academic_year='2024-2025') for name in ('CP1 A', 'CP1 B')
+            ]
+        cls.student = Student.objects.create(
+            first_name='Aya', last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+            school_class=cls.classes[cls.school.pk][0],
+        )
+        cls.student.parents.add(cls.parent)
+        cls.other_student = Student.objects.create(
+            first_name='Awa', last_name='Traoré', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+            school_class=cls.classes[cls.other_school.pk][0],
+        )
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = jwt_client(self.director)
+
+    def test_director_manages_own_school_only(self):
+        mine, other = self.classes[self.school.pk], self.classes[self.other_school.pk]
+        url = '/api/students/%d/' % self.student.pk
+        self.assertEqual(self.client.patch(url, {'school_class': mine[1].pk}, format='json').status_code, 200)
+        self.assertEqual(self.client.patch(url, {'school_class': other[0].pk}, format='json').status_code, 403)
+        self.assertEqual(self.client.get('/api/students/%d/' % self.other_student.pk).status_code, 404)
+        self.assertEqual(self.client.patch('/api/classes/%d/' % mine[0].pk, {'name': 'CP1 C'}, format='json').status_code, 200)
+        response = self.client.post('/api/levels/%d/classes/' % other[0].level_id, {'name': 'CP1 C', 'academic_year': '2024-2025'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/api/schools/%d/levels/' % self.other_school.pk, {'name': 'CP2'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_parent_sees_own_children(self):
+        client = jwt_client(self.parent)
+        self.assertEqual(client.get('/api/students/%d/' % self.student.pk).status_code, 200)
+        self.assertEqual(client.get('/api/students/%d/' % self.other_student.pk).status_code, 404)
+
+    def test_scope_resolved_once(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.director
+        context = get_access_context(request)
+        self.assertIs(get_access_context(request), context)
+        with self.assertNumQueries(1):
+            self.assertEqual(context.school_ids, {self.school.pk})
+            self.assertEqual(context.level_ids, {self.classes[self.school.pk][0].level_id})
+            self.assertTrue(context.can_manage_student(self.student))
+            self.assertFalse(context.can_manage_school(self.other_school.pk))
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class SchoolTreeTests(TestCase):
+    """GET /api/schools/<id>/tree/ (see schools/hierarchy.py), within its budget from a cold cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.other_director = CustomUser.objects.create_user(username='other', email='other@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.school = School.objects.create(name='Mine', address='Abidjan', director=cls.director)
+        School.objects.create(name='Other', address='Bouaké', director=cls.other_director)
+        for name in ('CP1', 'CP2'):
+            level = Level.objects.create(name=name, school=cls.school)
+            school_class = SchoolClass.objects.create(name='%s A' % name, level=level, academic_year='2024-2025')
+            for index in range(3):
+                Student.objects.create(
+                    first_name='Aya', last_name='Koné %d' % index, date_of_birth=datetime.date(2017, 5, 1),
+                    gender='FEMALE', school_class=school_class,
+                )
+        cls.url = '/api/schools/%d/tree/' % cls.school.pk
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tree_and_etag(self):
+        client = jwt_client(self.director)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([level['name'] for level in response.data['levels']], ['CP1', 'CP2'])
+        self.assertEqual(response.data['levels'][0]['classes'][0]['active_students'], 3)
+        etag = response['ETag']
+        self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        student = Student.objects.filter(school_class__level__school=self.school).first()
+        student.status = 'INACTIVE'
+        student.save()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['levels'][0]['classes'][0]['active_students'], 2)
+
+    def test_super_admin_reads_any_tree(self):
+        self.assertEqual(jwt_client(self.admin).get(self.url).status_code, 200)
+
+    def test_scoped_to_the_director_schools(self):
+        self.assertEqual(jwt_client(self.other_director).get(self.url).status_code, 403)
+        self.assertEqual(jwt_client(self.parent).get(self.url).status_code, 403)
+
+    def test_async_tree(self):
+        url = '/api/async/schools/%d/tree/' % self.school.pk
+        headers = {'Authorization': jwt_header(self.director)}
+        with query_budget(AsyncSchoolTreeView.query_budget, 'async tree'):
+            response = async_to_sync(self.async_client.get)(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = async_to_sync(self.async_client.get)(url, headers={'Authorization': jwt_header(self.other_director)})
+        self.assertEqual(response.status_code, 403)
+
+
+class AcademicYearRolloverTests(TestCase):
+    """Set-based rollover (see schools/rollover.py): classes cloned, students promoted or graduated."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SchoolNetworkGenerator(schools=2, classes_per_level=1, students_per_class=3, prefix='t').generate()
+        cls.admin = CustomUser.objects.get(username='t-admin')
+        cls.director = CustomUser.objects.get(username='t-director-0')
+        cls.inactive = Student.objects.filter(school_class__level__name='CP1').first()
+        cls.inactive.status = 'INACTIVE'
+        cls.inactive.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dry_run_writes_nothing(self):
+        stdout = io.StringIO()
+        call_command('rollover_academic_year', '2024-2025', '--dry-run', stdout=stdout, stderr=io.StringIO())
+        self.assertFalse(SchoolClass.objects.filter(academic_year='2025-2026').exists())
+
+    def test_promotes_and_graduates(self):
+        before = {student.pk: student.school_class.level.name for student in Student.objects.select_related('school_class__level')}
+        with self.captureOnCommitCallbacks(execute=True):
+            report = AcademicYearRollover('2024-2025').run()
+        self.assertEqual(SchoolClass.objects.filter(academic_year='2025-2026').count(), 2 * 9)
+        order = ['PS', 'MS', 'GS', 'CP1', 'CP2', 'CE1', 'CE2', 'CM1', 'CM2']
+        for student in Student.objects.select_related('school_class__level'):
+            level = before[student.pk]
+            if student.pk == self.inactive.pk:
+                self.assertEqual(student.school_class.academic_year, '2024-2025')
+            elif level == 'CM2':
+                self.assertEqual(student.status, 'GRADUATED')
+            else:
+                self.assertEqual((student.school_class.academic_year, student.school_class.level.name), ('2025-2026', order[order.index(level) + 1]))
+        self.assertEqual(report['students_graduated'], Student.objects.filter(status='GRADUATED').count())
+        self.assertEqual(ParentChild.objects.filter(status='GRADUATED').count(), ParentChild.objects.filter(student__status='GRADUATED').count())
+        self.assertEqual(AcademicYearRollover('2024-2025').run()['students_promoted'], 0)
+
+    def test_queries_do_not_grow_with_students(self):
+        with CaptureQueriesContext(connection) as queries:
+            AcademicYearRollover('2024-2025').run(dry_run=True)
+        SchoolNetworkGenerator(schools=1, classes_per_level=1, students_per_class=20, prefix='u').generate()
+        with CaptureQueriesContext(connection) as more:
+            AcademicYearRollover('2024-2025').run(dry_run=True)
+        self.assertEqual(len(more), len(queries))
+
+    def test_api(self):
+        response = jwt_client(self.admin).post('/api/schools/rollover/', {'from_year': '2024-2025', 'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['students_promoted'], 0)
+        self.assertEqual(jwt_client(self.admin).post('/api/schools/rollover/', {'from_year': '2025'}, format='json').status_code, 400)
+
+        client = jwt_client(self.director)
+        other = School.objects.exclude(director=self.director).first()
+        response = client.post('/api/schools/rollover/', {'from_year': '2024-2025', 'school_ids': [other.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        parent = CustomUser.objects.filter(role='parent').first()
+        self.assertEqual(jwt_client(parent).post('/api/schools/rollover/', {'from_year': '2024-2025'}, format='json').status_code, 403)
+        with self.assertRaises(RolloverError):
+            AcademicYearRollover('2024-2025', '2023-2024')
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= and ?expand= (see schools/fieldsets.py) select the columns and joins of the list query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        school = School.objects.create(name='School 0', address='Abidjan')
+        cls.school_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=school), academic_year='2024-2025')
+        for index in range(6):
+            student = Student.objects.create(
+                first_name='Aya', last_name='Koné %d' % index, date_of_birth=datetime.date(2017, 5, 1),
+                gender='FEMALE', school_class=cls.school_class,
+            )
+            student.parents.add(CustomUser.objects.create_user(
+                username='parent%d' % index, email='parent%d@siges.ci' % index, password='pass', role='parent',
+            ))
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = jwt_client(self.admin)
+        self.client.get('/api/schools/') # Caches the token's auth version
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['results'], queries
+
+    def test_fields_narrow_the_query(self):
+        rows, queries = self.get('/api/students/', fields='id,first_name,last_name')
+        self.assertEqual(set(rows[0]), {'id', 'first_name', 'last_name'})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('address', sql)
+        self.assertNotIn('customuser', sql)
+
+    def test_expand_in_constant_queries(self):
+        rows, queries = self.get('/api/students/', expand='school_class.level.school,parents', fields='id,school_class.name,school_class.level,parents', page_size=2)
+        self.assertEqual(set(rows[0]['school_class']), {'name', 'level'})
+        self.assertEqual(rows[0]['school_class']['level']['school']['name'], 'School 0')
+        self.assertIn('email', rows[0]['parents'][0])
+        _, more = self.get('/api/students/', expand='school_class.level.school,parents', fields='id,school_class.name,school_class.level,parents', page_size=6)
+        self.assertEqual(len(more), len(queries))
+
+    def test_other_viewsets(self):
+        rows, _ = self.get('/api/classes/', expand='level.school', fields='id,name,level.school')
+        self.assertEqual(rows[0]['level']['school']['name'], 'School 0')
+        rows, _ = self.get('/api/schools/', fields='id,name')
+        self.assertEqual(set(rows[0]), {'id', 'name'})
+
+    def test_invalid_fields(self):
+        for params in ({'fields': 'nope'}, {'expand': 'address'}, {'fields': 'school_class.name'}):
+            self.assertEqual(self.client.get('/api/students/', params).status_code, 400, params)
+
+
+class FastReadTests(TestCase):
+    """The values()-based list path (see schools/fastread.py) renders the same bytes as the serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        school = School.objects.create(name='École Sainte-Thérèse', address='Abidjan', director=cls.director)
+        for name in ('CP1', 'CP2'):
+            school_class = SchoolClass.objects.create(name='%s A' % name, level=Level.objects.create(name=name, school=school), academic_year='2024-2025')
+            for index in range(4):
+                Student.objects.create(
+                    first_name='Aïcha', last_name='Koné %d' % index, date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+                    school_class=school_class, address='Rue %d' % index, photo_url='https://siges.ci/%d.png' % index if index else '',
+                )
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent', first_name='Éric')
+        Student.objects.first().parents.add(cls.parent)
+
+    def setUp(self):
+        caches['responses'].clear()
+
+    def assertSameBytes(self, user, url, **params):
+        client = jwt_client(user)
+        fast = client.get(url, params)
+        slow = client.get(url, dict(params, fast_read='0'))
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content.replace(b'&fast_read=0', b'').replace(b'fast_read=0&', b''), (url, params))
+
+    def test_same_bytes(self):
+        for url, params in (
+            ('/api/students/', {}),
+            ('/api/students/', {'page_size': 3}),
+            ('/api/students/', {'fields': 'id,date_of_birth,parents'}),
+            ('/api/students/', {'expand': 'school_class.level.school,parents'}),
+            ('/api/schools/', {}),
+            ('/api/levels/', {'expand': 'school'}),
+            ('/api/classes/', {'expand': 'level'}),
+        ):
+            self.assertSameBytes(self.admin, url, **params)
+        for user in (self.director, self.parent):
+            self.assertSameBytes(user, '/api/students/', expand='school_class')
+
+
+class ResponseCacheTests(TestCase):
+    """Hierarchy reads are cached per role and scope, and invalidated per school (see schools/response_cache.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.directors = [
+            CustomUser.objects.create_user(username='director%d' % index, email='director%d@siges.ci' % index, password='pass', role='director')
+            for index in range(2)
+        ]
+        cls.schools = [School.objects.create(name='School %d' % index, address='Abidjan', director=director) for index, director in enumerate(cls.directors)]
+        for school in cls.schools:
+            Level.objects.create(name='CP1', school=school)
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.clients = [jwt_client(director) for director in self.directors]
+        for client in self.clients:
+            client.get('/api/schools/') # Caches the token's auth version
+
+    def get(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_hits_are_scoped(self):
+        first, _ = self.get(self.clients[0], '/api/levels/')
+        other, _ = self.get(self.clients[1], '/api/levels/')
+        self.assertNotEqual(first, other)
+        again, queries = self.get(self.clients[0], '/api/levels/')
+        self.assertEqual((again, queries), (first, 0))
+
+    def test_changes_invalidate_their_school_only(self):
+        self.get(self.clients[0], '/api/levels/')
+        self.get(self.clients[1], '/api/levels/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Level.objects.create(name='CP2', school=self.schools[1])
+        self.assertEqual(self.get(self.clients[0], '/api/levels/')[1], 0)
+        levels, queries = self.get(self.clients[1], '/api/levels/')
+        self.assertGreater(queries, 0)
+        self.assertEqual(len(levels['results']), 2)
+        self.assertIn('CP2', str(self.get(jwt_client(self.admin), '/api/levels/')[0]))
+
+        url = '/api/schools/%d/' % self.schools[1].pk
+        self.get(self.clients[0], url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schools[1].name = 'Renamed'
+            self.schools[1].save()
+        self.assertEqual(self.get(self.clients[0], url)[0]['name'], 'Renamed')
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'built': True}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_build(caches['responses'], 'key', build))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcome for _, outcome in results), ['coalesced'] * 5 + ['miss'])
+
+    def test_other_responses_pass_through(self):
+        class View(ResponseCacheMixin):
+            cached_actions = ('list',)
+            action = 'list'
+
+        calls = []
+
+        def handler(request):
+            calls.append(1)
+            return Response({'detail': 'Unavailable.'}, status=503)
+
+        request = APIRequestFactory().get('/api/levels/')
+        request.user = self.admin
+        for _ in range(2):
+            response = View().cached(handler, request)
+            self.assertEqual((response.status_code, response.data), (503, {'detail': 'Unavailable.'}))
+        self.assertEqual(len(calls), 2)
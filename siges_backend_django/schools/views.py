@@ -1,14 +1,48 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from .models import School, Level, SchoolClass
-from .serializers import SchoolSerializer, LevelSerializer, SchoolClassSerializer
+from .serializers import SchoolSerializer, LevelSerializer, SchoolClassSerializer, RolloverSerializer
 from .permissions import IsSuperAdminGroup, IsDirectorOfSchoolOrSuperAdminGroup, CanManageSchoolContent, IsDirector
-
-class SchoolViewSet(viewsets.ModelViewSet):
+from .access import get_access_context
+from .fastread import FastReadViewMixin
+from .fieldsets import SparseFieldsetViewMixin
+from .hierarchy import get_school_tree, get_tree_version, tree_etag
+from .pagination import KeysetPagination
+from .response_cache import ResponseCacheMixin
+from .rollover import AcademicYearRollover, RolloverError
+from jobs.queue import enqueue
+from jobs.views import job_accepted
+
+
+def scoped_school_ids(request, school_id=None):
+    """Schools a hierarchy read of this user depends on (narrowed to school_id when given); None for all of them."""
+    access = get_access_context(request)
+    try:
+        school_id = int(school_id) if school_id else None
+    except (TypeError, ValueError):
+        school_id = None
+    if access.is_super_admin:
+        return None if school_id is None else {school_id}
+    if school_id is not None and school_id in access.school_ids:
+        return {school_id}
+    return access.school_ids
+
+class SchoolViewSet(ResponseCacheMixin, FastReadViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = School.objects.all().order_by('name')
     serializer_class = SchoolSerializer
+    pagination_class = KeysetPagination
+    query_budget = {'list': 2, 'retrieve': 2, 'tree': 5, 'levels': 3} # Checked by QueryBudgetMiddleware, auth included
+    read_from_replica = True # Safe methods only (see siges_backend_django/replicas.py)
+    fast_read = True # List pages rendered from values() (see fastread.py)
+    cached_actions = ('list', 'retrieve') # Responses cached until the schools change (see response_cache.py)
+
+    def get_response_cache_schools(self, request):
+        if self.action == 'retrieve':
+            return {self.kwargs['pk']}
+        return None
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -17,6 +51,10 @@ class SchoolViewSet(viewsets.ModelViewSet):
             permission_classes = [IsSuperAdminGroup]
         elif self.action in ['update', 'partial_update', 'destroy']:
             permission_classes = [IsDirectorOfSchoolOrSuperAdminGroup]
+        elif self.action == 'tree':
+            permission_classes = [IsSuperAdminGroup | IsDirector] # Narrowed to the director's schools in tree()
+        elif self.action == 'rollover':
+            permission_classes = [IsSuperAdminGroup | IsDirector]
         elif self.action == 'levels': # Permissions for custom @action 'levels'
             if self.request.method == 'POST':
                 permission_classes = [CanManageSchoolContent] # or more specific: IsDirectorOfSchoolOrSuperAdminGroup for the school object
@@ -26,6 +64,50 @@ class SchoolViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    @action(detail=True, methods=['get'], url_path='tree')
+    def tree(self, request, pk=None):
+        """
+        Full School -> Level -> SchoolClass tree with active student counts, optionally for one ?academic_year=.
+        Served from a cache versioned on the school's structure; supports If-None-Match.
+        Directors can only read the trees of their own schools.
+        """
+        school = self.get_object()
+        if not get_access_context(request).can_manage_school(school.pk):
+            raise PermissionDenied("You can only read the tree of your school(s).")
+        academic_year = request.query_params.get('academic_year')
+        version = get_tree_version(school.pk)
+        etag = tree_etag(school.pk, version, academic_year)
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(get_school_tree(school, version, academic_year), headers={'ETag': etag})
+
+    @action(detail=False, methods=['post'], url_path='rollover')
+    def rollover(self, request):
+        """
+        Closes an academic year for the network (super admin) or the director's schools:
+        clones the classes into the new year, promotes and graduates the students in bulk.
+        With "dry_run": true, returns the report of what would change without writing.
+        With "background": true, runs it as a job: 202 with the job, whose result is the report.
+        """
+        serializer = RolloverSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            rollover = AcademicYearRollover(data['from_year'], data.get('to_year'), data.get('school_ids'))
+            if data['background']:
+                school_ids = data.get('school_ids')
+                job = enqueue('schools.rollover', {
+                    'from_year': rollover.from_year, 'to_year': rollover.to_year, 'dry_run': data['dry_run'],
+                    'school_ids': None if school_ids is None else sorted(school_ids),
+                }, user=request.user)
+                return job_accepted(request, job)
+            report = rollover.run(dry_run=data['dry_run'])
+        except RolloverError as error:
+            raise serializers.ValidationError({'from_year': str(error)})
+        return Response(report)
+
     @action(detail=True, methods=['get', 'post'], url_path='levels')
     def levels(self, request, pk=None):
         school = self.get_object() 
@@ -38,7 +120,7 @@ class SchoolViewSet(viewsets.ModelViewSet):
         
         elif request.method == 'POST':
             # Permission check for POST should ensure user can add level to *this* school
-            if request.user.role == 'director' and not request.user.directed_schools.filter(pk=school.pk).exists():
+            if request.user.role == 'director' and not get_access_context(request).can_manage_school(school.pk):
                  return Response({'detail': 'You do not have permission to add a level to this school.'}, status=status.HTTP_403_FORBIDDEN)
             if request.user.role != 'super_admin_group' and request.user.role != 'director': # Redundant if CanManageSchoolContent is strict
                  return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -50,23 +132,31 @@ class SchoolViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class LevelViewSet(viewsets.ModelViewSet):
+class LevelViewSet(ResponseCacheMixin, FastReadViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = LevelSerializer
+    pagination_class = KeysetPagination
     permission_classes = [CanManageSchoolContent] # Global permission for the ViewSet
+    query_budget = {'list': 3, 'retrieve': 3, 'classes': 4}
+    read_from_replica = True
+    fast_read = True
+    cached_actions = ('list',)
+
+    def get_response_cache_schools(self, request):
+        return scoped_school_ids(request, request.query_params.get('school_id'))
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'super_admin_group':
             qs = Level.objects.all()
         elif user.role == 'director':
-            qs = Level.objects.filter(school__in=user.directed_schools.all())
+            qs = Level.objects.filter(school_id__in=get_access_context(self.request).school_ids)
         else:
             return Level.objects.none() 
 
         school_id = self.request.query_params.get('school_id')
         if school_id: # Allow filtering for both super_admin_group and directors (if they have multiple schools)
             qs = qs.filter(school_id=school_id)
-        return qs.order_by('school__name', 'name')
+        return qs.order_by('school_id', 'name') # The level_school_name_idx keyset key
 
     def perform_create(self, serializer):
         # School needs to be determined for creation.
@@ -81,19 +171,19 @@ class LevelViewSet(viewsets.ModelViewSet):
             school = get_object_or_404(School, pk=school_id_from_data)
             serializer.save(school=school)
         elif self.request.user.role == 'director':
-            director_schools = self.request.user.directed_schools.all()
-            if not director_schools.exists():
-                raise permissions.PermissionDenied("You are not a director of any school.")
+            director_school_ids = get_access_context(self.request).school_ids
+            if not director_school_ids:
+                raise PermissionDenied("You are not a director of any school.")
 
             if school_id_from_data:
-                school = get_object_or_404(director_schools, pk=school_id_from_data) # Ensures director owns the school
-            elif len(director_schools) == 1:
-                school = director_schools.first()
+                school = get_object_or_404(School.objects.filter(pk__in=director_school_ids), pk=school_id_from_data) # Ensures director owns the school
+            elif len(director_school_ids) == 1:
+                school = School.objects.get(pk=next(iter(director_school_ids)))
             else:
                 raise serializers.ValidationError({'school': 'School ID must be provided if you direct multiple schools.'})
             serializer.save(school=school)
         else:
-            raise permissions.PermissionDenied("You do not have permission to create a level.")
+            raise PermissionDenied("You do not have permission to create a level.")
     
     @action(detail=True, methods=['get', 'post'], url_path='classes')
     def classes(self, request, pk=None):
@@ -116,23 +206,31 @@ class LevelViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SchoolClassViewSet(viewsets.ModelViewSet):
+class SchoolClassViewSet(ResponseCacheMixin, FastReadViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = SchoolClassSerializer
+    pagination_class = KeysetPagination
     permission_classes = [CanManageSchoolContent]
+    query_budget = {'list': 3, 'retrieve': 3}
+    read_from_replica = True
+    fast_read = True
+    cached_actions = ('list',)
+
+    def get_response_cache_schools(self, request):
+        return scoped_school_ids(request)
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'super_admin_group':
             qs = SchoolClass.objects.all()
         elif user.role == 'director':
-            qs = SchoolClass.objects.filter(level__school__in=user.directed_schools.all())
+            qs = SchoolClass.objects.filter(level_id__in=get_access_context(self.request).level_ids)
         else:
             return SchoolClass.objects.none()
 
         level_id = self.request.query_params.get('level_id')
         if level_id: 
             qs = qs.filter(level_id=level_id)
-        return qs.order_by('level__school__name', 'level__name', 'name')
+        return qs.order_by('level_id', 'name') # The class_level_name_idx keyset key
 
     def perform_create(self, serializer):
         # Level needs to be determined for creation.
@@ -145,8 +243,8 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         if self.request.user.role == 'super_admin_group':
             serializer.save(level=level)
         elif self.request.user.role == 'director':
-            if not self.request.user.directed_schools.filter(levels=level).exists(): # Check if level belongs to one of director's schools
-                raise permissions.PermissionDenied("You cannot create a class for this level.")
+            if not get_access_context(self.request).can_manage_level(level.pk): # Check if level belongs to one of director's schools
+                raise PermissionDenied("You cannot create a class for this level.")
             serializer.save(level=level)
         else:
-            raise permissions.PermissionDenied("You do not have permission to create a class.")
+            raise PermissionDenied("You do not have permission to create a class.")
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class ShardingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sharding'
+
+    def ready(self):
+        if getattr(settings, 'DATABASE_SHARDS', []):
+            from . import signals # noqa: F401 (connects the signal receivers)
@@ -0,0 +1,121 @@
+"""
+The copies of the catalogue (users, schools, levels, classes) held by every
+shard, so that the student queries can join them and the foreign keys of
+the sharded tables hold. The 'default' database stays the only one written
+by the application: sharding/signals.py copies each saved or deleted row
+to the shards, and sync_shard_catalogue copies everything (after adding a
+shard, or after writes that bypassed the signals, e.g. the bulk_create of
+the academic year rollover). The copies only serve joins: their auto_now
+timestamps are those of the copy.
+"""
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .shards import SHARD_ID_SPAN, shards
+
+BATCH_SIZE = 1000
+
+
+def catalogue_models():
+    """The copied models, referenced ones first."""
+    from schools.models import Level, School, SchoolClass
+    return [get_user_model(), School, Level, SchoolClass]
+
+
+def delete_rows(alias, model, column, values):
+    """DELETE without the ORM's cascades and signals: the copies have neither."""
+    connection = connections[alias]
+    values = list(values)
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), BATCH_SIZE):
+            chunk = values[start:start + BATCH_SIZE]
+            cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (
+                connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(column), ', '.join(['%s'] * len(chunk)),
+            ), chunk)
+
+
+def delete_copies(alias, model, pks):
+    from attendance.models import AttendanceSheet, RosterSlot
+    from schools.models import School, SchoolClass
+    from students.models import ParentChild, Student
+    # What the catalogue cascaded on its own (empty) sharded tables
+    if model is get_user_model():
+        delete_rows(alias, Student.parents.through, 'customuser_id', pks)
+        delete_rows(alias, ParentChild, 'parent_id', pks)
+        School._base_manager.using(alias).filter(director_id__in=pks).update(director=None)
+        AttendanceSheet._base_manager.using(alias).filter(taken_by_id__in=pks).update(taken_by=None)
+    elif model is SchoolClass:
+        delete_rows(alias, AttendanceSheet, 'school_class_id', pks)
+        delete_rows(alias, RosterSlot, 'school_class_id', pks)
+    delete_rows(alias, model, model._meta.pk.column, pks)
+
+
+def copy_rows(alias, model, rows):
+    model._base_manager.using(alias).bulk_create(
+        rows, batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=[model._meta.pk.name],
+        update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key],
+    )
+
+
+def mirror(model, pks, aliases=None):
+    """Copies these rows of a catalogue model to the shards, deleting the copies of rows gone since."""
+    pks = set(pks)
+    rows = list(model._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=pks))
+    gone = pks - {row.pk for row in rows}
+    for alias in shards() if aliases is None else aliases:
+        with transaction.atomic(using=alias):
+            if gone:
+                delete_copies(alias, model, gone)
+            if rows:
+                copy_rows(alias, model, rows)
+
+
+def sync_catalogue(aliases=None):
+    """Makes the shards' copies identical to the catalogue. Returns {model label: rows copied}."""
+    copied = {}
+    models = catalogue_models()
+    for alias in shards() if aliases is None else aliases:
+        with transaction.atomic(using=alias):
+            # Deletions first, referencing models first
+            for model in reversed(models):
+                kept = set(model._base_manager.using(DEFAULT_DB_ALIAS).values_list('pk', flat=True))
+                gone = set(model._base_manager.using(alias).values_list('pk', flat=True)) - kept
+                if gone:
+                    delete_copies(alias, model, gone)
+            for model in models:
+                rows = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk').iterator(chunk_size=BATCH_SIZE)
+                count = 0
+                while True:
+                    batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+                    if not batch:
+                        break
+                    copy_rows(alias, model, batch)
+                    count += len(batch)
+                copied[model._meta.label] = count
+    return copied
+
+
+def reserve_ids(alias):
+    """Starts the id sequences of the sharded tables of a shard at its SHARD_ID_SPAN block."""
+    from students.models import ParentChild, Student
+    base = shards().index(alias) * SHARD_ID_SPAN
+    if not base:
+        return
+    connection = connections[alias]
+    tables = [model._meta.db_table for model in (Student, Student.parents.through, ParentChild)]
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == 'sqlite':
+                # AUTOINCREMENT tables take their next id from sqlite_sequence
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [base, table, base])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)', [table, base, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%%s, 'id'), GREATEST(%%s, (SELECT COALESCE(MAX(id), 0) FROM %s)))"
+                    % connection.ops.quote_name(table), [table, base],
+                )
+            else:
+                raise NotImplementedError('Id blocks of %s shards are not supported.' % connection.vendor)
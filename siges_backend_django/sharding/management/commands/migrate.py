@@ -0,0 +1,16 @@
+from django.core.management.commands.migrate import Command as MigrateCommand
+
+from sharding.shards import use_shards
+
+
+class Command(MigrateCommand):
+    """
+    Django's migrate, with the database being migrated selected as the shard
+    of the sharded models: the data migrations' queries on the students then
+    read and write that database (see sharding/router.py) instead of raising
+    ShardNotSelected. Run sync_shard_catalogue after migrating a new shard.
+    """
+
+    def handle(self, *args, **options):
+        with use_shards([options['database']]):
+            return super().handle(*args, **options)
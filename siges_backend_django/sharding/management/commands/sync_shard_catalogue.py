@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sharding.catalogue import reserve_ids, sync_catalogue
+from sharding.shards import shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the catalogue (users, schools, levels, classes) from the default database to the shards. "
+        "Run it after migrating a new shard, and after writes that bypassed the ORM signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', action='append', help="Only this shard alias, repeatable (default: all).")
+
+    def handle(self, *args, **options):
+        aliases = options['shard'] or shards()
+        if not aliases:
+            raise CommandError('Sharding is off: DATABASE_SHARDS is empty (set SIGES_SHARD_DBS).')
+        unknown = set(aliases) - set(shards())
+        if unknown:
+            raise CommandError('Unknown shard(s): %s.' % ', '.join(sorted(unknown)))
+        for alias in aliases:
+            reserve_ids(alias)
+            copied = sync_catalogue([alias])
+            self.stdout.write(self.style.SUCCESS('%s: %s' % (
+                alias, ', '.join('%d %s' % (count, label) for label, count in copied.items()),
+            )))
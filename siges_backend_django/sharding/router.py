@@ -0,0 +1,52 @@
+from .shards import (
+    ShardNotSelected, is_enabled, is_sharded, selected_shards, shard_for_class, shard_for_school, shard_for_student, shards,
+)
+
+
+def shard_of_instance(instance):
+    """The shard an instance (or its related students) is on, when it tells."""
+    from schools.models import Level, School, SchoolClass
+    from students.models import ParentChild, Student
+    if instance._state.db in shards():
+        return instance._state.db
+    if isinstance(instance, School):
+        return shard_for_school(instance.pk)
+    if isinstance(instance, Level):
+        return shard_for_school(instance.school_id)
+    if isinstance(instance, SchoolClass):
+        return shard_for_class(instance.pk)
+    if isinstance(instance, Student):
+        # A student not saved yet: its class's shard
+        return shard_for_student(instance.pk) if instance.pk is not None else shard_for_class(instance.school_class_id)
+    if isinstance(instance, ParentChild):
+        return shard_for_student(instance.student_id)
+    return None
+
+
+class ShardRouter:
+    """
+    Sends the queries on the sharded models to their shard (see sharding/shards.py).
+    Other models are left to the next router (the catalogue, replicas included).
+    """
+
+    def db_for_read(self, model, **hints):
+        return self.db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.db_for(model, hints)
+
+    def db_for(self, model, hints):
+        if not is_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        alias = shard_of_instance(instance) if instance is not None else None
+        if alias is not None:
+            return alias
+        selected = selected_shards()
+        if selected is not None and len(selected) == 1:
+            return selected[0]
+        raise ShardNotSelected(
+            '%s was queried with %s: select its shard with sharding.shards.use_shards().' % (
+                model._meta.label, 'no shard selected' if not selected else 'several shards selected (%s)' % ', '.join(selected),
+            )
+        )
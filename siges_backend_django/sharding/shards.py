@@ -0,0 +1,163 @@
+"""
+Optional per-school sharding of the student data.
+
+With settings.DATABASE_SHARDS set (SIGES_SHARD_DBS, see settings.py), the
+rows of the SHARDED_MODELS live in the shard database of their school:
+SCHOOL_SHARD_MAP[school_id], or the school id modulo the number of shards
+for the schools it does not list. Everything else, schools, levels, classes
+and users included, stays in the catalogue database ('default'), of which
+every shard holds a copy (sharding/catalogue.py) so that the joins and
+foreign keys of the student queries work inside a shard.
+
+- Code selects shards with use_shards(); ShardRouter sends each query on a
+  sharded model to the selected shard, or to the shard of the instance it
+  is about. A query with no single shard selected raises ShardNotSelected
+  rather than reading an empty table: code not written for sharding fails
+  loudly.
+- Shard n numbers its rows from n * SHARD_ID_SPAN + 1, so that student ids
+  stay unique across shards and tell which shard holds the student.
+- Work spanning several shards runs once per shard: each_shard(),
+  iterate_shards(), and ShardedViewMixin for list views (sharding/views.py).
+"""
+import contextlib
+import contextvars
+
+from django.conf import settings
+
+# Models whose rows live on the shard of their school (app_label.model_name)
+SHARDED_MODELS = {
+    'students.student', 'students.student_parents', 'students.parentchild',
+    'attendance.rosterslot', 'attendance.attendancesheet',
+}
+# Ids allocated by shard n start at n * SHARD_ID_SPAN + 1
+SHARD_ID_SPAN = 10 ** 12
+
+_selected = contextvars.ContextVar('siges_selected_shards', default=None)
+
+
+class ShardNotSelected(RuntimeError):
+    pass
+
+
+def shards():
+    """The shard aliases, in settings order (empty when sharding is off)."""
+    return list(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def is_enabled():
+    return bool(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_for_school(school_id):
+    """The shard of a school (None when sharding is off)."""
+    aliases = shards()
+    if not aliases or school_id is None:
+        return None
+    mapped = {int(key): alias for key, alias in getattr(settings, 'SCHOOL_SHARD_MAP', {}).items()}
+    return mapped.get(int(school_id)) or aliases[int(school_id) % len(aliases)]
+
+
+def shard_for_level(level_id):
+    from schools.models import Level
+    if not is_enabled():
+        return None
+    return shard_for_school(Level.objects.filter(pk=level_id).values_list('school_id', flat=True).first())
+
+
+def shard_for_class(class_id):
+    from schools.models import SchoolClass
+    if not is_enabled():
+        return None
+    return shard_for_school(SchoolClass.objects.filter(pk=class_id).values_list('level__school_id', flat=True).first())
+
+
+def shards_for_classes(class_ids):
+    """{class_id: shard} in one query (empty when sharding is off)."""
+    from schools.models import SchoolClass
+    if not is_enabled():
+        return {}
+    rows = SchoolClass.objects.filter(pk__in=set(class_ids)).values_list('pk', 'level__school_id')
+    return {class_id: shard_for_school(school_id) for class_id, school_id in rows}
+
+
+def shard_for_student(student_id):
+    """The shard that allocated a student id (None when sharding is off or the id is out of range)."""
+    aliases = shards()
+    if not aliases:
+        return None
+    index = int(student_id) // SHARD_ID_SPAN
+    return aliases[index] if 0 <= index < len(aliases) else None
+
+
+def shards_for_schools(school_ids):
+    """The shards of these schools, in settings order (empty when sharding is off)."""
+    aliases = shards()
+    if not aliases:
+        return []
+    return sorted({shard_for_school(school_id) for school_id in school_ids}, key=aliases.index)
+
+
+def selected_shards():
+    """The shards selected by the innermost use_shards() (None outside of one)."""
+    return _selected.get()
+
+
+def select_shards(aliases):
+    """Selects shards until reset_shards(token); use_shards() where a with block fits."""
+    return _selected.set(tuple(aliases))
+
+
+def reset_shards(token):
+    _selected.reset(token)
+
+
+@contextlib.contextmanager
+def use_shards(aliases):
+    token = select_shards(aliases)
+    try:
+        yield
+    finally:
+        reset_shards(token)
+
+
+def on_shard(alias):
+    """use_shards([alias]), or nothing for None (sharding off)."""
+    return use_shards([alias]) if alias is not None else contextlib.nullcontext()
+
+
+def each_shard(aliases=None):
+    """
+    Yields each shard alias (all of them by default) with that shard
+    selected during the iteration; yields None once when sharding is off.
+    """
+    if not is_enabled():
+        yield None
+        return
+    for alias in shards() if aliases is None else aliases:
+        with use_shards([alias]):
+            yield alias
+
+
+def iterate_shards(make_iterable, aliases=None):
+    """
+    Yields the items of make_iterable() run on each shard in turn (once when
+    sharding is off). The shard is only selected while the iterable runs, so
+    this can feed a streamed response.
+    """
+    if not is_enabled():
+        yield from make_iterable()
+        return
+    for alias in shards() if aliases is None else aliases:
+        with use_shards([alias]):
+            iterator = iter(make_iterable())
+        while True:
+            with use_shards([alias]):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+            yield item
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import ProtectedError
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from schools.models import Level, School, SchoolClass
+from students.models import Student
+from .catalogue import mirror, reserve_ids
+from .shards import shard_for_class, shard_for_school, shards
+
+
+# The shards' copies of the catalogue (see sharding/catalogue.py). These receivers are connected
+# before the other apps' (INSTALLED_APPS order), so that theirs see the copies up to date. They are
+# connected per model: a delete receiver without a sender would disable Django's fast deletes everywhere.
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_save, sender=School)
+@receiver(post_save, sender=Level)
+@receiver(post_save, sender=SchoolClass)
+def catalogue_saved(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        mirror(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=get_user_model())
+@receiver(post_delete, sender=School)
+@receiver(post_delete, sender=Level)
+@receiver(post_delete, sender=SchoolClass)
+def catalogue_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        mirror(sender, [instance.pk])
+
+
+# The catalogue's own student tables are empty: protect the students of the shards
+
+@receiver(pre_delete, sender=SchoolClass)
+def school_class_deleting(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    alias = shard_for_class(instance.pk)
+    if alias is None:
+        return
+    students = Student.objects.using(alias).filter(school_class_id=instance.pk)
+    if students.exists():
+        raise ProtectedError(
+            'Cannot delete the class "%s": students are still enrolled in it.' % instance, set(students[:10]),
+        )
+
+
+def previous_school(instance):
+    if isinstance(instance, Level):
+        return Level.objects.filter(pk=instance.pk).values_list('school_id', flat=True).first()
+    return SchoolClass.objects.filter(pk=instance.pk).values_list('level__school_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Level)
+@receiver(pre_save, sender=SchoolClass)
+def moving_between_shards(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    if raw or instance.pk is None or using != DEFAULT_DB_ALIAS:
+        return
+    school_id = instance.school_id if sender is Level else Level.objects.filter(pk=instance.level_id).values_list('school_id', flat=True).first()
+    before = shard_for_school(previous_school(instance))
+    if before is None or before == shard_for_school(school_id):
+        return
+    students = Student.objects.using(before)
+    students = students.filter(school_class__level_id=instance.pk) if sender is Level else students.filter(school_class_id=instance.pk)
+    if students.exists():
+        raise ValidationError(
+            'The students of "%s" are on the shard of its school (%s), not on the one of the new school.' % (instance, before)
+        )
+
+
+@receiver(post_migrate)
+def shard_migrated(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.label == 'students' and using in shards():
+        reserve_ids(using)
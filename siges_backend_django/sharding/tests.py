@@ -0,0 +1,118 @@
+import datetime
+import io
+import unittest
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.management.commands.migrate import Command as MigrateCommand
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from schools.models import Level, School, SchoolClass
+from schools.rollover import AcademicYearRollover, RolloverError
+from siges_backend_django.testing import jwt_client, jwt_header
+from stats.enrollment import rebuild
+from stats.models import EnrollmentCount
+from students.models import Student
+from users.models import CustomUser
+from .shards import SHARD_ID_SPAN, ShardNotSelected, selected_shards, shard_for_school, shards, use_shards
+from .views import ShardingNotSupported, use_single_shard
+
+
+@override_settings(DATABASE_SHARDS=['shard_0', 'shard_1'])
+class UnsupportedPathTests(SimpleTestCase):
+    """What does not run on sharded data yet fails with a clear error, before any query."""
+
+    def test_migrate_selects_the_migrated_database(self):
+        seen = []
+        with mock.patch.object(MigrateCommand, 'handle', lambda *args, **options: seen.append(selected_shards())):
+            call_command('migrate', database='shard_1', verbosity=0)
+        self.assertEqual(seen, [('shard_1',)])
+
+    def test_single_shard(self):
+        with use_single_shard(['shard_1']):
+            self.assertEqual(selected_shards(), ('shard_1',))
+        with self.assertRaises(ShardingNotSupported):
+            use_single_shard(['shard_0', 'shard_1'])
+        with override_settings(DATABASE_SHARDS=[]):
+            with use_single_shard([]):
+                self.assertIsNone(selected_shards())
+
+    def test_rollover_and_generator(self):
+        with self.assertRaisesMessage(RolloverError, 'sharded'):
+            AcademicYearRollover('2024-2025')
+        with self.assertRaisesMessage(CommandError, 'sharded'):
+            call_command('generate_school_network', stdout=io.StringIO())
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+@unittest.skipUnless(len(shards()) == 2, 'Set SIGES_SHARD_DBS to two SQLite files to run the sharded tests.')
+class ShardedDataTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.directors, cls.schools = [], []
+        for index in range(2):
+            director = CustomUser.objects.create_user(
+                username='director%d' % index, email='director%d@siges.ci' % index, password='pass', role='director',
+            )
+            school = School.objects.create(name='School %d' % index, address='Abidjan', director=director)
+            school_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=school), academic_year='2024-2025')
+            with use_shards([shard_for_school(school.pk)]): # As the views and their signals run
+                for student in range(3):
+                    Student.objects.create(
+                        first_name='Élève %d' % student, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+                        school_class=school_class,
+                    ).parents.add(cls.parent)
+            cls.directors.append(director)
+            cls.schools.append(school)
+
+    def setUp(self):
+        cache.clear()
+        self.assertNotEqual(shard_for_school(self.schools[0].pk), shard_for_school(self.schools[1].pk))
+
+    def students_of(self, school):
+        with use_shards([shard_for_school(school.pk)]):
+            return sorted(Student.objects.filter(school_class__level__school=school).values_list('pk', flat=True))
+
+    def test_placement(self):
+        for school in self.schools:
+            self.assertEqual({pk // SHARD_ID_SPAN for pk in self.students_of(school)}, {shards().index(shard_for_school(school.pk))})
+        with self.assertRaises(ShardNotSelected):
+            Student.objects.count()
+
+    def test_sync(self):
+        response = jwt_client(self.directors[1]).get('/api/sync/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted(row['id'] for row in response.json()['students']), self.students_of(self.schools[1]))
+        response = jwt_client(self.admin).get('/api/sync/')
+        self.assertEqual((response.status_code, response.json()['detail']), (400, 'Sync is not supported yet for schools on several shards.'))
+
+    def test_stats_rebuild(self):
+        EnrollmentCount.objects.all().delete()
+        self.assertEqual(rebuild(), 6)
+        call_command('rebuild_enrollment_stats', stdout=io.StringIO())
+        self.assertEqual(jwt_client(self.admin).get('/api/stats/enrollment/').json()['total'], 6)
+
+    def test_async_endpoints(self):
+        get = async_to_sync(self.async_client.get)
+        headers = {'Authorization': jwt_header(self.directors[1])}
+        response = get('/api/async/students/', headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted(row['id'] for row in response.json()['results']), self.students_of(self.schools[1]))
+        student_id = self.students_of(self.schools[1])[0]
+        self.assertEqual(get('/api/async/students/%d/' % student_id, headers=headers).json()['id'], student_id)
+        self.assertEqual(get('/api/async/students/%d/' % self.students_of(self.schools[0])[0], headers=headers).status_code, 404)
+
+        headers = {'Authorization': jwt_header(self.parent)}
+        self.assertEqual(get('/api/async/users/me/', headers=headers).status_code, 200)
+        self.assertEqual(get('/api/async/students/%d/' % student_id, headers=headers).status_code, 200)
+        self.assertEqual(get('/api/async/students/', headers=headers).status_code, 400)
+
+    def test_rollover(self):
+        response = jwt_client(self.admin).post('/api/schools/rollover/', {'from_year': '2024-2025'}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,80 @@
+import contextlib
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+
+from schools.fastread import get_values_plan
+from .shards import is_enabled, reset_shards, select_shards, selected_shards, shards, use_shards
+
+
+class ShardingNotSupported(exceptions.APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'This request is not supported while the student data is sharded.'
+    default_code = 'sharding_not_supported'
+
+
+def use_single_shard(aliases, detail=None):
+    """
+    use_shards(aliases) for code that cannot merge the results of several
+    shards: ShardingNotSupported(detail) when `aliases` holds more than one.
+    Does nothing when sharding is off.
+    """
+    if not is_enabled():
+        return contextlib.nullcontext()
+    if len(aliases) != 1:
+        raise ShardingNotSupported(detail)
+    return use_shards(aliases)
+
+
+class ShardedViewMixin:
+    """
+    Runs a view's queries on the shards returned by get_shards() (all of them
+    by default), selected once the request is authenticated. With several
+    shards, list() runs the view's filtered query on each one and merges
+    their pages in the paginator's ordering (KeysetPagination.merge_pages).
+    Other actions must narrow get_shards() to one shard, or select one
+    themselves with use_shards().
+    """
+
+    def get_shards(self):
+        return shards()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if is_enabled():
+            self._shards_token = select_shards(self.get_shards())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shards_token', None)
+        if token is not None:
+            reset_shards(token)
+            self._shards_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        aliases = selected_shards()
+        if aliases is None or len(aliases) < 2:
+            return super().list(request, *args, **kwargs)
+        if self.paginator is not None and not hasattr(self.paginator, 'merge_pages'):
+            raise ImproperlyConfigured('%s cannot merge the pages of several shards.' % type(self.paginator).__name__)
+
+        plan = None
+        if getattr(self, 'fast_read', False) and request.query_params.get('fast_read') != '0':
+            plan = get_values_plan(self.get_serializer())
+        pages, rendered = [], {}
+        for alias in aliases:
+            # Everything reading the shard (search included) runs with it selected
+            with use_shards([alias]):
+                queryset = self.filter_queryset(self.get_queryset())
+                if plan is not None:
+                    queryset = plan.values(queryset)
+                rows = list(self.paginator.page_queryset(queryset, request) if self.paginator is not None else queryset)
+                data = plan.render(rows) if plan is not None else self.get_serializer(rows, many=True).data
+            rendered.update(zip(map(id, rows), data))
+            pages.append(rows)
+
+        if self.paginator is None:
+            return Response([rendered[id(row)] for rows in pages for row in rows])
+        page = self.paginator.merge_pages(pages)
+        return self.get_paginated_response([rendered[id(row)] for row in page])
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from schools.async_views import AsyncSchoolTreeView
+from students.async_views import AsyncStudentDetailView, AsyncStudentListView
+from users.async_views import AsyncUserDetailView
+
+# Async counterparts of the hot read endpoints, for ASGI deployments (see asyncapi.py)
+urlpatterns = [
+    path('students/', AsyncStudentListView.as_view(), name='async_student_list'),
+    path('students/<int:pk>/', AsyncStudentDetailView.as_view(), name='async_student_detail'),
+    path('schools/<int:pk>/tree/', AsyncSchoolTreeView.as_view(), name='async_school_tree'),
+    path('users/me/', AsyncUserDetailView.as_view(), name='async_user_detail'),
+]
@@ -0,0 +1,94 @@
+"""
+Async read endpoints for ASGI servers (uvicorn, see benchmarks/servers.py).
+
+Under ASGI a sync DRF view holds a worker thread for its whole duration,
+slow clients included. AsyncAPIView handlers are coroutines: they
+authenticate with StatelessJWTAuthentication.aauthenticate(), resolve the
+AccessContext with aload() and query through the async ORM (aget(),
+aiterator()), so a request waiting on the database or on the network holds
+no thread. The payloads are the ones of the sync endpoints; the views are
+mounted under /api/async/ (see async_urls.py).
+
+Only what the handlers need from DRF is kept: the Request wrapper
+(query_params, user), permission classes whose has_permission() runs no
+query, APIException responses and JSONRenderer. Declared query_budget and
+read_from_replica apply as for sync views (the middleware is async-capable).
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from django.views import View
+from rest_framework import exceptions, permissions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from schools.access import get_access_context
+from users.authentication import StatelessJWTAuthentication
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+class AsyncAPIView(View):
+    """
+    Read-only async view. Handlers (async def get()) return the data to
+    render as JSON, or an HttpResponse; they raise APIException subclasses
+    (NotFound, ValidationError, ...) as in DRF views.
+    """
+    http_method_names = ['get', 'head', 'options']
+    authentication_class = StatelessJWTAuthentication
+    permission_classes = [permissions.IsAuthenticated]
+    renderer = JSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        self.request = request
+        if request.method.lower() in self.http_method_names:
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+        else:
+            handler = self.http_method_not_allowed
+        try:
+            await self.initial(request)
+            result = await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        if isinstance(result, HttpResponseBase):
+            return result
+        return self.render(result)
+
+    async def initial(self, request):
+        authenticator = self.authentication_class()
+        try:
+            user_auth = await authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            exc.auth_header = authenticator.authenticate_header(request)
+            raise
+        request.user, request.auth = user_auth if user_auth is not None else (AnonymousUser(), None)
+
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.auth is None:
+                    exc = exceptions.NotAuthenticated()
+                    exc.auth_header = authenticator.authenticate_header(request)
+                    raise exc
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+        if request.user.is_authenticated:
+            await get_access_context(request).aload()
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        response = HttpResponse(self.renderer.render(data), status=status_code, content_type='application/json')
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    def handle_exception(self, exc):
+        """The response DRF's default exception handler gives."""
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        headers = {}
+        if getattr(exc, 'auth_header', None):
+            headers['WWW-Authenticate'] = exc.auth_header
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = '%d' % exc.wait
+        return self.render(data, exc.status_code, headers)
@@ -0,0 +1,43 @@
+"""
+SQLite backend tuned for a multi-worker deployment (gunicorn with several processes).
+
+On top of Django's sqlite3 backend, every new connection gets:
+- journal_mode=WAL: readers no longer block the writer nor the writer the readers;
+- synchronous=NORMAL: safe with WAL, fsyncs at checkpoints instead of every commit;
+- mmap_size, cache_size and temp_store=MEMORY: reads served from memory;
+- busy_timeout: a writer finding the database locked waits instead of failing.
+
+Transactions default to BEGIN IMMEDIATE, so atomic() blocks take the write lock
+when they start. With DEFERRED transactions a block that reads then writes
+must upgrade its lock and fails at once with "database is locked" when another
+writer got there first, whatever the busy timeout. Writers now queue instead.
+
+The pragmas can be overridden with OPTIONS['pragmas'] and the mode with
+OPTIONS['transaction_mode']. Use CONN_MAX_AGE to keep connections (and their
+page cache and mmap) between requests.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024, # Negative: in KiB, 64 MiB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000, # Milliseconds
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        if 'transaction_mode' not in self.settings_dict['OPTIONS']:
+            self.transaction_mode = 'IMMEDIATE'
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute('PRAGMA %s = %s' % (name, value))
+        return conn
@@ -0,0 +1,312 @@
+"""
+In-process request metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware records, for every resolved view and DRF action
+(e.g. "StudentViewSet.list"), the wall time, the time spent in the database,
+the time spent in serializers and the number of queries, into log-linear
+(HDR-style) histograms. It is only installed when settings.METRICS_ENABLED is
+true; otherwise it raises MiddlewareNotUsed and costs nothing. Queries are
+counted wherever the request runs them, including the sync_to_async() threads
+of async views and the async ORM under ASGI (see query_budget.count_queries).
+
+The Prometheus export gives every histogram the same fixed buckets on every
+scrape, as its `le` series require; the log-linear buckets serve the
+percentiles of the JSON dump.
+
+Each worker process keeps its own registry: Prometheus scrapes every worker,
+or the registry can be written to settings.METRICS_DUMP_PATH at exit.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.http import HttpResponse
+
+from .query_budget import QueryCounter, count_queries
+
+
+class Histogram:
+    """
+    Log-linear histogram of non-negative integers.
+
+    Values below 2**significant_bits are counted exactly; larger values share a
+    bucket with the values having the same `significant_bits` leading bits, so
+    the relative error stays below 2**-(significant_bits - 1) over any range.
+    Recording is a bit_length(), a shift and a dict increment.
+
+    Values are also counted against the fixed, sorted `export_bounds` (a last
+    slot holding the values above them), from which the Prometheus buckets are
+    rendered.
+    """
+
+    def __init__(self, significant_bits=4, export_bounds=()):
+        self.significant_bits = significant_bits
+        self.exact_limit = 1 << significant_bits
+        self.buckets = {} # bucket upper bound -> count
+        self.export_bounds = export_bounds
+        self.export_counts = [0] * (len(export_bounds) + 1)
+        self.count = 0
+        self.total = 0
+
+    def bucket_for(self, value):
+        if value < self.exact_limit:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return (((value >> shift) + 1) << shift) - 1
+
+    def record(self, value):
+        bucket = self.bucket_for(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.export_counts[bisect.bisect_left(self.export_bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return bucket
+        return max(self.buckets)
+
+    def cumulative_buckets(self):
+        """(bound, number of values <= bound) for each export bound, the empty ones included."""
+        seen = 0
+        for bound, count in zip(self.export_bounds, self.export_counts):
+            seen += count
+            yield bound, seen
+
+
+# Prometheus bucket bounds, in exported units
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 200, 500)
+
+# Histograms recorded per endpoint: (metric name, help text, unit scale for export, export buckets)
+REQUEST_HISTOGRAMS = [
+    ('siges_request_duration_seconds', 'Wall time of the request.', 1e-6, DURATION_BUCKETS),
+    ('siges_request_db_duration_seconds', 'Time spent executing SQL queries.', 1e-6, DURATION_BUCKETS),
+    ('siges_request_serializer_duration_seconds', 'Time spent in serializer .data.', 1e-6, DURATION_BUCKETS),
+    ('siges_request_view_duration_seconds', 'Wall time minus database and serializer time.', 1e-6, DURATION_BUCKETS),
+    ('siges_request_queries', 'Number of SQL queries run by the request.', 1, QUERY_BUCKETS),
+]
+
+
+class MetricsRegistry:
+    """Process-wide store of histograms and counters, keyed by metric name and label values."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {} # (name, labels) -> Histogram
+        self.counters = {} # (name, labels) -> number
+        self.help = {name: help_text for name, help_text, _, _ in REQUEST_HISTOGRAMS}
+        self.scales = {name: scale for name, _, scale, _ in REQUEST_HISTOGRAMS}
+        self.export_buckets = {name: buckets for name, _, _, buckets in REQUEST_HISTOGRAMS}
+
+    def new_histogram(self, name):
+        """Histogram counting the values of `name` against its export buckets, in recorded (integer) units."""
+        scale = self.scales.get(name, 1)
+        return Histogram(export_bounds=tuple(round(bound / scale) for bound in self.export_buckets.get(name, DURATION_BUCKETS)))
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = self.new_histogram(name)
+            histogram.record(value)
+
+    def inc(self, name, labels=(), amount=1, help_text=None):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            if help_text and name not in self.help:
+                self.help[name] = help_text
+
+    def record_request(self, endpoint, wall_us, db_us, serializer_us, queries):
+        labels = (('endpoint', endpoint),)
+        view_us = max(wall_us - db_us - serializer_us, 0)
+        with self.lock:
+            for name, value in zip(
+                [name for name, _, _, _ in REQUEST_HISTOGRAMS],
+                (wall_us, db_us, serializer_us, view_us, queries)
+            ):
+                histogram = self.histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self.histograms[(name, labels)] = self.new_histogram(name)
+                histogram.record(value)
+
+    def render_prometheus(self):
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP %s %s' % (name, self.help.get(name, name)))
+                lines.append('# TYPE %s counter' % name)
+            lines.append('%s%s %s' % (name, format_labels(labels), value))
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP %s %s' % (name, self.help.get(name, name)))
+                lines.append('# TYPE %s histogram' % name)
+            scale = self.scales.get(name, 1)
+            for bound, cumulative in histogram.cumulative_buckets():
+                lines.append('%s_bucket%s %d' % (name, format_labels(labels + (('le', format_number(bound * scale)),)), cumulative))
+            lines.append('%s_bucket%s %d' % (name, format_labels(labels + (('le', '+Inf'),)), histogram.count))
+            lines.append('%s_sum%s %s' % (name, format_labels(labels), format_number(histogram.total * scale)))
+            lines.append('%s_count%s %d' % (name, format_labels(labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Summary (count, mean and p50/p95/p99 in exported units) of every histogram, plus counters."""
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+        summary = {'histograms': [], 'counters': []}
+        for (name, labels), histogram in sorted(histograms):
+            scale = self.scales.get(name, 1)
+            summary['histograms'].append({
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram.count,
+                'mean': histogram.total * scale / histogram.count if histogram.count else 0,
+                'p50': histogram.percentile(50) * scale,
+                'p95': histogram.percentile(95) * scale,
+                'p99': histogram.percentile(99) * scale,
+            })
+        for (name, labels), value in sorted(counters):
+            summary['counters'].append({'name': name, 'labels': dict(labels), 'value': value})
+        return summary
+
+    def dump(self, path):
+        with open(path, 'w') as output:
+            json.dump(self.snapshot(), output, indent=2)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels)
+
+
+def format_number(value):
+    return repr(round(value, 9)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+# Serializer time of the request being handled (None outside of MetricsMiddleware)
+_serializer_timer = contextvars.ContextVar('siges_serializer_timer', default=None)
+
+
+class SerializerTimer:
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+
+
+def install_serializer_timing():
+    """
+    Wraps rest_framework's BaseSerializer.data (reached by Serializer.data and
+    ListSerializer.data through super()) to add its duration to the current
+    request's SerializerTimer. Installed once, only when metrics are enabled.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, 'siges_timed', False):
+        return
+
+    def data(self):
+        timer = _serializer_timer.get()
+        if timer is None or timer.depth:
+            return original.fget(self)
+        timer.depth += 1
+        start = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            timer.duration += time.perf_counter() - start
+            timer.depth -= 1
+
+    data.siges_timed = True
+    BaseSerializer.data = property(data)
+
+
+def view_label(view_func, request):
+    """'StudentViewSet.list' for DRF viewsets, 'UserDetailView.get' for other class-based views."""
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return '%s.%s' % (view_func.__module__, getattr(view_func, '__name__', 'view'))
+    actions = getattr(view_func, 'actions', None) or {}
+    method = request.method.lower()
+    return '%s.%s' % (view_class.__name__, actions.get(method, method))
+
+
+def resolved_view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return view_label(match.func, request) if match is not None else 'unresolved'
+
+
+class MetricsMiddleware:
+    # Runs in the server's mode (WSGI or ASGI) without a thread switch
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_serializer_timing()
+        dump_path = getattr(settings, 'METRICS_DUMP_PATH', None)
+        if dump_path:
+            atexit.register(registry.dump, dump_path)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with self.measure(request):
+            return await self.get_response(request)
+
+    @contextmanager
+    def measure(self, request):
+        counter = QueryCounter()
+        timer = SerializerTimer()
+        token = _serializer_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            with count_queries(counter):
+                yield
+        finally:
+            wall = time.perf_counter() - start
+            _serializer_timer.reset(token)
+        registry.record_request(
+            resolved_view_label(request),
+            int(wall * 1e6), int(counter.duration * 1e6), int(timer.duration * 1e6), counter.count,
+        )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, restricted to settings.METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1']):
+        raise PermissionDenied
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,143 @@
+"""
+Query budgets: keep the number of SQL queries of a view or code block bounded.
+
+- query_budget(n) is a context manager for tests that fails when the block runs
+  more than n queries.
+- Views declare their budget with a `query_budget` attribute, either an int or
+  a dict keyed by DRF action ({'list': 4, 'retrieve': 4}), or by method for
+  views without actions ({'get': 4, 'post': 6}).
+- QueryBudgetMiddleware checks declared budgets on every request and logs or
+  raises depending on settings.QUERY_BUDGET_MODE ('log' or 'raise'); it is
+  removed from the stack when the setting is empty.
+
+Queries are counted by an execute wrapper installed once on every connection,
+which adds them to the counters of the enclosing count_queries() blocks, found
+through a context variable. Connections are per thread, and the context
+follows the block into the threads of sync_to_async() (async views and the
+async ORM under ASGI), so their queries are counted too.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('siges.query_budget')
+
+# Counters of the count_queries() blocks the current code runs in
+_counters = contextvars.ContextVar('siges_query_counters', default=())
+
+
+class QueryCounter:
+    """Number of queries run and time spent in the database by a count_queries() block."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, duration):
+        self.duration += duration
+        self.count += 1
+
+
+def count_query(execute, sql, params, many, context):
+    counters = _counters.get()
+    if not counters:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for counter in counters:
+            counter.add(duration)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # First in the list: execute_wrapper() blocks remove the last wrapper when they exit
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+connection_created.connect(install_query_counter, dispatch_uid='siges_query_budget_counter')
+
+
+@contextmanager
+def count_queries(counter=None):
+    """Counts the queries run on every configured database inside the block, in any thread it reaches."""
+    counter = counter or QueryCounter()
+    for alias in connections: # Those of this thread opened before the signal was connected
+        install_query_counter(sender=None, connection=connections[alias])
+    token = _counters.set(_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _counters.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries, label='block'):
+    """Test helper: fails if the block runs more than max_queries queries."""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(
+            '%s ran %d queries, over its budget of %d.' % (label, counter.count, max_queries)
+        )
+
+
+def get_view_budget(view_func, request):
+    """Returns the budget declared by a view function or DRF view class, or None."""
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    budget = getattr(view_class, 'query_budget', getattr(view_func, 'query_budget', None))
+    if isinstance(budget, dict):
+        actions = getattr(view_func, 'actions', None)
+        return budget.get(actions.get(request.method.lower()) if actions else request.method.lower())
+    return budget
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', None)
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with count_queries() as counter:
+            response = self.get_response(request)
+        self.check(request, counter)
+        return response
+
+    async def __acall__(self, request):
+        with count_queries() as counter:
+            response = await self.get_response(request)
+        self.check(request, counter)
+        return response
+
+    def check(self, request, counter):
+        match = getattr(request, 'resolver_match', None)
+        budget = get_view_budget(match.func, request) if match is not None else None
+        if budget is not None and counter.count > budget:
+            message = '%s %s ran %d queries, over its budget of %d.' % (
+                request.method, request.path, counter.count, budget
+            )
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
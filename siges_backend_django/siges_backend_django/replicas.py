@@ -0,0 +1,139 @@
+"""
+Read replicas: route the safe requests of opted-in views to settings.DATABASE_REPLICAS.
+
+- Views opt in with `read_from_replica = True` (the hierarchy and student
+  viewsets); everything else, management commands and background work
+  included, reads from the primary ('default').
+- ReplicaRoutingMiddleware decides per request; ReplicaRouter applies the
+  decision to every query through a context variable.
+- Read-your-writes: a request that writes makes its user read from the
+  primary for settings.REPLICA_STICKY_SECONDS (remembered in the cache, so
+  shared by every worker when CACHES is), and the rest of that request too.
+- Every query is counted per alias in the metrics registry
+  (siges_db_queries_total{alias="..."}, see metrics.py).
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+from .metrics import registry
+
+_routing = contextvars.ContextVar('siges_replica_routing', default=None)
+
+
+def sticky_key(user_id):
+    return 'replica-sticky:%s' % user_id
+
+
+class RequestRouting:
+    """Routing state of one request."""
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self._sticky = {} # user id -> bool, looked up once per request
+
+    @property
+    def use_replica(self):
+        """Whether the resolved view opted in and the request is safe (False until the URL is resolved)."""
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None or self.request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return False
+        view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+        return getattr(view_class, 'read_from_replica', False)
+
+    def user_id(self):
+        user = getattr(self.request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+    def is_sticky(self):
+        user_id = self.user_id()
+        if user_id is None:
+            return False
+        if user_id not in self._sticky:
+            self._sticky[user_id] = cache.get(sticky_key(user_id)) is not None
+        return self._sticky[user_id]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if routing is None or not routing.use_replica or routing.wrote or not replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or routing.is_sticky():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # Replicas are copies of the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def count_query(execute, sql, params, many, context):
+    registry.inc(
+        'siges_db_queries_total', (('alias', context['connection'].alias),),
+        help_text='SQL queries run, per database alias.',
+    )
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class ReplicaRoutingMiddleware:
+    """Active only when settings.DATABASE_REPLICAS lists at least one alias."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_counter, dispatch_uid='siges_replica_query_counter')
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(sender=None, connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(RequestRouting(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routing = _routing.get()
+            _routing.reset(token)
+        self.remember_writer(routing)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing.set(RequestRouting(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing = _routing.get()
+            _routing.reset(token)
+        self.remember_writer(routing)
+        return response
+
+    def remember_writer(self, routing):
+        if routing.wrote and routing.user_id() is not None:
+            cache.set(sticky_key(routing.user_id()), 1, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta # Ensure timedelta is imported at the top
 
@@ -32,12 +33,18 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'sharding.apps.ShardingConfig', # Optional per-school shards of the student data; first, so that its receivers run first
 'students.apps.StudentsConfig',
     'rest_framework_simplejwt', # For JWT authentication
     # 'rest_framework.authtoken', # Can be removed if only SimpleJWT is used for token auth
     'rest_framework',           # Django REST framework
     'schools.apps.SchoolsConfig',
     'users.apps.UsersConfig',
+    'benchmarks.apps.BenchmarksConfig', # Synthetic data generator and API benchmark commands
+    'jobs.apps.JobsConfig', # Background jobs queued in the database, run by manage.py siges_worker
+    'stats.apps.StatsConfig', # Enrolment statistics for the dashboards
+    'sync.apps.SyncConfig', # Delta sync for offline-capable clients (/api/sync/)
+    'attendance.apps.AttendanceConfig', # Roll calls stored as bitmaps, and the absence reports
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -47,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'siges_backend_django.metrics.MetricsMiddleware', # Outermost so that it times the whole request; active only when METRICS_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'siges_backend_django.replicas.ReplicaRoutingMiddleware', # Active only when DATABASE_REPLICAS is not empty
+    'siges_backend_django.query_budget.QueryBudgetMiddleware', # Active only when QUERY_BUDGET_MODE is set
 ]
 
 ROOT_URLCONF = 'siges_backend_django.urls'
@@ -81,11 +91,85 @@ WSGI_APPLICATION = 'siges_backend_django.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Django's sqlite3 backend with WAL, memory-mapped reads and BEGIN IMMEDIATE writes
+        # (see siges_backend_django/db/sqlite3/base.py)
+        'ENGINE': 'siges_backend_django.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600, # Keep connections (page cache, mmap) across requests
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replica (e.g. a copy of db.sqlite3 refreshed with `manage.py copy_sqlite_replica`).
+# Safe requests of views with read_from_replica = True read from it (see siges_backend_django/replicas.py).
+if os.environ.get('SIGES_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SIGES_REPLICA_DB'],
+        'OPTIONS': {'pragmas': {'query_only': 'ON'}},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Shards (sharding/): with SIGES_SHARD_DBS set to a comma-separated list of SQLite files, the students of
+# each school live in the shard that SCHOOL_SHARD_MAP gives (school id -> alias), or the school id modulo the
+# number of shards for schools it does not list. Schools, levels, classes and users stay in 'default', copied
+# to every shard. After `migrate --database shard_N` for each shard, run `manage.py sync_shard_catalogue`.
+DATABASE_SHARDS = []
+for shard_file in filter(None, map(str.strip, os.environ.get('SIGES_SHARD_DBS', '').split(','))):
+    DATABASES['shard_%d' % len(DATABASE_SHARDS)] = {**DATABASES['default'], 'NAME': shard_file}
+    DATABASE_SHARDS.append('shard_%d' % len(DATABASE_SHARDS))
+SCHOOL_SHARD_MAP = {}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default' and alias not in DATABASE_SHARDS]
+DATABASE_ROUTERS = ['sharding.router.ShardRouter', 'siges_backend_django.replicas.ReplicaRouter']
+
+# After a write, the user's reads go to the primary for this long (read-your-writes)
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# LocMemCache is per process: use a shared backend (Redis, Memcached, database)
+# when running several workers so that cache invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Cached API responses (schools/response_cache.py): least recently used entries are evicted past MAX_ENTRIES
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 10 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Lifetime of a cached school hierarchy tree (entries are also replaced whenever the structure changes)
+SCHOOL_TREE_CACHE_TIMEOUT = 24 * 60 * 60
+# Cache alias of the school, level and class responses, and their lifetime (entries are also replaced whenever the schools change)
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 10 * 60
+# Lifetime of a parent's cached /api/me/children/ list (also replaced whenever it changes)
+MY_CHILDREN_CACHE_TIMEOUT = 60 * 60
+
+# Background jobs (jobs/queue.py): attempts of a handler registered without max_attempts, the retry
+# backoff (doubled on each failed attempt, with jitter, up to the maximum), how often a running job
+# renews its lease and how long an unrenewed lease lasts before the job is handed to another worker
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF_SECONDS = 10
+JOB_RETRY_MAX_BACKOFF_SECONDS = 60 * 60
+JOB_HEARTBEAT_SECONDS = 15
+JOB_LEASE_SECONDS = 60
+# Files read and written by jobs (uploaded imports, exports)
+JOB_FILES_DIR = BASE_DIR / 'job_files'
+
+# Delta sync (sync/changes.py): rows are only handed out once older than the settle delay, so that one
+# saved by a transaction still running is not skipped; tombstones, and thus sync tokens, are kept this long
+SYNC_SETTLE_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Student search (students/search.py): best matches kept per query, and an optional backend override (dotted path)
+STUDENT_SEARCH_MAX_RESULTS = 1000
+# STUDENT_SEARCH_BACKEND = 'students.search.ContainsSearchBackend'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,7 +218,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication', # Builds request.user from the token claims
     ),
     # Add other DRF settings here if needed, e.g., default permission classes
     # 'DEFAULT_PERMISSION_CLASSES': [
@@ -142,6 +226,20 @@ REST_FRAMEWORK = {
     # ]
 }
 
+# What to do when a view runs more queries than its declared `query_budget`:
+# 'log', 'raise' or None (check disabled)
+QUERY_BUDGET_MODE = 'log' if DEBUG else None
+
+# Per-endpoint latency/query histograms served on /metrics/ (see siges_backend_django/metrics.py)
+METRICS_ENABLED = os.environ.get('SIGES_METRICS_ENABLED', '') == '1'
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_DUMP_PATH = os.environ.get('SIGES_METRICS_DUMP_PATH') # Written at process exit when set
+
+# Keyset pagination of the lists that set it as pagination_class (see schools/pagination.py): default
+# page size, and upper bound for the ?page_size= query parameter
+KEYSET_PAGINATION_PAGE_SIZE = 50
+KEYSET_PAGINATION_MAX_PAGE_SIZE = 500
+
 # Simple JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -161,7 +259,7 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id', # Field in CustomUser model to use as user_id
     'USER_ID_CLAIM': 'user_id', # Claim in the JWT token
 
-    'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'AUTH_TOKEN_CLASSES': ('users.tokens.SchoolAccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
 
     'JTI_CLAIM': 'jti', # JWT ID, unique identifier for a token
@@ -169,4 +267,12 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5), # Not used if ROTATE_REFRESH_TOKENS is False
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1), # Not used if ROTATE_REFRESH_TOKENS is False
+
+    # Tokens carrying role, school_ids and auth_version claims (see users/tokens.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.tokens.SchoolTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.SchoolTokenRefreshSerializer',
 }
+
+# How long a user's auth_version fingerprint is cached. Changes made through the ORM
+# invalidate it at once, in the local cache only unless CACHES points to a shared backend.
+AUTH_VERSION_CACHE_TIMEOUT = 300
@@ -0,0 +1,18 @@
+"""
+Helpers shared by the apps' tests.
+"""
+from rest_framework.test import APIClient
+
+from users.tokens import SchoolAccessToken
+
+
+def jwt_header(user):
+    """Authorization header value carrying a fresh access token of the user."""
+    return 'Bearer %s' % SchoolAccessToken.for_user(user)
+
+
+def jwt_client(user):
+    """An API client authenticated the way real clients are: a Bearer access token of the user."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=jwt_header(user))
+    return client
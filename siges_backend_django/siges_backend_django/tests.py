@@ -0,0 +1,209 @@
+import datetime
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+
+from schools.models import Level, School, SchoolClass
+from students.models import Student
+from users.models import CustomUser
+from .db.sqlite3.base import DatabaseWrapper
+from .metrics import DURATION_BUCKETS, QUERY_BUCKETS, Histogram, MetricsRegistry, registry
+from .replicas import ReplicaRouter, ReplicaRoutingMiddleware
+from .testing import jwt_client, jwt_header
+
+
+class HistogramTests(TestCase):
+    def test_percentiles_within_relative_error(self):
+        histogram = Histogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        self.assertAlmostEqual(histogram.percentile(50), 50000, delta=50000 / 8)
+        self.assertAlmostEqual(histogram.percentile(99), 99000, delta=99000 / 8)
+
+    def test_prometheus_buckets_are_fixed(self):
+        metrics = MetricsRegistry()
+        metrics.record_request('StudentViewSet.list', 1500, 700, 300, 4)
+        first = metrics.render_prometheus()
+        metrics.record_request('StudentViewSet.list', 30000000, 12000, 0, 400)
+        second = metrics.render_prometheus()
+
+        bounds = lambda text, name: [
+            float(line.split('le="')[1].split('"')[0]) for line in text.splitlines() if line.startswith(name + '_bucket')
+        ]
+        for name, buckets in (('siges_request_duration_seconds', DURATION_BUCKETS), ('siges_request_queries', QUERY_BUCKETS)):
+            self.assertEqual(bounds(first, name), list(buckets) + [float('inf')])
+            self.assertEqual(bounds(second, name), bounds(first, name))
+        self.assertIn('siges_request_queries_bucket{endpoint="StudentViewSet.list",le="3"} 0', first)
+        self.assertIn('siges_request_queries_bucket{endpoint="StudentViewSet.list",le="5"} 1', first)
+        self.assertIn('siges_request_duration_seconds_bucket{endpoint="StudentViewSet.list",le="0.0025"} 1', second)
+        self.assertIn('siges_request_duration_seconds_bucket{endpoint="StudentViewSet.list",le="10.0"} 1', second)
+        self.assertIn('siges_request_duration_seconds_bucket{endpoint="StudentViewSet.list",le="+Inf"} 2', second)
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.school = School.objects.create(name='School', address='Abidjan')
+        SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=cls.school), academic_year='2024-2025')
+
+    def histogram(self, name, endpoint):
+        return registry.histograms[(name, (('endpoint', endpoint),))]
+
+    def test_sync_request(self):
+        jwt_client(self.admin).get('/api/schools/%d/tree/' % self.school.pk)
+        self.assertGreater(self.histogram('siges_request_queries', 'SchoolViewSet.tree').total, 0)
+        response = self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1')
+        self.assertIn('siges_request_queries_bucket{endpoint="SchoolViewSet.tree",le="+Inf"}', response.content.decode())
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    def test_async_request_queries_are_counted(self):
+        # The async ORM runs its queries in sync_to_async() threads, not the one of the middleware
+        headers = {'Authorization': jwt_header(self.admin)}
+        before = registry.histograms.get(('siges_request_queries', (('endpoint', 'AsyncSchoolTreeView.get'),)))
+        before = before.total if before else 0
+        response = async_to_sync(self.async_client.get)('/api/async/schools/%d/tree/' % self.school.pk, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(self.histogram('siges_request_queries', 'AsyncSchoolTreeView.get').total - before, 4)
+        self.assertGreater(self.histogram('siges_request_db_duration_seconds', 'AsyncSchoolTreeView.get').total, 0)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    """The tuned sqlite3 backend (see siges_backend_django/db/sqlite3/base.py) on a database file."""
+
+    def connect(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(directory.name, 'db.sqlite3'), 'OPTIONS': options}
+        wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            return cursor.execute('PRAGMA %s' % name).fetchone()[0]
+
+    def test_default_pragmas(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1) # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2) # MEMORY
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+    def test_overrides(self):
+        wrapper = self.connect(pragmas={'busy_timeout': 100, 'query_only': 'ON'}, transaction_mode='DEFERRED')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 100)
+        self.assertEqual(self.pragma(wrapper, 'query_only'), 1)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Which database ReplicaRouter picks for a request (see siges_backend_django/replicas.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def handle(self, method, path, user_id=7, write=False):
+        """Runs a request through ReplicaRoutingMiddleware; returns the alias a read would use."""
+        def view(request):
+            request.resolver_match = resolve(path)
+            if write:
+                self.router.db_for_write(Student)
+            return self.router.db_for_read(Student)
+        request = getattr(RequestFactory(), method)(path)
+        request.user = SimpleNamespace(pk=user_id, is_authenticated=True)
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_safe_requests_of_opted_in_views(self):
+        self.assertEqual(self.handle('get', '/api/students/'), 'replica')
+        self.assertEqual(self.handle('post', '/api/students/'), 'default')
+        self.assertEqual(self.handle('get', '/api/jobs/'), 'default') # Not opted in
+        self.assertEqual(self.router.db_for_read(Student), 'default') # Outside of a request
+
+    def test_read_your_writes(self):
+        self.assertEqual(self.handle('get', '/api/students/', write=True), 'default')
+        self.assertEqual(self.handle('get', '/api/students/'), 'default') # Sticky for REPLICA_STICKY_SECONDS
+        self.assertEqual(self.handle('get', '/api/students/', user_id=8), 'replica')
+        cache.clear()
+        self.assertEqual(self.handle('get', '/api/students/'), 'replica')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'students'))
+        self.assertTrue(self.router.allow_migrate('default', 'students'))
+
+
+class AsyncEndpointTests(TestCase):
+    """The /api/async/ reads render the same payloads as their sync counterparts (see asyncapi.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.school = School.objects.create(name='School', address='Abidjan', director=cls.director)
+        school_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=cls.school), academic_year='2024-2025')
+        cls.students = [
+            Student.objects.create(
+                first_name='Élève %d' % index, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=school_class,
+            )
+            for index in range(12)
+        ]
+        cls.students[0].parents.add(cls.parent)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameResponse(self, user, url):
+        sync_response = jwt_client(user).get(url)
+        async_response = async_to_sync(self.async_client.get)(url.replace('/api/', '/api/async/', 1), headers={'Authorization': jwt_header(user)})
+        self.assertEqual(async_response.status_code, sync_response.status_code, url)
+        expected = sync_response.content.decode().replace('/api/students/', '/api/async/students/')
+        self.assertEqual(json.loads(async_response.content), json.loads(expected), url)
+        return async_response
+
+    def test_parity(self):
+        student = self.students[0]
+        urls = [
+            '/api/students/?page_size=5',
+            '/api/students/?fields=id,first_name&expand=parents',
+            '/api/students/?search=elev',
+            '/api/students/?expand=unknown',
+            '/api/students/%d/' % student.pk,
+            '/api/students/%d/' % self.students[1].pk,
+            '/api/schools/%d/tree/' % self.school.pk,
+            '/api/users/me/?fields=id,role',
+        ]
+        for user in (self.admin, self.director, self.parent):
+            for url in urls:
+                with self.subTest(role=user.role, url=url):
+                    self.assertSameResponse(user, url)
+
+    def test_cursor_pages(self):
+        headers = {'Authorization': jwt_header(self.admin)}
+        response = async_to_sync(self.async_client.get)('/api/async/students/?page_size=5', headers=headers)
+        seen = [row['id'] for row in response.json()['results']]
+        while response.json()['next']:
+            response = async_to_sync(self.async_client.get)(response.json()['next'], headers=headers)
+            seen += [row['id'] for row in response.json()['results']]
+        self.assertEqual(sorted(seen), sorted(student.pk for student in self.students))
+
+    def test_tree_etag_and_authentication(self):
+        url = '/api/async/schools/%d/tree/' % self.school.pk
+        headers = {'Authorization': jwt_header(self.director)}
+        response = async_to_sync(self.async_client.get)(url, headers=headers)
+        self.assertEqual(async_to_sync(self.async_client.get)(url, headers={**headers, 'If-None-Match': response['ETag']}).status_code, 304)
+        self.assertEqual(async_to_sync(self.async_client.get)('/api/async/users/me/').status_code, 401)
+        self.assertEqual(async_to_sync(self.async_client.get)('/api/async/users/me/', headers={'Authorization': 'Bearer invalid'}).status_code, 401)
+        self.assertEqual(async_to_sync(self.async_client.post)('/api/async/students/', headers=headers).status_code, 405)
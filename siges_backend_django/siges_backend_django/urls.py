@@ -4,6 +4,8 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from students.views import MyChildrenView
+from .metrics import metrics_view
 
 urlpatterns = [
     path('api/', include('schools.urls')),
@@ -11,4 +13,11 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/users/', include('users.urls')), # Include users app urls
+    path('api/jobs/', include('jobs.urls')), # Status of the background jobs
+    path('api/stats/', include('stats.urls')), # Dashboard statistics
+    path('api/sync/', include('sync.urls')), # Delta sync for offline clients
+    path('api/attendance/', include('attendance.urls')), # Roll calls and absence reports
+    path('api/me/children/', MyChildrenView.as_view(), name='my_children'), # Parent portal
+    path('api/async/', include('siges_backend_django.async_urls')), # Async read endpoints, for ASGI servers
+    path('metrics/', metrics_view, name='metrics'), # Prometheus scrape endpoint
 ]
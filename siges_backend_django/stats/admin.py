@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import EnrollmentCount
+
+@admin.register(EnrollmentCount)
+class EnrollmentCountAdmin(admin.ModelAdmin):
+    list_display = ('school_class', 'gender', 'status', 'count', 'level', 'cycle', 'school', 'academic_year')
+    list_filter = ('academic_year', 'cycle', 'gender', 'status')
+    list_select_related = ('school_class', 'level', 'school')
+
+    def has_add_permission(self, request):
+        return False # Rows are maintained from the students (see stats/enrollment.py)
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,135 @@
+"""
+Maintenance and reads of the EnrollmentCount summary table.
+
+Single-student writes apply deltas: -1 on the (class, gender, status) the
+student was counted under, +1 on the new one, with an UPDATE ... SET count =
+count + n that only inserts the row the first time a combination appears.
+Set-based writes (bulk import, bulk update, rollover) recount the classes
+they touched, with one grouped query over those classes. rebuild() recounts
+everything.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from schools.models import SchoolClass
+from sharding.shards import each_shard, selected_shards
+from students.models import Student
+from .models import EnrollmentCount
+
+# ?group_by= dimensions: the columns each one returns
+DIMENSIONS = {
+    'school': ['school_id', 'school__name'],
+    'level': ['level_id', 'level__name'],
+    'class': ['school_class_id', 'school_class__name'],
+    'cycle': ['cycle'],
+    'academic_year': ['academic_year'],
+    'gender': ['gender'],
+    'status': ['status'],
+}
+# Filters accepted by aggregate(): query parameter -> column
+FILTERS = {
+    'school_id': 'school_id',
+    'level_id': 'level_id',
+    'class_id': 'school_class_id',
+    'cycle': 'cycle',
+    'academic_year': 'academic_year',
+    'gender': 'gender',
+    'status': 'status',
+}
+# Columns copied from the class, as read from SchoolClass and from Student rows
+CLASS_COLUMNS = {'level_id': 'level_id', 'cycle': 'level__cycle', 'school_id': 'level__school_id', 'academic_year': 'academic_year'}
+
+
+def student_key(school_class_id, gender, status):
+    return (school_class_id, gender, status)
+
+
+def apply_deltas(deltas):
+    """Applies {(class_id, gender, status): delta} to the counts."""
+    deltas = {key: delta for key, delta in deltas.items() if delta and key[0] is not None}
+    classes = None
+    for (class_id, gender, status), delta in deltas.items():
+        rows = EnrollmentCount.objects.filter(school_class_id=class_id, gender=gender, status=status)
+        if rows.update(count=F('count') + delta):
+            if delta < 0:
+                rows.filter(count=0).delete()
+            continue
+        if delta < 0:
+            continue # Nothing counted yet (the table predates the student): rebuild_enrollment_stats fixes it
+        if classes is None:
+            classes = {
+                row['pk']: row for row in SchoolClass.objects.filter(
+                    pk__in={key[0] for key in deltas}
+                ).order_by().values('pk', *CLASS_COLUMNS.values())
+            }
+        school_class = classes[class_id]
+        try:
+            with transaction.atomic():
+                EnrollmentCount.objects.create(
+                    school_class_id=class_id, gender=gender, status=status, count=delta,
+                    **{column: school_class[source] for column, source in CLASS_COLUMNS.items()},
+                )
+        except IntegrityError:
+            # A concurrent write inserted the row first
+            rows.update(count=F('count') + delta)
+
+
+def recount_classes(class_ids=None):
+    """Recounts the rows of these classes (of every class when None) from the students."""
+    students = Student.objects.order_by()
+    rows = EnrollmentCount.objects.all()
+    if class_ids is not None:
+        class_ids = set(class_ids) - {None}
+        if not class_ids:
+            return
+        students = students.filter(school_class_id__in=class_ids)
+        rows = rows.filter(school_class_id__in=class_ids)
+    sources = {column: 'school_class__' + source for column, source in CLASS_COLUMNS.items()}
+    counts = []
+    # The students of the selected shard (set-based writes run on their shard), or of every shard for a rebuild
+    for _ in each_shard(selected_shards()):
+        counts += students.values('school_class_id', 'gender', 'status', *sources.values()).annotate(count=Count('pk'))
+    with transaction.atomic(savepoint=False):
+        rows.delete()
+        EnrollmentCount.objects.bulk_create([
+            EnrollmentCount(
+                school_class_id=row['school_class_id'], gender=row['gender'], status=row['status'], count=row['count'],
+                **{column: row[source] for column, source in sources.items()},
+            )
+            for row in counts
+        ], batch_size=1000)
+
+
+def rebuild():
+    recount_classes(None)
+    return EnrollmentCount.objects.aggregate(students=Sum('count'))['students'] or 0
+
+
+def move_class(school_class):
+    """Copies a class's level, cycle, school and year to its rows after the class changed."""
+    columns = SchoolClass.objects.filter(pk=school_class.pk).values(*CLASS_COLUMNS.values()).first()
+    if columns is not None:
+        EnrollmentCount.objects.filter(school_class_id=school_class.pk).update(
+            **{column: columns[source] for column, source in CLASS_COLUMNS.items()}
+        )
+
+
+def move_level(level):
+    EnrollmentCount.objects.filter(level_id=level.pk).update(school_id=level.school_id, cycle=level.cycle)
+
+
+def aggregate(group_by, filters=None, school_ids=None):
+    """
+    Student counts grouped by the given DIMENSIONS, within the given FILTERS
+    values and, unless None, these schools. Returns a list of dicts.
+    """
+    rows = EnrollmentCount.objects.filter(**{FILTERS[name]: value for name, value in (filters or {}).items()})
+    if school_ids is not None:
+        rows = rows.filter(school_id__in=school_ids)
+    columns = [column for dimension in group_by for column in DIMENSIONS[dimension]]
+    if not columns:
+        return [{'count': rows.aggregate(count=Sum('count'))['count'] or 0}]
+    return [
+        {key.replace('__', '_'): value for key, value in row.items()} # school__name -> school_name
+        for row in rows.values(*columns).annotate(count=Sum('count')).order_by(*columns)
+    ]
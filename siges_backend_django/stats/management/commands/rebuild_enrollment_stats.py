@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from stats.enrollment import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the enrolment statistics table (stats.EnrollmentCount) from the students. "
+        "Only needed after writes that bypassed the ORM signals, e.g. raw SQL or loaddata."
+    )
+
+    def handle(self, *args, **options):
+        students = rebuild()
+        self.stdout.write(self.style.SUCCESS('Enrolment statistics rebuilt: %d students counted.' % students))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_enrollment_counts(apps, schema_editor):
+    # Same columns as stats.enrollment.recount_classes(), with the historical models
+    Student = apps.get_model('students', 'Student')
+    EnrollmentCount = apps.get_model('stats', 'EnrollmentCount')
+    sources = {
+        'level_id': 'school_class__level_id', 'cycle': 'school_class__level__cycle',
+        'school_id': 'school_class__level__school_id', 'academic_year': 'school_class__academic_year',
+    }
+    counts = Student.objects.order_by().values('school_class_id', 'gender', 'status', *sources.values()).annotate(count=Count('pk'))
+    EnrollmentCount.objects.bulk_create((
+        EnrollmentCount(
+            school_class_id=row['school_class_id'], gender=row['gender'], status=row['status'], count=row['count'],
+            **{column: row[source] for column, source in sources.items()},
+        )
+        for row in counts
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('schools', '0005_level_order'),
+        ('students', '0004_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gender', models.CharField(max_length=10)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('cycle', models.CharField(max_length=20)),
+                ('academic_year', models.CharField(max_length=9)),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.level')),
+                ('school', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.school')),
+                ('school_class', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.schoolclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'academic_year'], name='enrollment_school_year_idx'), models.Index(fields=['academic_year', 'cycle'], name='enrollment_year_cycle_idx')],
+                'constraints': [models.UniqueConstraint(fields=('school_class', 'gender', 'status'), name='enrollment_count_unique')],
+            },
+        ),
+        migrations.RunPython(fill_enrollment_counts, migrations.RunPython.noop),
+    ]
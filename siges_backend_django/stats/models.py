@@ -0,0 +1,36 @@
+from django.db import models
+
+from schools.models import Level, School, SchoolClass
+
+
+class EnrollmentCount(models.Model):
+    """
+    Summary table of the enrolment dashboards: the number of students of a
+    class by gender and status, with the class's level, cycle, school and
+    academic year copied alongside so that any aggregate is a small indexed
+    read. Rows are kept up to date by the receivers of stats/signals.py (see
+    stats/enrollment.py) and rebuilt by manage.py rebuild_enrollment_stats;
+    never write them directly.
+    """
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE, related_name='+', db_index=False)
+    gender = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name='+')
+    cycle = models.CharField(max_length=20)
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='+', db_index=False)
+    academic_year = models.CharField(max_length=9)
+
+    class Meta:
+        constraints = [
+            # Also the index of the per-class delta updates
+            models.UniqueConstraint(fields=['school_class', 'gender', 'status'], name='enrollment_count_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['school', 'academic_year'], name='enrollment_school_year_idx'),
+            models.Index(fields=['academic_year', 'cycle'], name='enrollment_year_cycle_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s %s: %d' % (self.school_class_id, self.gender, self.status, self.count)
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from schools.models import Level, SchoolClass
+from students.models import Student
+from students.signals import students_bulk_changed
+from .enrollment import apply_deltas, move_class, move_level, recount_classes, student_key
+
+
+COUNTED_FIELDS = ('school_class_id', 'gender', 'status')
+
+
+@receiver(pre_save, sender=Student)
+def student_saving_enrollment(sender, instance, raw=False, **kwargs):
+    # Saved without having been read, or read with only()/defer(): what it was counted under comes from the row
+    loaded = getattr(instance, '_loaded_values', {})
+    if not raw and instance.pk is not None and not all(attname in loaded for attname in COUNTED_FIELDS):
+        stored = Student.objects.filter(pk=instance.pk).values(*COUNTED_FIELDS).first() or {}
+        instance._loaded_values = {**loaded, **stored}
+
+
+@receiver(post_save, sender=Student)
+def student_saved_enrollment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {student_key(*[getattr(instance, attname) for attname in COUNTED_FIELDS]): 1}
+    if not created:
+        previous = student_key(*[instance.get_loaded_value(attname) for attname in COUNTED_FIELDS])
+        deltas[previous] = deltas.get(previous, 0) - 1
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted_enrollment(sender, instance, **kwargs):
+    apply_deltas({student_key(*[getattr(instance, attname) for attname in COUNTED_FIELDS]): -1})
+
+
+@receiver(students_bulk_changed)
+def students_bulk_changed_enrollment(sender, class_ids=(), **kwargs):
+    recount_classes(class_ids)
+
+
+@receiver(post_save, sender=SchoolClass)
+def school_class_saved_enrollment(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        move_class(instance)
+
+
+@receiver(post_save, sender=Level)
+def level_saved_enrollment(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        move_level(instance)
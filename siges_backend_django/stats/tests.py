@@ -0,0 +1,112 @@
+import datetime
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from schools.models import Level, School, SchoolClass
+from schools.rollover import AcademicYearRollover
+from siges_backend_django.query_budget import query_budget
+from siges_backend_django.testing import jwt_client
+from students.models import Student
+from users.models import CustomUser
+from .models import EnrollmentCount
+
+
+def recounted():
+    """{(class_id, gender, status): count} counted from the students."""
+    rows = Student.objects.order_by().values('school_class_id', 'gender', 'status').annotate(count=Count('pk'))
+    return {(row['school_class_id'], row['gender'], row['status']): row['count'] for row in rows}
+
+
+class EnrollmentStatsTests(TestCase):
+    """The EnrollmentCount summary table follows the student writes, and serves GET /api/stats/enrollment/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.classes = []
+        for name, director in (('School', cls.director), ('Other', None)):
+            level = Level.objects.create(name='CP1', school=School.objects.create(name=name, address='Abidjan', director=director))
+            cls.classes += [SchoolClass.objects.create(name=class_name, level=level, academic_year='2024-2025') for class_name in ('CP1 A', 'CP1 B')]
+        for index in range(12):
+            Student.objects.create(
+                first_name='Élève %d' % index, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1),
+                gender=('MALE', 'FEMALE')[index % 2], school_class=cls.classes[index % 4],
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCountsMatch(self):
+        counts = {}
+        for row in EnrollmentCount.objects.select_related('school_class__level'):
+            school_class = row.school_class
+            self.assertEqual(
+                (row.level_id, row.school_id, row.cycle, row.academic_year),
+                (school_class.level_id, school_class.level.school_id, school_class.level.cycle, school_class.academic_year),
+            )
+            if row.count:
+                counts[(row.school_class_id, row.gender, row.status)] = row.count
+        self.assertEqual(counts, recounted())
+
+    def test_single_student_writes(self):
+        student = Student.objects.first()
+        student.school_class = self.classes[3]
+        student.status = 'INACTIVE'
+        student.save()
+        self.assertCountsMatch()
+        student = Student.objects.only('pk', 'gender').last()
+        student.gender = 'MALE' if student.gender == 'FEMALE' else 'FEMALE'
+        student.save()
+        self.assertCountsMatch()
+        Student.objects.first().delete()
+        self.assertCountsMatch()
+
+    def test_set_based_writes(self):
+        ids = list(Student.objects.filter(school_class__level__school__director=self.director).values_list('pk', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = jwt_client(self.director).post(
+                '/api/students/bulk/', {'ids': ids, 'school_class': self.classes[1].pk, 'status': 'TRANSFERRED_OUT'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertCountsMatch()
+
+        school_class = self.classes[2]
+        school_class.level = self.classes[0].level
+        school_class.academic_year = '2023-2024'
+        school_class.save()
+        self.assertCountsMatch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AcademicYearRollover('2024-2025').run()
+        self.assertCountsMatch()
+
+    def test_rebuild_command(self):
+        EnrollmentCount.objects.all().delete()
+        call_command('rebuild_enrollment_stats', stdout=io.StringIO())
+        self.assertCountsMatch()
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_api(self):
+        client = jwt_client(self.admin)
+        response = client.get('/api/stats/enrollment/?group_by=school,gender')
+        self.assertEqual(response.json()['total'], 12)
+        self.assertEqual(
+            {(row['school_id'], row['gender']): row['count'] for row in response.json()['results']},
+            {(school_id, gender): 3 for school_id in (self.classes[0].level.school_id, self.classes[2].level.school_id) for gender in ('MALE', 'FEMALE')},
+        )
+        response = client.get('/api/stats/enrollment/?group_by=class&class_id=%d' % self.classes[0].pk)
+        self.assertEqual(response.json()['results'], [{'school_class_id': self.classes[0].pk, 'school_class_name': 'CP1 A', 'count': 3}])
+
+        director = jwt_client(self.director)
+        with query_budget(3, 'cold director enrolment stats'):
+            response = director.get('/api/stats/enrollment/?group_by=school')
+        self.assertEqual(response.json()['results'], [{'school_id': self.classes[0].level.school_id, 'school_name': 'School', 'count': 6}])
+        self.assertEqual(director.get('/api/stats/enrollment/?group_by=unknown').status_code, 400)
+        self.assertEqual(director.get('/api/stats/enrollment/?school_id=abc').status_code, 400)
+        self.assertEqual(jwt_client(self.parent).get('/api/stats/enrollment/').status_code, 403)
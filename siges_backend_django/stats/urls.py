@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import EnrollmentStatsView
+
+urlpatterns = [
+    path('enrollment/', EnrollmentStatsView.as_view(), name='enrollment_stats'),
+]
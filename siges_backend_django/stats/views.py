@@ -0,0 +1,38 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from schools.access import get_access_context
+from schools.permissions import CanManageSchoolContent
+from .enrollment import DIMENSIONS, FILTERS, aggregate
+
+
+class EnrollmentStatsView(APIView):
+    """
+    Enrolment counts for the dashboards, read from the EnrollmentCount summary table:
+    ?group_by=school,level,class,cycle,academic_year,gender,status (any combination, comma-separated)
+    within the optional school_id, level_id, class_id, cycle, academic_year, gender and status filters.
+    Directors get the figures of their schools, super admins those of the network.
+    """
+    permission_classes = [CanManageSchoolContent]
+    query_budget = 3 # Checked by QueryBudgetMiddleware, auth included
+
+    def get(self, request):
+        group_by = [name.strip() for name in request.query_params.get('group_by', '').split(',') if name.strip()]
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            raise serializers.ValidationError({'group_by': 'Unknown dimension(s): %s. Expected %s.' % (
+                ', '.join(unknown), ', '.join(DIMENSIONS))})
+        filters = {name: request.query_params[name] for name in FILTERS if request.query_params.get(name)}
+        for name in ('school_id', 'level_id', 'class_id'):
+            if name in filters and not filters[name].isdigit():
+                raise serializers.ValidationError({name: 'Expected an id.'})
+
+        access = get_access_context(request)
+        school_ids = None if access.is_super_admin else access.school_ids
+        results = aggregate(list(dict.fromkeys(group_by)), filters, school_ids)
+        return Response({
+            'group_by': group_by,
+            'total': sum(row['count'] for row in results),
+            'results': results,
+        })
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from .models import Student
+from .search import search_students
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'display_school_class', 'status', 'enrollment_date')
     list_filter = ('status', 'school_class__level__school__name', 'school_class__level__name', 'school_class__academic_year')
-    search_fields = ('first_name', 'last_name', 'school_class__name', 'parents__email', 'parents__username')
+    search_fields = ('first_name', 'last_name', 'school_class__name', 'parents__email', 'parents__username') # Through students/search.py
     filter_horizontal = ('parents',) 
     readonly_fields = ('enrollment_date',)
     fieldsets = (
@@ -24,6 +25,16 @@ class StudentAdmin(admin.ModelAdmin):
     )
     autocomplete_fields = ['school_class', 'parents'] # For easier selection in admin
 
+    def get_queryset(self, request):
+        # display_school_class and Student.__str__ walk school_class.level.school for every row
+        return super().get_queryset(request).select_related('school_class__level__school')
+
+    def get_search_results(self, request, queryset, search_term):
+        # The search index covers search_fields, accents folded, without joining parents (no duplicates)
+        if not search_term.strip():
+            return queryset, False
+        return search_students(queryset, search_term), False
+
     def display_school_class(self, obj):
         if obj.school_class:
             return f"{obj.school_class.name} ({obj.school_class.level.name} - {obj.school_class.level.school.name})"
@@ -0,0 +1,55 @@
+"""
+Async student list and retrieve (see siges_backend_django/asyncapi.py): the
+payloads of StudentViewSet's values() read path, ?fields=/?expand=,
+?search= and keyset pagination included.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import NotFound
+
+from schools.access import get_access_context
+from schools.fastread import ValuesPlan
+from schools.pagination import KeysetPagination
+from sharding.shards import shard_for_student, shards
+from sharding.views import use_single_shard
+from siges_backend_django.asyncapi import AsyncAPIView
+from .models import Student
+from .permissions import CanManageSchoolStudents
+from .search import search_students
+from .serializers import StudentSerializer
+from .views import student_shards, visible_students
+
+
+class AsyncStudentListView(AsyncAPIView):
+    permission_classes = [CanManageSchoolStudents]
+    query_budget = 5 # As StudentViewSet.list, auth included
+    read_from_replica = True
+
+    async def get(self, request):
+        # Pages are not merged across shards here: that takes StudentViewSet.list
+        with use_single_shard(student_shards(request), 'Students on several shards are listed by /api/students/ only.'):
+            plan = ValuesPlan(StudentSerializer(context={'request': request}))
+            queryset = visible_students(request)
+            query = request.query_params.get('search', '').strip()
+            if query:
+                # The ranking query runs on the connection's cursor (students/search.py): the one sync step
+                queryset = await sync_to_async(search_students)(queryset, query, get_access_context(request))
+            paginator = KeysetPagination()
+            rows = await paginator.apaginate_queryset(plan.values(queryset), request)
+            return paginator.get_paginated_data(await plan.arender(rows))
+
+
+class AsyncStudentDetailView(AsyncAPIView):
+    permission_classes = [CanManageSchoolStudents]
+    query_budget = 4
+    read_from_replica = True
+
+    async def get(self, request, pk):
+        plan = ValuesPlan(StudentSerializer(context={'request': request}))
+        # Student ids tell their shard; others are not found on the first one
+        with use_single_shard([shard_for_student(pk) or shards()[0]] if shards() else []):
+            try:
+                # The user's students only: others are not found, as with StudentViewSet.retrieve
+                row = await plan.values(visible_students(request).filter(pk=pk)).aget()
+            except Student.DoesNotExist:
+                raise NotFound('No Student matches the given query.')
+            return (await plan.arender([row]))[0]
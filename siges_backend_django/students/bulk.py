@@ -0,0 +1,83 @@
+"""
+Bulk transfer and status changes of students (POST /api/students/bulk/).
+
+Instead of one PATCH per student (a class lookup, the object permission
+and an UPDATE each), the ids and the target class are checked against the
+caller's schools with one query, then every student is changed with one
+UPDATE in a transaction: a constant number of queries for N students.
+The read models are refreshed through students_bulk_changed, as set-based
+writes skip post_save.
+"""
+from django.db import models, router, transaction
+from django.db.models import Value
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+
+from schools.access import get_access_context
+from schools.models import SchoolClass
+from .models import Student
+from .signals import students_bulk_changed
+
+
+class StudentBulkUpdate:
+    def __init__(self, request, ids, school_class=None, status=None):
+        self.access = get_access_context(request)
+        self.ids = set(ids)
+        self.school_class = school_class
+        self.status = status
+
+    def load(self):
+        """(pk, class_id, school_id, status) of each student, plus (None, class_id, school_id, None) for the target class."""
+        rows = Student.objects.filter(pk__in=self.ids).order_by().values_list(
+            'pk', 'school_class_id', 'school_class__level__school_id', 'status'
+        )
+        if self.school_class is not None:
+            # One round-trip for both checks
+            rows = rows.union(SchoolClass.objects.filter(pk=self.school_class).order_by().values_list(
+                Value(None, output_field=models.IntegerField()), 'pk', 'level__school_id',
+                Value(None, output_field=models.CharField()),
+            ), all=True)
+        return list(rows)
+
+    def check(self, rows):
+        students = [row for row in rows if row[0] is not None]
+        missing = self.ids - {row[0] for row in students}
+        if missing:
+            raise serializers.ValidationError({'ids': ['Unknown student ids: %s.' % ', '.join(map(str, sorted(missing)))]})
+        if self.school_class is not None:
+            target = next((row for row in rows if row[0] is None), None)
+            if target is None:
+                raise serializers.ValidationError({'school_class': 'Invalid SchoolClass ID.'})
+            if not self.access.can_manage_school(target[2]):
+                raise PermissionDenied("You can only move students to classes in your school(s).")
+        if not all(self.access.can_manage_school(row[2]) for row in students):
+            raise PermissionDenied("You can only update students of your school(s).")
+        return students
+
+    def run(self):
+        changes = {'updated_at': timezone.now()} # update() skips auto_now
+        if self.school_class is not None:
+            changes['school_class_id'] = self.school_class
+        if self.status is not None:
+            changes['status'] = self.status
+        with transaction.atomic(using=router.db_for_write(Student)): # The shard's, with sharding
+            rows = self.load()
+            students = self.check(rows)
+            targets = Student.objects.filter(pk__in=self.ids)
+            if not self.access.is_super_admin:
+                # Students moved out of the caller's schools since the check are left alone
+                targets = targets.filter(school_class__level__school_id__in=self.access.school_ids)
+            updated = targets.update(**changes)
+            students_bulk_changed.send(
+                sender=Student,
+                student_ids=sorted(self.ids),
+                class_ids={row[1] for row in students} | ({self.school_class} if self.school_class is not None else set()),
+                previous_classes={row[0]: row[1] for row in students if self.school_class is not None},
+                class_schools={row[1]: row[2] for row in rows}, # Read by load(): the receivers skip their lookups
+            )
+        return {
+            'updated': updated,
+            'moved': sum(1 for row in students if self.school_class is not None and row[1] != self.school_class),
+            'status_changed': sum(1 for row in students if self.status is not None and row[3] != self.status),
+        }
@@ -0,0 +1,122 @@
+"""
+Maintenance of the ParentChild read model and of the per-parent cache of /api/me/children/.
+
+Every change to what a parent sees (a student's fields or class, the parents
+M2M, a class, level or school rename) rebuilds the affected rows and bumps the
+version of each parent whose list changed, once the transaction commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import QuerySet
+
+from schools.caching import bump_version, get_version
+from sharding.shards import each_shard, is_enabled as sharding_enabled
+from .models import ParentChild, Student
+
+# ParentChild column -> lookup from the Student.parents through model
+ROW_SOURCES = {
+    'parent_id': 'customuser_id',
+    'student_id': 'student_id',
+    'first_name': 'student__first_name',
+    'last_name': 'student__last_name',
+    'date_of_birth': 'student__date_of_birth',
+    'gender': 'student__gender',
+    'status': 'student__status',
+    'photo_url': 'student__photo_url',
+    'school_class_id': 'student__school_class_id',
+    'school_class_name': 'student__school_class__name',
+    'academic_year': 'student__school_class__academic_year',
+    'level_id': 'student__school_class__level_id',
+    'level_name': 'student__school_class__level__name',
+    'school_id': 'student__school_class__level__school_id',
+    'school_name': 'student__school_class__level__school__name',
+}
+# Student fields copied into the read model: saving a student without changing them skips the rebuild
+DENORMALISED_STUDENT_FIELDS = [
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'status', 'photo_url', 'school_class_id',
+]
+# Fields of the /api/me/children/ payload, in order ('id' is the student id)
+CHILD_FIELDS = [
+    'student_id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'status', 'photo_url',
+    'school_class_id', 'school_class_name', 'academic_year', 'level_id', 'level_name', 'school_id', 'school_name',
+]
+
+
+def children_version_key(parent_id):
+    return 'my-children-version:%s' % parent_id
+
+
+def get_children_version(parent_id):
+    return get_version(children_version_key(parent_id))
+
+
+def invalidate_children(parent_ids):
+    parent_ids = set(parent_ids) - {None}
+    if parent_ids:
+        # After commit, so that a concurrent reader cannot cache the rows being replaced under the new version
+        transaction.on_commit(
+            lambda: [bump_version(children_version_key(parent_id)) for parent_id in parent_ids],
+            using=router.db_for_write(ParentChild),
+        )
+
+
+def rebuild_children(students, created=False):
+    """
+    Rebuilds the ParentChild rows of the given students (a Student queryset or a
+    list of ids) in four queries, whatever their number; in two for students
+    just created (created=True), who have no rows to replace.
+    """
+    if isinstance(students, QuerySet):
+        student_filter = {'student_id__in': students.values('pk')}
+    else:
+        student_ids = list(students)
+        if not student_ids:
+            return
+        student_filter = {'student_id__in': student_ids}
+    Through = Student.parents.through
+
+    # No savepoint of its own inside the caller's transaction: nothing here recovers from an error
+    with transaction.atomic(using=router.db_for_write(ParentChild), savepoint=False):
+        parent_ids = set()
+        if not created:
+            stale = ParentChild.objects.filter(**student_filter)
+            parent_ids = set(stale.values_list('parent_id', flat=True))
+            stale.delete()
+        rows = [
+            ParentChild(**dict(zip(ROW_SOURCES, values)))
+            for values in Through.objects.filter(**student_filter).values_list(*ROW_SOURCES.values()).iterator()
+        ]
+        ParentChild.objects.bulk_create(rows, batch_size=1000)
+        invalidate_children(parent_ids | {row.parent_id for row in rows})
+
+
+def rename_school(school_id, name):
+    """Propagates a school rename with one UPDATE instead of rebuilding every row of the school."""
+    rows = ParentChild.objects.filter(school_id=school_id).exclude(school_name=name)
+    parent_ids = set(rows.values_list('parent_id', flat=True))
+    if parent_ids:
+        rows.update(school_name=name)
+        invalidate_children(parent_ids)
+
+
+def student_fields_changed(student):
+    return any(student.get_loaded_value(attname) != getattr(student, attname) for attname in DENORMALISED_STUDENT_FIELDS)
+
+
+def get_children(parent_id, version):
+    """Children of the parent as a list of dicts, from the cache or one indexed query."""
+    key = 'my-children:%s:%s' % (parent_id, version)
+    children = cache.get(key)
+    if children is None:
+        children = [
+            dict(zip(['id'] + CHILD_FIELDS[1:], values))
+            for _ in each_shard() # With sharding, the children can be in several schools' shards
+            for values in ParentChild.objects.filter(parent_id=parent_id).order_by(
+                'school_class_name', 'last_name', 'first_name'
+            ).values_list(*CHILD_FIELDS)
+        ]
+        if sharding_enabled():
+            children.sort(key=lambda child: (child['school_class_name'], child['last_name'], child['first_name']))
+        cache.set(key, children, getattr(settings, 'MY_CHILDREN_CACHE_TIMEOUT', 60 * 60))
+    return children
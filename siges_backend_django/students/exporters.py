@@ -0,0 +1,92 @@
+import csv
+import itertools
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import serializers
+
+from .models import Student
+
+EXPORT_FIELDS = [
+    'id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'status', 'enrollment_date',
+    'address', 'emergency_contact_name', 'emergency_contact_phone',
+    'school_class_id', 'school_class__name', 'school_class__academic_year',
+    'school_class__level__name', 'school_class__level__school__name',
+]
+EXPORT_HEADER = [
+    'id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'status', 'enrollment_date',
+    'address', 'emergency_contact_name', 'emergency_contact_phone',
+    'school_class', 'class_name', 'academic_year', 'level_name', 'school_name', 'parent_emails',
+]
+
+
+def iter_student_rows(queryset, chunk_size=2000):
+    """
+    Yields lists of export rows (tuples in EXPORT_HEADER order), one list per chunk.
+
+    Students are read with a chunked iterator over a values_list() projection,
+    and the parent e-mails of each chunk come from a single query on the
+    parents through table, so memory stays bounded by chunk_size.
+    """
+    rows = queryset.prefetch_related(None).select_related(None).values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    Through = Student.parents.through
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        emails = {}
+        links = Through.objects.filter(student_id__in=[row[0] for row in chunk]) \
+            .order_by('student_id', 'customuser_id').values_list('student_id', 'customuser__email')
+        for student_id, email in links:
+            emails.setdefault(student_id, []).append(email)
+        yield [row + (emails.get(row[0], []),) for row in chunk]
+
+
+class Echo:
+    """File-like object whose write() hands the written text back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(chunks):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for chunk in chunks:
+        yield ''.join(writer.writerow(row[:-1] + (';'.join(row[-1]),)) for row in chunk)
+
+
+def ndjson_stream(chunks):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for chunk in chunks:
+        yield ''.join(encoder.encode(dict(zip(EXPORT_HEADER, row))) + '\n' for row in chunk)
+
+
+def gzip_stream(parts):
+    compressor = zlib.compressobj(wbits=31) # 31: gzip container
+    for part in parts:
+        data = compressor.compress(part.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ?output= formats: (stream, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (ndjson_stream, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+}
+
+
+def export_stream(chunks, output='csv', compress=None):
+    """
+    Returns (parts, content_type, filename) of an export in this format: text
+    parts, or bytes when compress is 'gzip'. Rendering is lazy.
+    """
+    if output not in EXPORT_FORMATS:
+        raise serializers.ValidationError({'output': "Expected 'csv' or 'ndjson'."})
+    stream, content_type, extension = EXPORT_FORMATS[output]
+    content, filename = stream(chunks), 'students.%s' % extension
+    if compress == 'gzip':
+        content, content_type, filename = gzip_stream(content), 'application/gzip', filename + '.gz'
+    return content, content_type, filename
@@ -0,0 +1,90 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves pks from objects fetched up front.
+
+    When the serializer context holds context['prefetched'][<model>] (a dict
+    of pk -> instance loaded with one IN query by the caller), the pk is looked
+    up there instead of running one query per value. The dict is authoritative:
+    a pk missing from it is reported as "does not exist". Without prefetched
+    objects the field behaves exactly like PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.queryset.model)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.queryset.model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return prefetched[pk]
+        except (KeyError, TypeError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+def prefetch_related_pks(serializer, items):
+    """
+    Resolves the pks that the PrefetchedPrimaryKeyRelatedFields of a serializer
+    (many=True included) reference in these input items, with one IN query per
+    related model, into context['prefetched']. Models already there (loaded by
+    the caller) are left alone. Values that are not valid pks are skipped: the
+    field reports them.
+    """
+    prefetched = serializer.context.setdefault('prefetched', {})
+    wanted = {} # model -> (queryset, pks)
+    for field in serializer.fields.values():
+        many = isinstance(field, serializers.ManyRelatedField)
+        relation = field.child_relation if many else field
+        if field.read_only or not isinstance(relation, PrefetchedPrimaryKeyRelatedField):
+            continue
+        queryset = relation.get_queryset()
+        if queryset.model in prefetched:
+            continue
+        pks = wanted.setdefault(queryset.model, (queryset, set()))[1]
+        for item in items:
+            value = field.get_value(item)
+            if value is empty or value is None:
+                continue
+            for data in (value if many and isinstance(value, (list, tuple)) else [value]):
+                try:
+                    if relation.pk_field is not None:
+                        data = relation.pk_field.to_internal_value(data)
+                    pks.add(queryset.model._meta.pk.to_python(data))
+                except (DjangoValidationError, serializers.ValidationError, TypeError):
+                    continue
+    for model, (queryset, pks) in wanted.items():
+        prefetched[model] = queryset.in_bulk(pks) if pks else {}
+
+
+class BatchedRelatedFieldsMixin:
+    """
+    Serializer mixin validating its PrefetchedPrimaryKeyRelatedFields with one
+    query per related model instead of one per value (see prefetch_related_pks).
+    The resolved objects stay in context['prefetched'] for the view. Give the
+    serializer Meta.list_serializer_class = BatchedListSerializer so that
+    many=True resolves the values of all the items at once.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, Mapping):
+            prefetch_related_pks(self, [data])
+        return super().to_internal_value(data)
+
+
+class BatchedListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            prefetch_related_pks(self.child, [item for item in data if isinstance(item, Mapping)])
+        return super().to_internal_value(data)
@@ -0,0 +1,219 @@
+import codecs
+import csv
+import datetime
+import itertools
+import re
+
+from django.db import router, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from schools.access import get_access_context
+from schools.models import SchoolClass
+from sharding.shards import on_shard, shards_for_classes
+from users.models import CustomUser
+from .models import Student
+from .serializers import StudentSerializer
+from .signals import students_bulk_changed
+
+PARENT_SEPARATOR = re.compile(r'[;,|\s]+')
+
+
+def iter_csv_rows(upload):
+    """
+    Yields one dict per CSV line, reading the upload line by line.
+    The delimiter (',' or ';', as produced by French Excel) is taken from the header line.
+    """
+    lines = codecs.iterdecode(upload, 'utf-8-sig')
+    header = next(lines, '')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    yield from csv.DictReader(itertools.chain([header], lines), delimiter=delimiter)
+
+
+def iter_xlsx_rows(upload):
+    """Yields one dict per worksheet row using openpyxl's streaming (read-only) mode."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise serializers.ValidationError({'file': 'XLSX import requires the openpyxl package.'})
+    workbook = load_workbook(upload, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_upload_rows(upload):
+    name = (upload.name or '').lower()
+    if name.endswith('.xlsx'):
+        return iter_xlsx_rows(upload)
+    if name.endswith('.csv') or upload.content_type in ('text/csv', 'application/csv', 'text/plain'):
+        return iter_csv_rows(upload)
+    raise serializers.ValidationError({'file': 'Unsupported file type, expected a .csv or .xlsx file.'})
+
+
+def clean_cell(value):
+    """Normalises spreadsheet cells to what StudentSerializer expects; None means "absent"."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+class StudentImporter:
+    """
+    Validates and inserts uploaded student rows chunk by chunk.
+
+    For each chunk the referenced classes and parents are loaded with one IN
+    query each and handed to StudentSerializer through context['prefetched'],
+    students are written with a single bulk_create and their parents with a
+    single bulk insert into the Student.parents through table. Memory use is
+    bounded by the chunk size whatever the size of the file.
+
+    The 'parents' column holds parent ids and/or e-mails separated by ';', ',' or '|'.
+    """
+    chunk_size = 500
+    max_reported_errors = 1000
+
+    def __init__(self, request, chunk_size=None, progress=None):
+        self.request = request
+        self.access = get_access_context(request)
+        if chunk_size:
+            self.chunk_size = chunk_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.progress = progress
+
+    def run(self, rows):
+        # Row 1 is the header line, data rows start at 2 as in a spreadsheet
+        numbered = enumerate(rows, start=2)
+        while True:
+            chunk = list(itertools.islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if self.progress:
+                self.progress('%d rows imported, %d rejected' % (self.created, self.failed))
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def import_chunk(self, chunk):
+        rows = [(row_number, self.prepare_row(raw)) for row_number, raw in chunk]
+        context = {
+            'request': self.request,
+            'prefetched': self.prefetch(data for _, data in rows),
+        }
+        parent_emails = {
+            parent.email.lower(): parent.pk for parent in context['prefetched'][CustomUser].values()
+        }
+
+        valid = []
+        for row_number, data in rows:
+            unknown = self.resolve_parent_emails(data, parent_emails)
+            if unknown:
+                self.add_error(row_number, {'parents': ['Unknown parent e-mail "%s".' % email for email in unknown]})
+                continue
+            serializer = StudentSerializer(data=data, context=context)
+            if not serializer.is_valid():
+                self.add_error(row_number, serializer.errors)
+                continue
+            attrs = dict(serializer.validated_data)
+            parents = list(dict.fromkeys(attrs.pop('parents', []))) # Drop duplicated parents
+            if not self.access.can_manage_level(attrs['school_class'].level_id):
+                self.add_error(row_number, {'school_class': ['You can only add students to classes in your school(s).']})
+                continue
+            valid.append((Student(**attrs), parents))
+
+        if not valid:
+            return
+        # With sharding, each class's students go to the shard of its school (see sharding/shards.py)
+        shard_of_class = shards_for_classes({student.school_class_id for student, _ in valid})
+        groups = {}
+        for student, parents in valid:
+            groups.setdefault(shard_of_class.get(student.school_class_id), []).append((student, parents))
+        for alias, group in groups.items():
+            with on_shard(alias):
+                self.insert(group)
+
+    def insert(self, valid):
+        """Inserts (student, parents) pairs of one database with a bulk insert each."""
+        with transaction.atomic(using=router.db_for_write(Student)):
+            students = Student.objects.bulk_create([student for student, _ in valid])
+            Through = Student.parents.through
+            Through.objects.bulk_create([
+                Through(student_id=student.pk, customuser_id=parent.pk)
+                for student, (_, parents) in zip(students, valid)
+                for parent in parents
+            ])
+        self.created += len(students)
+        students_bulk_changed.send(
+            sender=Student,
+            student_ids=[student.pk for student in students],
+            class_ids={student.school_class_id for student in students},
+        )
+
+    def prepare_row(self, raw):
+        data = {}
+        for key, value in raw.items():
+            if key is None:
+                continue # Extra cells beyond the header
+            value = clean_cell(value)
+            if value is not None:
+                data[key.strip()] = value
+        if 'parents' in data:
+            data['parents'] = [token for token in PARENT_SEPARATOR.split(str(data['parents'])) if token]
+        return data
+
+    def prefetch(self, rows):
+        """Loads every class and parent referenced by the chunk with one query each."""
+        class_ids, parent_ids, parent_emails = set(), set(), set()
+        for data in rows:
+            class_id = str(data.get('school_class', ''))
+            if class_id.isdigit():
+                class_ids.add(int(class_id))
+            for token in data.get('parents', []):
+                if '@' in token:
+                    parent_emails.add(token.lower())
+                elif token.isdigit():
+                    parent_ids.add(int(token))
+        parents = CustomUser.objects.filter(role='parent').filter(Q(pk__in=parent_ids) | Q(email__in=parent_emails))
+        return {
+            SchoolClass: SchoolClass.objects.in_bulk(class_ids),
+            CustomUser: {parent.pk: parent for parent in parents},
+        }
+
+    def resolve_parent_emails(self, data, parent_emails):
+        """Replaces e-mail tokens by parent ids in place and returns the unknown ones."""
+        unknown = []
+        if 'parents' not in data:
+            return unknown
+        resolved = []
+        for token in data['parents']:
+            if '@' in token:
+                pk = parent_emails.get(token.lower())
+                if pk is None:
+                    unknown.append(token)
+                resolved.append(pk)
+            else:
+                resolved.append(token)
+        data['parents'] = resolved
+        return unknown
@@ -0,0 +1,59 @@
+"""Background jobs of the students app (see jobs/queue.py)."""
+import os
+
+from django.core.files.uploadedfile import UploadedFile
+
+from jobs.queue import job_request, job_storage, register
+from schools.access import get_access_context
+from sharding.shards import each_shard, iterate_shards
+from .exporters import export_stream, iter_student_rows
+from .importers import StudentImporter, iter_upload_rows
+from .search import search_students
+from .views import student_shards, visible_students
+
+
+@register('students.import', max_attempts=1) # Rows imported by a failed attempt would be imported twice
+def import_students(job):
+    """Imports the uploaded file stored at payload['file'] as POST /api/students/import/ does."""
+    request = job_request(job)
+    storage = job_storage()
+    try:
+        with storage.open(job.payload['file'], 'rb') as stored:
+            upload = UploadedFile(stored, name=job.payload['name'], content_type=job.payload.get('content_type'))
+            return StudentImporter(request, progress=job.report_progress).run(iter_upload_rows(upload))
+    finally:
+        storage.delete(job.payload['file'])
+
+
+@register('students.export')
+def export_students(job):
+    """Writes the export of GET /api/students/export/ (same query parameters) to a file, downloaded from the job."""
+    request = job_request(job)
+    params = request.query_params
+    query = params.get('search', '').strip()
+
+    def students():
+        queryset = visible_students(request)
+        if query:
+            queryset = search_students(queryset, query, get_access_context(request))
+        return queryset
+
+    # Once per shard with sharding
+    aliases = student_shards(request)
+    total = sum(students().count() for _ in each_shard(aliases))
+
+    def chunks():
+        done = 0
+        for chunk in iterate_shards(lambda: iter_student_rows(students()), aliases):
+            done += len(chunk)
+            job.report_progress('%d/%d students exported' % (done, total), done, total)
+            yield chunk
+
+    content, content_type, filename = export_stream(chunks(), params.get('output', 'csv'), params.get('compress'))
+    storage = job_storage()
+    path = 'exports/job-%d/%s' % (job.pk, filename)
+    os.makedirs(os.path.dirname(storage.path(path)), exist_ok=True)
+    with open(storage.path(path), 'wb') as output: # Replaces the file of a failed attempt
+        for part in content:
+            output.write(part if isinstance(part, bytes) else part.encode('utf-8'))
+    return {'file': path, 'content_type': content_type, 'students': total, 'bytes': storage.size(path)}
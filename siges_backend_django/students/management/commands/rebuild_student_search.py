@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from students.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the student search index (students/search.py) from the database, e.g. after "
+        "writes that bypassed the signals or a restore."
+    )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start = time.perf_counter()
+        indexed = backend.rebuild()
+        self.stdout.write('%s: %d students indexed in %.2fs' % (
+            type(backend).__name__, indexed, time.perf_counter() - start,
+        ))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_parent_children(apps, schema_editor):
+    # Same columns as students.children.ROW_SOURCES, with the historical models
+    Student = apps.get_model('students', 'Student')
+    ParentChild = apps.get_model('students', 'ParentChild')
+    sources = {
+        'parent_id': 'customuser_id', 'student_id': 'student_id',
+        'first_name': 'student__first_name', 'last_name': 'student__last_name',
+        'date_of_birth': 'student__date_of_birth', 'gender': 'student__gender',
+        'status': 'student__status', 'photo_url': 'student__photo_url',
+        'school_class_id': 'student__school_class_id', 'school_class_name': 'student__school_class__name',
+        'academic_year': 'student__school_class__academic_year',
+        'level_id': 'student__school_class__level_id', 'level_name': 'student__school_class__level__name',
+        'school_id': 'student__school_class__level__school_id',
+        'school_name': 'student__school_class__level__school__name',
+    }
+    rows = Student.parents.through.objects.values_list(*sources.values()).iterator(chunk_size=2000)
+    ParentChild.objects.bulk_create((ParentChild(**dict(zip(sources, values))) for values in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_student_student_class_name_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParentChild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('date_of_birth', models.DateField()),
+                ('gender', models.CharField(max_length=10)),
+                ('status', models.CharField(max_length=20)),
+                ('photo_url', models.URLField(blank=True, max_length=255, null=True)),
+                ('school_class_id', models.BigIntegerField()),
+                ('school_class_name', models.CharField(max_length=100)),
+                ('academic_year', models.CharField(max_length=9)),
+                ('level_id', models.BigIntegerField()),
+                ('level_name', models.CharField(max_length=100)),
+                ('school_id', models.BigIntegerField()),
+                ('school_name', models.CharField(max_length=255)),
+                ('parent', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parent', 'school_class_name', 'last_name', 'first_name'], name='parent_child_list_idx'), models.Index(fields=['school_id'], name='parent_child_school_idx')],
+                'constraints': [models.UniqueConstraint(fields=('parent', 'student'), name='parent_child_unique')],
+            },
+        ),
+        migrations.RunPython(fill_parent_children, migrations.RunPython.noop),
+    ]
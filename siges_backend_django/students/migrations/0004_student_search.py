@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+# Same table as students.search (FTS_TABLE, FTS_COLUMNS); 2- and 3-character prefix indexes serve short prefix queries
+CREATE_SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE student_search USING fts5("
+    "first_name, last_name, class_name, parents, scope, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def create_search_table(apps, schema_editor):
+    from students.search import fts5_available
+    if schema_editor.connection.vendor != 'sqlite' or not fts5_available():
+        return # Other databases use students.search.ContainsSearchBackend, which needs no table
+    schema_editor.execute(CREATE_SEARCH_TABLE)
+
+    Student = apps.get_model('students', 'Student')
+    parents, scope = defaultdict(list), defaultdict(list)
+    rows = Student.parents.through.objects.values_list('student_id', 'customuser_id', 'customuser__email', 'customuser__username')
+    for student_id, parent_id, email, username in rows.iterator(chunk_size=2000):
+        parents[student_id].extend((email, username))
+        scope[student_id].append('p%s' % parent_id)
+    rows = Student.objects.values_list('pk', 'first_name', 'last_name', 'school_class__name', 'school_class__level__school_id')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO student_search (rowid, first_name, last_name, class_name, parents, scope) VALUES (%s, %s, %s, %s, %s, %s)',
+            [
+                (pk, first_name, last_name, class_name, ' '.join(parents[pk]), ' '.join(['s%s' % school_id] + scope[pk]))
+                for pk, first_name, last_name, class_name, school_id in rows.iterator(chunk_size=2000)
+            ],
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS student_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_parentchild'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -37,9 +37,73 @@ class Student(models.Model):
 
     enrollment_date = models.DateField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    updated_at = models.DateTimeField(auto_now=True) # Delta sync (see sync/changes.py)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.school_class.name})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so signal handlers can tell what an update changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def get_loaded_value(self, attname):
+        """Value of the field as last read from the database (None for unsaved or deferred fields)."""
+        return getattr(self, '_loaded_values', {}).get(attname)
+
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            # Keyset pagination keys: per-class roster and the name ordering
+            models.Index(fields=['school_class', 'last_name', 'first_name', 'id'], name='student_class_name_idx'),
+            models.Index(fields=['last_name', 'first_name', 'id'], name='student_name_idx'),
+            models.Index(fields=['updated_at', 'id'], name='student_updated_idx'), # Delta sync key
+        ]
+
+
+class ParentChild(models.Model):
+    """
+    Denormalised read model of the parent portal: one row per (parent, student)
+    with the student's class, level and school names, so that /api/me/children/
+    is one indexed query. Rows are rebuilt by the receivers of students/signals.py
+    (see students/children.py); never write them directly.
+    """
+    parent = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    date_of_birth = models.DateField()
+    gender = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    photo_url = models.URLField(max_length=255, blank=True, null=True)
+
+    school_class_id = models.BigIntegerField()
+    school_class_name = models.CharField(max_length=100)
+    academic_year = models.CharField(max_length=9)
+    level_id = models.BigIntegerField()
+    level_name = models.CharField(max_length=100)
+    school_id = models.BigIntegerField()
+    school_name = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['parent', 'student'], name='parent_child_unique'),
+        ]
+        indexes = [
+            # Covers the per-parent lookup in the order the portal lists children
+            models.Index(fields=['parent', 'school_class_name', 'last_name', 'first_name'], name='parent_child_list_idx'),
+            models.Index(fields=['school_id'], name='parent_child_school_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.parent_id} -> {self.first_name} {self.last_name}"
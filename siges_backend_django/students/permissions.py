@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from schools.permissions import IsSuperAdminGroup 
+from schools.access import get_access_context
 
 class CanManageSchoolStudents(permissions.BasePermission):
     def has_permission(self, request, view): 
@@ -25,12 +26,12 @@ class CanManageSchoolStudents(permissions.BasePermission):
             return True
 
         if request.user.role == 'director':
-            # Check if the student's school_class's level's school is one directed by the user
-            return request.user.directed_schools.filter(levels__classes__students=obj).exists()
+            # Check if the student's school_class's level belongs to a school directed by the user
+            return get_access_context(request).can_manage_student(obj)
 
         if request.user.role == 'parent':
             if request.method in permissions.SAFE_METHODS: 
-                return obj.parents.filter(pk=request.user.pk).exists()
+                return get_access_context(request).can_view_student(obj)
             return False 
         
         return False
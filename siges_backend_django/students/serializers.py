@@ -2,16 +2,26 @@ from rest_framework import serializers
 from .models import Student
 from schools.models import SchoolClass # Required for PrimaryKeyRelatedField queryset
 from users.models import CustomUser # Required for PrimaryKeyRelatedField queryset for parents
+from .fields import BatchedListSerializer, BatchedRelatedFieldsMixin, PrefetchedPrimaryKeyRelatedField
+from schools.fieldsets import SparseFieldsetMixin
+from schools.serializers import SchoolClassSerializer
+from users.serializers import ParentSerializer
 # from schools.serializers import SchoolClassSerializer # For detailed class info (read-only)
 # from users.serializers import UserDetailSerializer # For detailed parent info (read-only)
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(BatchedRelatedFieldsMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     # school_class_details = SchoolClassSerializer(source='school_class', read_only=True)
     # parents_details = UserDetailSerializer(source='parents', many=True, read_only=True)
 
     # Explicitly define related fields for more control if needed, e.g., custom querysets for write ops
-    school_class = serializers.PrimaryKeyRelatedField(queryset=SchoolClass.objects.all())
-    parents = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.filter(role='parent'), many=True, required=False)
+    # Both resolve from context['prefetched']: loaded up front by a bulk caller (e.g. the CSV import),
+    # otherwise with one IN query per model for all the values (see students/fields.py)
+    # The level comes in the same query: views read the class's school from it
+    school_class = PrefetchedPrimaryKeyRelatedField(queryset=SchoolClass.objects.select_related('level'))
+    parents = PrefetchedPrimaryKeyRelatedField(queryset=CustomUser.objects.filter(role='parent'), many=True, required=False)
+
+    # ?expand= (see schools/fieldsets.py)
+    expandable_fields = {'school_class': SchoolClassSerializer, 'parents': ParentSerializer}
 
 
     class Meta:
@@ -23,9 +33,37 @@ class StudentSerializer(serializers.ModelSerializer):
             # 'school_class_details', 'parents_details' 
         ]
         read_only_fields = ['enrollment_date'] 
+        list_serializer_class = BatchedListSerializer
+
+    def create(self, validated_data):
+        parents = validated_data.pop('parents', [])
+        student = Student(**validated_data)
+        # The read models are built once, by the m2m_changed of the parents (see students/signals.py)
+        student._parents_pending = bool(parents)
+        student.save()
+        if parents:
+            student.parents.add(*parents) # A new student has no parents to diff against, unlike set()
+        student._parents_pending = False
+        # The response lists the parents just added: as if prefetched, instead of reading them back
+        added = CustomUser.objects.all()
+        added._result_cache, added._prefetch_done = list(parents), True
+        student._prefetched_objects_cache = {'parents': added}
+        return student
 
     # def validate_parents(self, value):
     #     for parent_user in value:
     #         if parent_user.role != 'parent': # Accessing .role might need the user object, not just ID
     #             raise serializers.ValidationError(f"User {parent_user} is not a parent.")
     #     return value
+
+
+class StudentBulkUpdateSerializer(serializers.Serializer):
+    """Input of POST /api/students/bulk/ (see students/bulk.py)."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    school_class = serializers.IntegerField(min_value=1, required=False)
+    status = serializers.ChoiceField(choices=Student.STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        if 'school_class' not in data and 'status' not in data:
+            raise serializers.ValidationError('Provide a target "school_class" and/or "status".')
+        return data
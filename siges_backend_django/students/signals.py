@@ -0,0 +1,177 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from schools.hierarchy import invalidate_school_trees
+from schools.models import Level, School, SchoolClass
+from sharding.shards import each_shard, on_shard, shard_for_class, shard_for_school
+from .children import invalidate_children, rebuild_children, rename_school, student_fields_changed
+from .models import ParentChild, Student
+from .search import get_search_backend, search_fields_changed
+
+# Sent by the set-based write paths (bulk import, bulk updates...) that bypass
+# the per-instance post_save/post_delete signals.
+# Arguments: student_ids (ids touched, if known) and class_ids (classes whose
+# roster changed, before and after the operation); paths moving students
+# between classes may add previous_classes ({student_id: former class_id}),
+# and paths that read the classes' schools class_schools ({class_id: school_id}).
+students_bulk_changed = Signal()
+
+
+def schools_of_classes(class_ids, class_schools=None):
+    if class_schools is not None and set(class_ids) <= set(class_schools):
+        return [class_schools[class_id] for class_id in class_ids]
+    return SchoolClass.objects.filter(pk__in=class_ids).values_list('level__school_id', flat=True)
+
+
+def loaded_class_schools(student):
+    """{class_id: school_id} of the student's class when it was read along with its level (e.g. by the serializer)."""
+    if Student.school_class.is_cached(student) and SchoolClass.level.is_cached(student.school_class):
+        return {student.school_class_id: student.school_class.level.school_id}
+    return None
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    class_ids = {instance.school_class_id, instance.get_loaded_value('school_class_id')}
+    invalidate_school_trees(schools_of_classes(class_ids - {None}, loaded_class_schools(instance)))
+
+
+@receiver(students_bulk_changed)
+def students_bulk_changed_trees(sender, class_ids=(), class_schools=None, **kwargs):
+    invalidate_school_trees(schools_of_classes(set(class_ids), class_schools))
+
+
+# ParentChild read model (see students/children.py)
+
+@receiver(post_save, sender=Student)
+def student_saved_children(sender, instance, created, raw=False, **kwargs):
+    # A new student has no parents yet: m2m_changed builds their rows
+    if not created and not raw and student_fields_changed(instance):
+        rebuild_children([instance.pk])
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleted_children(sender, instance, **kwargs):
+    # The rows go with the student (CASCADE); only the parents' caches need bumping
+    invalidate_children(ParentChild.objects.filter(student_id=instance.pk).values_list('parent_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def student_parents_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            # The parents of a student being created (see StudentSerializer.create) are its first
+            rebuild_children([instance.pk], created=getattr(instance, '_parents_pending', False))
+    elif action == 'pre_clear':
+        # parent.children.clear(): remember the children before the through rows go
+        instance._cleared_children = list(
+            ParentChild.objects.filter(parent_id=instance.pk).values_list('student_id', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        rebuild_children(pk_set)
+    elif action == 'post_clear':
+        rebuild_children(getattr(instance, '_cleared_children', []))
+
+
+@receiver(post_save, sender=SchoolClass)
+def school_class_saved_children(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        with on_shard(shard_for_class(instance.pk)):
+            rebuild_children(Student.objects.filter(school_class_id=instance.pk))
+
+
+@receiver(post_save, sender=Level)
+def level_saved_children(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        with on_shard(shard_for_school(instance.school_id)):
+            rebuild_children(Student.objects.filter(school_class__level_id=instance.pk))
+
+
+@receiver(post_save, sender=School)
+def school_saved_children(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        with on_shard(shard_for_school(instance.pk)):
+            rename_school(instance.pk, instance.name)
+
+
+@receiver(students_bulk_changed)
+def students_bulk_changed_children(sender, student_ids=None, class_ids=(), **kwargs):
+    if student_ids is not None:
+        rebuild_children(student_ids)
+    else:
+        rebuild_children(Student.objects.filter(school_class_id__in=set(class_ids)))
+
+
+# Search index (see students/search.py)
+
+@receiver(post_save, sender=Student)
+def student_saved_search(sender, instance, created, raw=False, **kwargs):
+    if created and getattr(instance, '_parents_pending', False):
+        return # Indexed with its parents by student_parents_changed_search
+    if not raw and (created or search_fields_changed(instance)):
+        get_search_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted_search(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def student_parents_changed_search(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            get_search_backend().index([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        get_search_backend().index(pk_set)
+    elif action == 'post_clear':
+        # Stashed by student_parents_changed on pre_clear
+        get_search_backend().index(getattr(instance, '_cleared_children', []))
+
+
+@receiver(post_save, sender=SchoolClass)
+def school_class_saved_search(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        with on_shard(shard_for_class(instance.pk)):
+            get_search_backend().index(Student.objects.filter(school_class_id=instance.pk))
+
+
+@receiver(post_save, sender=Level)
+def level_saved_search(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        with on_shard(shard_for_school(instance.school_id)):
+            get_search_backend().index(Student.objects.filter(school_class__level_id=instance.pk))
+
+
+@receiver(post_save, sender=get_user_model())
+def parent_saved_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Parents are indexed by email and username; last_login updates and the like skip the reindex
+    if created or raw or (update_fields is not None and not {'email', 'username'} & set(update_fields)):
+        return
+    for _ in each_shard():
+        get_search_backend().index(Student.objects.filter(parents=instance.pk))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def parent_deleting_search(sender, instance, **kwargs):
+    # The through rows go with the user without an m2m_changed: remember the children (per shard)
+    instance._search_children = {
+        alias: list(Student.parents.through.objects.filter(customuser_id=instance.pk).values_list('student_id', flat=True))
+        for alias in each_shard()
+    }
+
+
+@receiver(post_delete, sender=get_user_model())
+def parent_deleted_search(sender, instance, **kwargs):
+    children = getattr(instance, '_search_children', {})
+    for alias in each_shard():
+        get_search_backend().index(children.get(alias, []))
+
+
+@receiver(students_bulk_changed)
+def students_bulk_changed_search(sender, student_ids=None, class_ids=(), **kwargs):
+    if student_ids is not None:
+        get_search_backend().index(student_ids)
+    else:
+        get_search_backend().index(Student.objects.filter(school_class_id__in=set(class_ids)))
@@ -1,3 +1,446 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+
+from schools.models import Level, School, SchoolClass
+from siges_backend_django.query_budget import query_budget
+from siges_backend_django.testing import jwt_client
+from users.models import CustomUser
+from .models import ParentChild, Student
+from .signals import students_bulk_changed
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Admin list pages must run a constant number of queries whatever the number of rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(username='admin', email='admin@siges.ci', password='pass')
+        for index in range(30):
+            school = School.objects.create(name='School %d' % index, address='Abidjan')
+            level = Level.objects.create(name='CP1', school=school)
+            school_class = SchoolClass.objects.create(name='CP1 A', level=level, academic_year='2024-2025')
+            Student.objects.create(
+                first_name='Aya', last_name='Koné %d' % index, date_of_birth=datetime.date(2017, 5, 1),
+                gender='FEMALE', school_class=school_class,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_student_changelist(self):
+        with query_budget(8, 'student changelist'):
+            response = self.client.get('/admin/students/student/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_school_class_changelist(self):
+        with query_budget(8, 'class changelist'):
+            response = self.client.get('/admin/schools/schoolclass/')
+        self.assertEqual(response.status_code, 200)
+
+
+class StudentListPaginationTests(TestCase):
+    """GET /api/students/ is keyset paginated on the student_class_name_idx key (see schools/pagination.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        school = School.objects.create(name='Lycée Moderne', address='Abidjan')
+        level = Level.objects.create(name='6ème', school=school)
+        for name in ('6ème B', '6ème A'):
+            school_class = SchoolClass.objects.create(name=name, level=level, academic_year='2024-2025')
+            for index in range(4):
+                Student.objects.create(
+                    first_name='Aya', last_name='Koné %d' % (3 - index), date_of_birth=datetime.date(2013, 5, 1),
+                    gender='FEMALE', school_class=school_class,
+                )
+
+    def setUp(self):
+        self.client = jwt_client(self.admin)
+
+    def test_pages_follow_the_indexed_ordering(self):
+        expected = list(Student.objects.order_by('school_class_id', 'last_name', 'first_name', 'id').values_list('id', flat=True))
+        ids, url = [], '/api/students/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(self.client.get('/api/students/?page_size=3').data['next'])
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], expected[:3])
+
+    def test_page_size_is_capped(self):
+        with self.settings(KEYSET_PAGINATION_MAX_PAGE_SIZE=5):
+            response = self.client.get('/api/students/?page_size=100')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_ordering_is_served_by_the_index(self):
+        plan = Student.objects.order_by('school_class_id', 'last_name', 'first_name', 'id').explain()
+        self.assertIn('student_class_name_idx', plan)
+
+
+class StudentImportTests(TestCase):
+    """POST /api/students/import/ validates and inserts rows in chunks (see students/importers.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        school = School.objects.create(name='Mine', address='Abidjan', director=cls.director)
+        cls.school_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=school), academic_year='2024-2025')
+        other = School.objects.create(name='Other', address='Bouaké')
+        cls.other_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=other), academic_year='2024-2025')
+
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, lines, name='students.csv'):
+        return SimpleUploadedFile(name, '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+
+    def rows(self, count):
+        return ['first_name;last_name;date_of_birth;gender;school_class;parents'] + [
+            'Élodie %d;Koné;2016-03-0%d;FEMALE;%d;%d,%s' % (index, index % 9 + 1, self.school_class.pk, self.parent.pk, self.parent.email)
+            for index in range(count)
+        ]
+
+    def test_csv_import(self):
+        lines = self.rows(3) + [
+            'Bad;Row;notadate;FEMALE;%d;' % self.school_class.pk,
+            'Other;School;2016-01-01;MALE;%d;' % self.other_class.pk,
+            'Unknown;Parent;2016-01-01;MALE;%d;nobody@siges.ci' % self.school_class.pk,
+        ]
+        response = jwt_client(self.director).post('/api/students/import/', {'file': self.upload(lines)}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [5, 6, 7])
+        self.assertEqual(list(Student.objects.get(first_name='Élodie 1').parents.all()), [self.parent])
+
+    def test_xlsx_import(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['first_name', 'last_name', 'date_of_birth', 'gender', 'school_class', 'parents'])
+        sheet.append(['Awa', 'Traoré', datetime.datetime(2016, 1, 2), 'FEMALE', float(self.school_class.pk), self.parent.pk])
+        content = io.BytesIO()
+        workbook.save(content)
+        upload = SimpleUploadedFile('students.xlsx', content.getvalue())
+        response = jwt_client(self.director).post('/api/students/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 1, response.data)
+
+    def test_reads_per_chunk_are_constant(self):
+        client = jwt_client(self.director)
+        client.get('/api/students/') # Caches the token's auth version
+        with CaptureQueriesContext(connection) as small:
+            client.post('/api/students/import/', {'file': self.upload(self.rows(5))}, format='multipart')
+        with CaptureQueriesContext(connection) as large:
+            client.post('/api/students/import/', {'file': self.upload(self.rows(400))}, format='multipart')
+        self.assertEqual(Student.objects.count(), 405)
+        # Only the INSERTs grow, split into batches by the backend's limit on query parameters
+        selects = lambda queries: [query for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects(large)), len(selects(small)))
+
+    def test_parents_cannot_import(self):
+        response = jwt_client(self.parent).post('/api/students/import/', {'file': self.upload(self.rows(1))}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+
+class StudentExportTests(TestCase):
+    """GET /api/students/export/ streams the students the list would show (see students/exporters.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.schools = [School.objects.create(name='School %d' % index, address='Abidjan') for index in range(2)]
+        for school in cls.schools:
+            school_class = SchoolClass.objects.create(name='CP1 A', level=Level.objects.create(name='CP1', school=school), academic_year='2024-2025')
+            for index in range(3):
+                Student.objects.create(
+                    first_name='Aya', last_name='Koné %d' % index, date_of_birth=datetime.date(2017, 5, 1),
+                    gender='FEMALE', school_class=school_class,
+                )
+        Student.objects.first().parents.add(cls.parent)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_of_a_school(self):
+        response = jwt_client(self.admin).get('/api/students/export/', {'school_id': self.schools[0].pk})
+        lines = self.read(response).decode().strip().splitlines()
+        self.assertEqual(len(lines), 4) # Header and three students
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_gzipped_ndjson(self):
+        response = jwt_client(self.admin).get('/api/students/export/', {'output': 'ndjson', 'compress': 'gzip'})
+        rows = [json.loads(line) for line in gzip.decompress(self.read(response)).decode().splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(Student.objects.values_list('id', flat=True)))
+
+    def test_scoped_to_the_user(self):
+        lines = self.read(jwt_client(self.parent).get('/api/students/export/')).decode().strip().splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_unknown_format(self):
+        self.assertEqual(jwt_client(self.admin).get('/api/students/export/', {'output': 'xml'}).status_code, 400)
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class MyChildrenTests(TestCase):
+    """GET /api/me/children/ reads the ParentChild read model, kept up to date by students/children.py."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        school = School.objects.create(name='School', address='Abidjan', director=cls.director)
+        level = Level.objects.create(name='CP1', school=school)
+        cls.school_class = SchoolClass.objects.create(name='CP1 A', level=level, academic_year='2024-2025')
+        cls.child = Student.objects.create(
+            first_name='Aya', last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=cls.school_class,
+        )
+        cls.child.parents.add(cls.parent)
+        cls.other = Student.objects.create(
+            first_name='Awa', last_name='Traoré', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=cls.school_class,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.parent)
+
+    def get(self):
+        response = self.client.get('/api/me/children/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cold_and_cached_reads(self):
+        with query_budget(2, 'cold children read'):
+            response = self.get()
+        self.assertEqual([child['id'] for child in response.data], [self.child.pk])
+        with query_budget(0, 'cached children read'):
+            self.get()
+        self.assertEqual(self.client.get('/api/me/children/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_read_model_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.first_name = 'Zoé'
+            self.child.save()
+        self.assertEqual(self.get().data[0]['first_name'], 'Zoé')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.school_class.name = 'CP1 B'
+            self.school_class.save()
+        self.assertEqual(self.get().data[0]['school_class_name'], 'CP1 B')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parent.children.add(self.other)
+        self.assertEqual(len(self.get().data), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(len(self.get().data), 1)
+
+    def test_parents_only(self):
+        self.assertEqual(jwt_client(self.director).get('/api/me/children/').status_code, 403)
+
+
+class StudentSearchTests(TestCase):
+    """?search= on the student list, backed by the student_search FTS index (see students/search.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.school_class = SchoolClass.objects.create(
+            name='CM1 A', level=Level.objects.create(name='CM1', school=School.objects.create(name='Mine', address='Abidjan', director=cls.director)),
+            academic_year='2024-2025',
+        )
+        other_class = SchoolClass.objects.create(
+            name='CM1 A', level=Level.objects.create(name='CM1', school=School.objects.create(name='Other', address='Bouaké')),
+            academic_year='2024-2025',
+        )
+        cls.elodie = Student.objects.create(
+            first_name='Élodie', last_name='Kouamé', date_of_birth=datetime.date(2015, 1, 1), gender='FEMALE', school_class=cls.school_class,
+        )
+        cls.other = Student.objects.create(
+            first_name='Elodie', last_name='Bamba', date_of_birth=datetime.date(2015, 1, 1), gender='FEMALE', school_class=other_class,
+        )
+
+    def search(self, text, user=None):
+        response = jwt_client(user or self.admin).get('/api/students/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_accent_insensitive_prefixes(self):
+        self.assertEqual(self.search('elod kouame'), [self.elodie.pk])
+        self.assertEqual(self.search('ÉLO KOU'), [self.elodie.pk])
+        self.assertEqual(sorted(self.search('elodie')), sorted([self.elodie.pk, self.other.pk]))
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_scoped_to_the_user(self):
+        self.assertEqual(self.search('elodie', self.director), [self.elodie.pk])
+
+    def test_index_follows_changes(self):
+        self.elodie.first_name = 'Aïcha'
+        self.elodie.save()
+        self.assertEqual(self.search('aicha'), [self.elodie.pk])
+        self.assertEqual(self.search('elodie'), [self.other.pk])
+        parent = CustomUser.objects.create_user(username='mamie', email='grand.mere@siges.ci', password='pass', role='parent')
+        self.elodie.parents.add(parent)
+        self.assertEqual(self.search('grand mere'), [self.elodie.pk])
+        Student.objects.filter(pk=self.elodie.pk).update(last_name='Touré')
+        students_bulk_changed.send(sender=Student, student_ids=[self.elodie.pk], class_ids=[])
+        self.assertEqual(self.search('toure'), [self.elodie.pk])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM student_search')
+        self.assertEqual(self.search('elodie'), [])
+        call_command('rebuild_student_search', stdout=io.StringIO())
+        self.assertEqual(sorted(self.search('elodie')), sorted([self.elodie.pk, self.other.pk]))
+
+
+class StudentBulkUpdateTests(TestCase):
+    """POST /api/students/bulk/ moves or changes the status of many students with a constant number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        level = Level.objects.create(name='CP1', school=School.objects.create(name='School', address='Abidjan', director=cls.director))
+        cls.source, cls.target = [
+            SchoolClass.objects.create(name=name, level=level, academic_year='2024-2025') for name in ('CP1 A', 'CP1 B')
+        ]
+        cls.foreign_class = SchoolClass.objects.create(
+            name='CP1 A', level=Level.objects.create(name='CP1', school=School.objects.create(name='Other', address='Bouaké')),
+            academic_year='2024-2025',
+        )
+        cls.ids = [
+            Student.objects.create(
+                first_name='Élève %d' % index, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=cls.source,
+            ).pk
+            for index in range(50)
+        ]
+        cls.foreign_id = Student.objects.create(
+            first_name='Awa', last_name='Traoré', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=cls.foreign_class,
+        ).pk
+        cls.parent.children.add(*cls.ids)
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.director)
+        self.client.get('/api/students/') # Caches the token's auth version
+
+    def bulk(self, data, client=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return (client or self.client).post('/api/students/bulk/', data, format='json')
+
+    def test_queries_do_not_grow_with_the_students(self):
+        for data in ({'school_class': self.target.pk}, {'school_class': self.source.pk, 'status': 'INACTIVE'}):
+            counts = []
+            for ids in (self.ids[:2], self.ids):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.bulk({'ids': ids, **data})
+                self.assertEqual(response.status_code, 200, response.content)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], data)
+            self.bulk({'ids': self.ids, 'school_class': self.target.pk, 'status': 'ACTIVE'})
+        self.assertEqual(Student.objects.filter(school_class=self.target).count(), 50)
+        self.assertEqual(set(ParentChild.objects.filter(parent_id=self.parent.pk).values_list('school_class_id', flat=True)), {self.target.pk})
+
+    def test_status_change(self):
+        response = self.bulk({'ids': self.ids, 'status': 'TRANSFERRED_OUT'})
+        self.assertEqual(response.json(), {'updated': 50, 'moved': 0, 'status_changed': 50})
+        self.assertEqual(set(ParentChild.objects.values_list('status', flat=True)), {'TRANSFERRED_OUT'})
+
+    def test_rejections(self):
+        for data, status in (
+            ({'ids': self.ids, 'school_class': self.foreign_class.pk}, 403),
+            ({'ids': self.ids + [self.foreign_id], 'status': 'ACTIVE'}, 403),
+            ({'ids': self.ids + [999999], 'status': 'ACTIVE'}, 400),
+            ({'ids': self.ids, 'school_class': 999999}, 400),
+            ({'ids': self.ids}, 400),
+            ({'ids': self.ids, 'status': 'UNKNOWN'}, 400),
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.bulk(data).status_code, status)
+        self.assertEqual(self.bulk({'ids': self.ids, 'status': 'ACTIVE'}, jwt_client(self.parent)).status_code, 403)
+        self.assertFalse(Student.objects.exclude(school_class__in=[self.source, self.foreign_class]).exists())
+
+    def test_super_admin_across_schools(self):
+        response = self.bulk({'ids': self.ids + [self.foreign_id], 'school_class': self.foreign_class.pk, 'status': 'INACTIVE'}, jwt_client(self.admin))
+        self.assertEqual(response.json(), {'updated': 51, 'moved': 50, 'status_changed': 51})
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class StudentWriteBudgetTests(TestCase):
+    """Creating a student costs the same number of queries whatever its parents, and stays within the view's budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        level = Level.objects.create(name='CP1', school=School.objects.create(name='School', address='Abidjan', director=cls.director))
+        cls.school_class = SchoolClass.objects.create(name='CP1 A', level=level, academic_year='2024-2025')
+        # Enrolled first, so that every create below updates the same EnrollmentCount row
+        Student.objects.create(first_name='Awa', last_name='Traoré', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE', school_class=cls.school_class)
+        cls.parents = [
+            CustomUser.objects.create_user(username='parent%d' % index, email='parent%d@siges.ci' % index, password='pass', role='parent')
+            for index in range(8)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, parents, school_class=None):
+        client = jwt_client(self.director)
+        cache.clear() # Cold auth cache: the budget includes the token check
+        data = {
+            'first_name': 'Aya', 'last_name': 'Koné', 'date_of_birth': '2017-05-01', 'gender': 'FEMALE',
+            'school_class': (school_class or self.school_class).pk, 'parents': [parent.pk for parent in parents],
+        }
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/students/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(queries)
+
+    def test_create_does_not_grow_with_the_parents(self):
+        (one, one_count), (eight, eight_count) = self.create(self.parents[:1]), self.create(self.parents)
+        # The token, the class and the parents, the INSERT, the count delta, the M2M add (2),
+        # the ParentChild rows (2) and the search document (2 reads, DELETE, INSERT)
+        self.assertEqual((one_count, eight_count), (13, 13))
+        self.assertEqual(sorted(eight.data['parents']), sorted(parent.pk for parent in self.parents))
+        self.assertEqual(ParentChild.objects.filter(student_id=eight.data['id']).count(), 8)
+        hits = jwt_client(self.director).get('/api/students/', {'search': 'parent7@siges'}).data['results']
+        self.assertEqual([row['id'] for row in hits], [eight.data['id']])
+
+    def test_create_without_parents_is_indexed(self):
+        response, _ = self.create([])
+        hits = jwt_client(self.director).get('/api/students/', {'search': 'aya'}).data['results']
+        self.assertEqual([row['id'] for row in hits], [response.data['id']])
+
+    def test_first_student_of_a_class(self):
+        # The class's first student also inserts its EnrollmentCount row: the view's budget
+        school_class = SchoolClass.objects.create(name='CP1 B', level=self.school_class.level, academic_year='2024-2025')
+        self.assertEqual(self.create(self.parents[:1], school_class)[1], 17)
+
+    def test_bulk(self):
+        ids = [self.create(self.parents[:1])[0].data['id'] for _ in range(2)]
+        client = jwt_client(self.director)
+        cache.clear()
+        with query_budget(17, 'cold bulk status change'), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/students/bulk/', {'ids': ids, 'status': 'INACTIVE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        school_class = SchoolClass.objects.create(name='CP1 B', level=self.school_class.level, academic_year='2024-2025')
+        cache.clear()
+        with query_budget(18, 'cold bulk move'), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/students/bulk/', {'ids': ids, 'school_class': school_class.pk}, format='json')
+        self.assertEqual(response.json()['moved'], 2)
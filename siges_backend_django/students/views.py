@@ -1,86 +1,228 @@
-from rest_framework import viewsets, permissions, serializers
+from rest_framework import viewsets, permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from .models import Student
-from .serializers import StudentSerializer
+from .serializers import StudentBulkUpdateSerializer, StudentSerializer
 from .permissions import CanManageSchoolStudents
-from schools.models import SchoolClass 
+from .bulk import StudentBulkUpdate
+from .importers import StudentImporter, iter_upload_rows
+from .exporters import export_stream, iter_student_rows
+from .children import get_children, get_children_version
+from .search import search_students
+from schools.access import get_access_context
+from schools.fastread import FastReadViewMixin
+from schools.fieldsets import SparseFieldsetViewMixin
+from schools.pagination import KeysetPagination
+from schools.permissions import IsParent
+from sharding.shards import (
+    is_enabled as sharding_enabled, iterate_shards, on_shard, shard_for_class, shard_for_level, shard_for_school,
+    shard_for_student, shards, shards_for_schools,
+)
+from sharding.views import ShardedViewMixin
+from jobs.queue import enqueue, job_storage, query_params_payload
+from jobs.views import job_accepted, wants_background
+
+
+def visible_students(request):
+    """The students the request's user can read, filtered by ?school_id=/?level_id=/?class_id= for super admins."""
+    user = request.user
+    # Start with a base queryset that includes related data for efficiency
+    queryset = Student.objects.select_related('school_class__level__school').prefetch_related('parents').all()
+
+    if not hasattr(user, 'role'): 
+        return Student.objects.none()
 
-class StudentViewSet(viewsets.ModelViewSet):
+    if user.role == 'super_admin_group':
+        school_id = request.query_params.get('school_id')
+        class_id = request.query_params.get('class_id')
+        level_id = request.query_params.get('level_id')
+
+        if class_id:
+            queryset = queryset.filter(school_class_id=class_id)
+        elif level_id:
+            queryset = queryset.filter(school_class__level_id=level_id)
+        elif school_id:
+            queryset = queryset.filter(school_class__level__school_id=school_id)
+        return queryset.order_by('school_class_id', 'last_name', 'first_name') # The student_class_name_idx keyset key
+
+
+    elif user.role == 'director':
+        # Director sees students from all schools they direct
+        return queryset.filter(school_class__level_id__in=get_access_context(request).level_ids).order_by('school_class_id', 'last_name', 'first_name')
+
+
+    elif user.role == 'parent':
+        return queryset.filter(parents=user.pk).order_by('school_class__name', 'last_name', 'first_name')
+    
+    return Student.objects.none()
+
+
+def student_shards(request):
+    """The shards holding the students visible_students(request) can return (see sharding/shards.py)."""
+    if not sharding_enabled():
+        return []
+    params = request.query_params
+    role = getattr(request.user, 'role', None)
+    if role == 'super_admin_group':
+        for name, shard_for in (('class_id', shard_for_class), ('level_id', shard_for_level), ('school_id', shard_for_school)):
+            if params.get(name):
+                if not params[name].isdigit():
+                    break
+                return [shard_for(params[name]) or shards()[0]] # An unknown id matches nothing on any shard
+        return shards()
+    if role == 'director':
+        return shards_for_schools(get_access_context(request).school_ids) or shards()[:1]
+    return shards() # Parents: their children can be anywhere
+
+
+class StudentViewSet(ShardedViewMixin, FastReadViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = StudentSerializer
+    pagination_class = KeysetPagination
     permission_classes = [CanManageSchoolStudents] 
+    query_budget = {'list': 5, 'retrieve': 4, 'create': 17, 'bulk': 18} # Checked by QueryBudgetMiddleware, auth included (list: +1 for ?search=; create, bulk: read models refreshed)
+    read_from_replica = True # Safe methods only (see siges_backend_django/replicas.py)
+    fast_read = True # List pages rendered from values() (see schools/fastread.py)
 
     def get_queryset(self):
-        user = self.request.user
-        # Start with a base queryset that includes related data for efficiency
-        queryset = Student.objects.select_related('school_class__level__school').prefetch_related('parents').all()
-
-        if not hasattr(user, 'role'): 
-            return Student.objects.none()
-
-        if user.role == 'super_admin_group':
-            school_id = self.request.query_params.get('school_id')
-            class_id = self.request.query_params.get('class_id')
-            level_id = self.request.query_params.get('level_id')
-
-            if class_id:
-                queryset = queryset.filter(school_class_id=class_id)
-            elif level_id:
-                queryset = queryset.filter(school_class__level_id=level_id)
-            elif school_id:
-                queryset = queryset.filter(school_class__level__school_id=school_id)
-            return queryset.order_by('school_class__level__school__name', 'school_class__level__name', 'school_class__name', 'last_name', 'first_name')
-
-
-        elif user.role == 'director':
-            # Director sees students from all schools they direct
-            return queryset.filter(school_class__level__school__director=user).order_by('school_class__level__name', 'school_class__name', 'last_name', 'first_name')
-
-
-        elif user.role == 'parent':
-            return queryset.filter(parents=user).order_by('school_class__name', 'last_name', 'first_name')
-        
-        return Student.objects.none()
+        return visible_students(self.request)
+
+    def get_shards(self):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            # Student ids tell their shard; anything else is not found on the first one
+            return [(lookup.isdigit() and shard_for_student(lookup)) or shards()[0]]
+        return student_shards(self.request)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        query = self.request.query_params.get('search', '').strip()
+        if query and self.action in ('list', 'export'):
+            # Best matches first, within the caller's students (see students/search.py)
+            queryset = search_students(queryset, query, get_access_context(self.request))
+        return queryset
 
     def perform_create(self, serializer):
         user = self.request.user
-        school_class_id = self.request.data.get('school_class') # Get ID from request data
-
-        if not school_class_id:
-             raise serializers.ValidationError({"school_class": "SchoolClass ID must be provided."})
-
-        try:
-            s_class = SchoolClass.objects.select_related('level__school').get(pk=school_class_id)
-        except SchoolClass.DoesNotExist:
-            raise serializers.ValidationError({"school_class": "Invalid SchoolClass ID."})
+        # Resolved during validation, in one query with the parents' (see students/fields.py)
+        s_class = serializer.validated_data['school_class']
 
         if user.role == 'director':
-            if not user.directed_schools.filter(pk=s_class.level.school.pk).exists():
-                raise permissions.PermissionDenied("You can only add students to classes in your school(s).")
+            # From the token's schools: the class came with its level
+            if not get_access_context(self.request).can_manage_school(s_class.level.school_id):
+                raise PermissionDenied("You can only add students to classes in your school(s).")
+        elif user.role != 'super_admin_group':
+            raise PermissionDenied("You do not have permission to create students.")
+        with on_shard(shard_for_school(s_class.level.school_id)):
             serializer.save()
-        elif user.role == 'super_admin_group':
-             serializer.save() 
-        else:
-            raise permissions.PermissionDenied("You do not have permission to create students.")
 
     def perform_update(self, serializer):
         # Similar permission checks can be added for updates if school_class can be changed
         # For now, rely on has_object_permission for student instance,
         # but changing school_class might need explicit check like in perform_create.
         user = self.request.user
-        school_class_id = self.request.data.get('school_class') # Get ID from request data
+        s_class = serializer.validated_data.get('school_class') # Resolved during validation
         
         # If school_class is being changed, validate the new class
-        if school_class_id and school_class_id != serializer.instance.school_class_id:
-            try:
-                s_class = SchoolClass.objects.select_related('level__school').get(pk=school_class_id)
-            except SchoolClass.DoesNotExist:
-                raise serializers.ValidationError({"school_class": "Invalid new SchoolClass ID."})
-
+        if s_class is not None and s_class.pk != serializer.instance.school_class_id:
             if user.role == 'director':
-                 if not user.directed_schools.filter(pk=s_class.level.school.pk).exists():
-                    raise permissions.PermissionDenied("You can only move students to classes in your school(s).")
+                 if not get_access_context(self.request).can_manage_level(s_class.level_id):
+                    raise PermissionDenied("You can only move students to classes in your school(s).")
             elif user.role != 'super_admin_group': # If not director and not super_admin
-                raise permissions.PermissionDenied("You do not have permission to change student's class to this one.")
+                raise PermissionDenied("You do not have permission to change student's class to this one.")
+            if sharding_enabled() and shard_for_class(s_class.pk) != serializer.instance._state.db:
+                raise serializers.ValidationError({"school_class": "This class belongs to a school on another shard."})
         
         serializer.save()
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Moves students to another class and/or sets their status in one go:
+        {"ids": [...], "school_class": <id>, "status": "TRANSFERRED_OUT"}. Every student and
+        the class must belong to the caller's schools; returns the counts of what changed.
+        """
+        if request.user.role not in ('director', 'super_admin_group'):
+            raise PermissionDenied("You do not have permission to update students.")
+        serializer = StudentBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        alias = None
+        if sharding_enabled():
+            # One UPDATE means one shard: the students and the class must share theirs
+            aliases = {shard_for_student(pk) for pk in data['ids']}
+            if data.get('school_class') is not None:
+                aliases.add(shard_for_class(data['school_class']))
+            aliases.discard(None) # Unknown ids and classes are reported by the update
+            if len(aliases) > 1:
+                raise serializers.ValidationError({'ids': 'These students and class belong to schools on different shards.'})
+            alias = aliases.pop() if aliases else shards()[0]
+        with on_shard(alias):
+            report = StudentBulkUpdate(request, data['ids'], data.get('school_class'), data.get('status')).run()
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_students(self, request):
+        """
+        Enrols students in bulk from a CSV or XLSX upload ('file' field).
+        Columns are the StudentSerializer fields; invalid rows are skipped and reported by row number.
+        With ?background=true the file is imported by a job: 202 with the job, whose result is the report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise serializers.ValidationError({'file': 'A CSV or XLSX file must be uploaded.'})
+        if request.user.role not in ('director', 'super_admin_group'):
+            raise PermissionDenied("You do not have permission to import students.")
+
+        rows = iter_upload_rows(upload) # Rejects unsupported files before anything is stored
+        if wants_background(request):
+            stored = job_storage().save('imports/%s' % upload.name, upload)
+            job = enqueue('students.import', {
+                'file': stored, 'name': upload.name, 'content_type': upload.content_type,
+            }, user=request.user)
+            return job_accepted(request, job)
+        report = StudentImporter(request).run(rows)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Streams the students visible to the user (same role scoping, school_id/level_id/class_id
+        filters and ?search= as the list) as ?output=csv (default) or ?output=ndjson, gzip-compressed with ?compress=gzip.
+        With ?background=true the file is written by a job: 202 with the job, then GET /api/jobs/{id}/download/.
+        """
+        output, compress = request.query_params.get('output', 'csv'), request.query_params.get('compress')
+        if wants_background(request):
+            export_stream((), output, compress) # Validates the format before queueing
+            job = enqueue('students.export', {'query_params': query_params_payload(request)}, user=request.user)
+            return job_accepted(request, job)
+
+        content, content_type, filename = export_stream(iterate_shards(
+            lambda: iter_student_rows(self.filter_queryset(self.get_queryset())), self.get_shards(),
+        ), output, compress)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+
+class MyChildrenView(APIView):
+    """
+    The requesting parent's children with their class, level and school, from the
+    ParentChild read model: a cache hit or one indexed query (one per shard with
+    sharding), after the token's auth_version lookup. Supports If-None-Match.
+    """
+    permission_classes = [IsParent]
+    query_budget = 2 # Checked by QueryBudgetMiddleware, auth included (+1 per further shard with sharding)
+
+    def get(self, request):
+        version = get_children_version(request.user.pk)
+        etag = '"children-%s-%s"' % (request.user.pk, version)
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(get_children(request.user.pk, version), headers={'ETag': etag})
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import Tombstone
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'school_id', 'deleted', 'created_at')
+    list_filter = ('model', 'deleted')
+
+    def has_add_permission(self, request):
+        return False # Written by sync/signals.py
+
+    def has_change_permission(self, request, obj=None):
+        return False
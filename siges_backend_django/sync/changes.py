@@ -0,0 +1,195 @@
+"""
+Delta sync of the school data for offline-capable clients (GET /api/sync/).
+
+A client downloads everything once (no ?since=), then only what changed:
+each response carries the rows changed after the client's token, the
+objects that left its schools, and the token to send next time.
+
+- Schools, levels, classes and students carry updated_at (auto_now, and
+  set by the set-based writes). Each kind is a stream read in keyset order
+  (updated_at, id); the token holds one cursor per stream, so a batch
+  stopping in the middle of a stream resumes exactly where it stopped.
+- Deleted objects, and objects moved to another school, leave a Tombstone
+  scoped to their former school. A moved object still visible to the
+  caller is sent as a row instead.
+- Only rows older than SYNC_SETTLE_SECONDS are handed out, so a row saved
+  by a transaction that has not committed yet is not skipped by a
+  client's cursor. Set-based writes, which may run in long transactions,
+  touch their rows again after commit (sync/signals.py).
+- A token older than SYNC_TOMBSTONE_RETENTION_DAYS, or issued for another
+  set of schools (the director's schools changed), gets 410 Gone: the
+  client downloads everything again.
+
+Clients apply "deleted" before the rows of a response.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import exceptions, serializers, status
+
+from schools.access import get_access_context
+from schools.fastread import ValuesPlan
+from schools.models import Level, School, SchoolClass
+from schools.serializers import LevelSerializer, SchoolClassSerializer, SchoolSerializer
+from students.models import Student
+from students.serializers import StudentSerializer
+from .models import Tombstone
+
+# Stream name -> (model, serializer, lookup of the row's school, tombstone kind)
+SYNCED = {
+    'schools': (School, SchoolSerializer, 'pk', Tombstone.SCHOOL),
+    'levels': (Level, LevelSerializer, 'school_id', Tombstone.LEVEL),
+    'classes': (SchoolClass, SchoolClassSerializer, 'level__school_id', Tombstone.CLASS),
+    'students': (Student, StudentSerializer, 'school_class__level__school_id', Tombstone.STUDENT),
+}
+STREAM_OF_KIND = {kind: name for name, (_, _, _, kind) in SYNCED.items()}
+DELETED = 'deleted'
+# Cursor id of a stream read up to its timestamp inclusive
+MAX_ID = 2 ** 63 - 1
+TOKEN_VERSION = 1
+
+
+class SyncTokenExpired(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'This sync token has expired or no longer matches your schools: download everything again (no "since").'
+    default_code = 'sync_token_expired'
+
+
+def scope_fingerprint(school_ids):
+    if school_ids is None:
+        return '*'
+    return hashlib.sha256(','.join(map(str, sorted(school_ids))).encode()).hexdigest()[:16]
+
+
+def encode_token(cursors, scope):
+    payload = {
+        'v': TOKEN_VERSION,
+        's': scope,
+        'c': {name: None if cursor is None else [cursor[0].isoformat(), cursor[1]] for name, cursor in cursors.items()},
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Returns (cursors, scope) of a token; ValidationError when it is not one of ours."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if payload['v'] != TOKEN_VERSION or set(payload['c']) != set(SYNCED) | {DELETED}:
+            raise ValueError
+        cursors = {
+            name: None if cursor is None else (datetime.fromisoformat(cursor[0]), int(cursor[1]))
+            for name, cursor in payload['c'].items()
+        }
+        if cursors[DELETED] is None:
+            raise ValueError
+        return cursors, payload['s']
+    except (binascii.Error, ValueError, KeyError, TypeError, IndexError):
+        raise serializers.ValidationError({'since': 'Invalid sync token.'})
+
+
+def after(cursor, field):
+    """Rows strictly after the cursor in (field, id) order."""
+    if cursor is None:
+        return Q()
+    moment, last_id = cursor
+    return Q(**{field + '__gt': moment}) | Q(**{field: moment, 'id__gt': last_id})
+
+
+def visible(name, school_ids):
+    model, _, school_lookup, _ = SYNCED[name]
+    rows = model.objects.all()
+    if school_ids is not None:
+        rows = rows.filter(**{school_lookup + '__in': school_ids})
+    return rows
+
+
+class SyncBatch:
+    def __init__(self, request, since=None, limit=500):
+        access = get_access_context(request)
+        self.school_ids = None if access.is_super_admin else access.school_ids
+        self.scope = scope_fingerprint(self.school_ids)
+        self.limit = limit
+        now = timezone.now()
+        self.upper = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        if since:
+            self.cursors, scope = decode_token(since)
+            oldest = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            if scope != self.scope or self.cursors[DELETED][0] < oldest:
+                raise SyncTokenExpired()
+        else:
+            # A full download: what was deleted before it is not needed
+            self.cursors = {name: None for name in SYNCED}
+            self.cursors[DELETED] = (self.upper, MAX_ID)
+
+    def run(self):
+        data = {DELETED: {name: [] for name in SYNCED}}
+        data.update({name: [] for name in SYNCED})
+        remaining = self.limit
+        has_more = False
+        for name in [DELETED, *SYNCED]:
+            if remaining == 0:
+                has_more = True
+                break
+            rows, cursor, more = (self.deleted if name == DELETED else self.changed)(name, remaining)
+            self.cursors[name] = cursor
+            if name == DELETED:
+                for kind, object_id in rows:
+                    data[DELETED][STREAM_OF_KIND[kind]].append(object_id)
+            else:
+                data[name] = rows
+            remaining -= len(rows)
+            if more:
+                has_more = True
+                break
+        data['next'] = encode_token(self.cursors, self.scope)
+        data['has_more'] = has_more
+        return data
+
+    def page(self, queryset, field, name, remaining, columns):
+        """The next rows of a stream, its new cursor and whether rows remain."""
+        rows = list(
+            queryset.filter(after(self.cursors[name], field), **{field + '__lte': self.upper})
+            .order_by(field, 'id').values(*columns)[:remaining + 1]
+        )
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            return rows, (rows[-1][field], rows[-1]['id']), True
+        return rows, (self.upper, MAX_ID), False
+
+    def changed(self, name, remaining):
+        model, serializer_class, _, _ = SYNCED[name]
+        plan = ValuesPlan(serializer_class())
+        rows, cursor, more = self.page(
+            visible(name, self.school_ids).prefetch_related(None), 'updated_at', name, remaining,
+            [*plan.columns, 'updated_at'],
+        )
+        return plan.render(rows), cursor, more
+
+    def deleted(self, name, remaining):
+        tombstones = Tombstone.objects.all()
+        if self.school_ids is None:
+            tombstones = tombstones.filter(deleted=True) # Super admins see every school: moves are plain updates
+        else:
+            tombstones = tombstones.filter(school_id__in=self.school_ids)
+        rows, cursor, more = self.page(
+            tombstones, 'created_at', name, remaining, ['id', 'created_at', 'model', 'object_id', 'deleted']
+        )
+        # Objects moved between two of the caller's schools are still theirs: sent as rows, not dropped
+        moved = {}
+        for row in rows:
+            if not row['deleted']:
+                moved.setdefault(row['model'], set()).add(row['object_id'])
+        kept = set()
+        for kind, object_ids in moved.items():
+            kept |= {(kind, pk) for pk in visible(STREAM_OF_KIND[kind], self.school_ids)
+                     .filter(pk__in=object_ids).values_list('pk', flat=True)}
+        dropped = list(dict.fromkeys(
+            (row['model'], row['object_id']) for row in rows if (row['model'], row['object_id']) not in kept
+        ))
+        return dropped, cursor, more
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sync.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the delta sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS. "
+        "Clients whose token is older than that download everything again."
+    )
+
+    def handle(self, *args, **options):
+        oldest = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = Tombstone.objects.filter(created_at__lt=oldest).delete()
+        self.stdout.write(self.style.SUCCESS('%d tombstone(s) pruned.' % deleted))
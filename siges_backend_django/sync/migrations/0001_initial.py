@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('school', 'École'), ('level', 'Niveau'), ('class', 'Classe'), ('student', 'Élève')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('school_id', models.BigIntegerField(null=True)),
+                ('deleted', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='tombstone_created_idx'), models.Index(fields=['school_id', 'created_at', 'id'], name='tombstone_school_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """
+    An object that left a school, for the delta sync (see sync/changes.py):
+    deleted, or moved to another school (deleted=False), in which case only
+    the clients of the former school drop it. Written by the receivers of
+    sync/signals.py and pruned after SYNC_TOMBSTONE_RETENTION_DAYS.
+    """
+    SCHOOL = 'school'
+    LEVEL = 'level'
+    CLASS = 'class'
+    STUDENT = 'student'
+    MODEL_CHOICES = [(SCHOOL, 'École'), (LEVEL, 'Niveau'), (CLASS, 'Classe'), (STUDENT, 'Élève')]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    school_id = models.BigIntegerField(null=True) # The school the object belonged to
+    deleted = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='tombstone_created_idx'), # Delta sync key
+            models.Index(fields=['school_id', 'created_at', 'id'], name='tombstone_school_idx'),
+        ]
+
+    def __str__(self):
+        return '%s #%s left school %s' % (self.model, self.object_id, self.school_id)
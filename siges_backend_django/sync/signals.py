@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from schools.models import Level, School, SchoolClass
+from sharding.shards import each_shard, on_shard, shard_for_school
+from students.models import ParentChild, Student
+from students.signals import students_bulk_changed
+from .models import Tombstone
+
+KINDS = {School: Tombstone.SCHOOL, Level: Tombstone.LEVEL, SchoolClass: Tombstone.CLASS, Student: Tombstone.STUDENT}
+
+
+def school_of(instance):
+    """The school an object belongs to, as stored in the database."""
+    if isinstance(instance, School):
+        return instance.pk
+    if isinstance(instance, Level):
+        return Level.objects.filter(pk=instance.pk).values_list('school_id', flat=True).first()
+    if isinstance(instance, SchoolClass):
+        return SchoolClass.objects.filter(pk=instance.pk).values_list('level__school_id', flat=True).first()
+    return SchoolClass.objects.filter(pk=instance.school_class_id).values_list('level__school_id', flat=True).first()
+
+
+def touch_students(students, using=None):
+    """Marks students as changed, for writes that leave their row alone (parents, moves of their class)."""
+    Student.objects.db_manager(using).filter(pk__in=students).update(updated_at=timezone.now())
+
+
+def left_school(kind, object_ids, school_id):
+    Tombstone.objects.bulk_create([
+        Tombstone(model=kind, object_id=object_id, school_id=school_id, deleted=False) for object_id in object_ids
+    ], batch_size=1000)
+
+
+# Connected per model: a delete receiver without a sender would make Django load every row
+# of the set-based deletes of all the other models (ParentChild, EnrollmentCount...) first
+
+@receiver(pre_delete, sender=School)
+@receiver(pre_delete, sender=Level)
+@receiver(pre_delete, sender=SchoolClass)
+@receiver(pre_delete, sender=Student)
+def object_deleting_sync(sender, instance, **kwargs):
+    instance._sync_school_id = school_of(instance)
+
+
+@receiver(post_delete, sender=School)
+@receiver(post_delete, sender=Level)
+@receiver(post_delete, sender=SchoolClass)
+@receiver(post_delete, sender=Student)
+def object_deleted_sync(sender, instance, **kwargs):
+    Tombstone.objects.create(model=KINDS[sender], object_id=instance.pk, school_id=getattr(instance, '_sync_school_id', None))
+
+
+@receiver(pre_save, sender=Level)
+@receiver(pre_save, sender=SchoolClass)
+def moving_sync(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._sync_school_id = school_of(instance)
+
+
+@receiver(post_save, sender=Level)
+@receiver(post_save, sender=SchoolClass)
+def moved_sync(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_sync_school_id', None)
+    if created or raw or previous is None:
+        return
+    current = school_of(instance)
+    if previous == current:
+        return
+    # The object and everything under it left the former school's clients
+    if sender is Level:
+        left_school(Tombstone.LEVEL, [instance.pk], previous)
+        class_ids = list(SchoolClass.objects.filter(level_id=instance.pk).values_list('pk', flat=True))
+        SchoolClass.objects.filter(pk__in=class_ids).update(updated_at=timezone.now())
+    else:
+        class_ids = [instance.pk]
+    left_school(Tombstone.CLASS, class_ids, previous)
+    with on_shard(shard_for_school(current)): # Moves between shards are refused (sharding/signals.py)
+        students = list(Student.objects.filter(school_class_id__in=class_ids).values_list('pk', flat=True))
+        left_school(Tombstone.STUDENT, students, previous)
+        touch_students(students)
+
+
+@receiver(pre_save, sender=Student)
+def student_saving_sync(sender, instance, raw=False, **kwargs):
+    # Saved without having been read: the former class comes from the row
+    if not raw and instance.pk is not None and 'school_class_id' not in getattr(instance, '_loaded_values', {}):
+        instance._loaded_values = {
+            **getattr(instance, '_loaded_values', {}),
+            **(Student.objects.filter(pk=instance.pk).values('school_class_id').first() or {}),
+        }
+
+
+@receiver(post_save, sender=Student)
+def student_saved_sync(sender, instance, created, raw=False, **kwargs):
+    previous = instance.get_loaded_value('school_class_id')
+    if created or raw or previous is None or previous == instance.school_class_id:
+        return
+    schools = dict(SchoolClass.objects.filter(pk__in=[previous, instance.school_class_id]).values_list('pk', 'level__school_id'))
+    if schools.get(previous) != schools.get(instance.school_class_id):
+        left_school(Tombstone.STUDENT, [instance.pk], schools.get(previous))
+
+
+@receiver(students_bulk_changed)
+def students_bulk_changed_sync(sender, student_ids=None, class_ids=(), previous_classes=None, class_schools=None, **kwargs):
+    if previous_classes:
+        current = dict(Student.objects.filter(pk__in=previous_classes).values_list('pk', 'school_class_id'))
+        involved = set(previous_classes.values()) | set(current.values())
+        if class_schools is not None and involved <= set(class_schools):
+            schools = class_schools
+        else:
+            schools = dict(SchoolClass.objects.filter(pk__in=involved).values_list('pk', 'level__school_id'))
+        moved = {}
+        for student_id, previous in previous_classes.items():
+            if student_id in current and schools.get(previous) != schools.get(current[student_id]):
+                moved.setdefault(schools.get(previous), []).append(student_id)
+        for school_id, students in moved.items():
+            left_school(Tombstone.STUDENT, students, school_id)
+    # The write stamped updated_at inside its transaction: stamp it again once visible, so that a
+    # transaction outlasting SYNC_SETTLE_SECONDS does not slip behind the clients' cursors
+    if student_ids is not None:
+        students = list(student_ids)
+    else:
+        students = list(Student.objects.filter(school_class_id__in=set(class_ids)).values_list('pk', flat=True))
+    if students:
+        using = router.db_for_write(Student)
+        transaction.on_commit(lambda: touch_students(students, using), using=using)
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def student_parents_changed_sync(sender, instance, action, reverse, pk_set, **kwargs):
+    # The parents are part of the student's payload
+    if not reverse:
+        # A student created with its parents was stamped by its INSERT
+        if action in ('post_add', 'post_remove', 'post_clear') and not getattr(instance, '_parents_pending', False):
+            touch_students([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        touch_students(pk_set)
+    elif action == 'post_clear':
+        touch_students(getattr(instance, '_cleared_children', []))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def user_deleting_sync(sender, instance, **kwargs):
+    # The through rows and School.director go without signals
+    for _ in each_shard():
+        touch_students(ParentChild.objects.filter(parent_id=instance.pk).values_list('student_id', flat=True))
+    School.objects.filter(director_id=instance.pk).update(updated_at=timezone.now())
@@ -0,0 +1,131 @@
+import base64
+import datetime
+import io
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from schools.models import Level, School, SchoolClass
+from siges_backend_django.testing import jwt_client
+from students.models import Student
+from users.models import CustomUser
+from .models import Tombstone
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0, QUERY_BUDGET_MODE='raise')
+class SyncTests(TestCase):
+    """GET /api/sync/ downloads a user's hierarchy, then what changed since a token (see sync/changes.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.parent = CustomUser.objects.create_user(username='parent', email='parent@siges.ci', password='pass', role='parent')
+        cls.directors, cls.schools = [], []
+        for index in range(2):
+            director = CustomUser.objects.create_user(
+                username='director%d' % index, email='director%d@siges.ci' % index, password='pass', role='director',
+            )
+            school = School.objects.create(name='School %d' % index, address='Abidjan', director=director)
+            for level_name in ('CP1', 'CP2'):
+                level = Level.objects.create(name=level_name, school=school)
+                for class_name in ('A', 'B'):
+                    school_class = SchoolClass.objects.create(name='%s %s' % (level_name, class_name), level=level, academic_year='2024-2025')
+                    for student in range(4):
+                        Student.objects.create(
+                            first_name='Élève %d' % student, last_name='Koné', date_of_birth=datetime.date(2017, 5, 1), gender='FEMALE',
+                            school_class=school_class,
+                        )
+            cls.directors.append(director)
+            cls.schools.append(school)
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.directors[0])
+
+    def sync(self, since=None, client=None, **params):
+        response = (client or self.client).get('/api/sync/', {**params, **({'since': since} if since else {})})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def download(self, client=None, limit=7):
+        """Everything, page by page as clients do, and the token to continue from."""
+        data = {'schools': [], 'levels': [], 'classes': [], 'students': []}
+        batch = {'next': None}
+        while True:
+            batch = self.sync(batch['next'], client, limit=limit)
+            for key in data:
+                data[key] += batch[key]
+            if not batch['has_more']:
+                return data, batch['next']
+
+    def students_of(self, school):
+        return Student.objects.filter(school_class__level__school=school)
+
+    def test_full_download(self):
+        data, token = self.download()
+        self.assertEqual(sorted(row['id'] for row in data['students']), sorted(self.students_of(self.schools[0]).values_list('pk', flat=True)))
+        self.assertEqual((len(data['schools']), len(data['levels']), len(data['classes'])), (1, 2, 4))
+        batch = self.sync(token)
+        self.assertEqual((batch['students'], batch['has_more']), ([], False))
+
+    def test_changes_and_deletions(self):
+        _, token = self.download()
+        changed, deleted, moved = self.students_of(self.schools[0])[:3]
+        changed.first_name = 'Changé'
+        changed.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+        moved.school_class = SchoolClass.objects.filter(level__school=self.schools[1]).first()
+        moved.save()
+        batch = self.sync(token)
+        self.assertEqual([row['id'] for row in batch['students']], [changed.pk])
+        self.assertEqual(sorted(batch['deleted']['students']), sorted([deleted_id, moved.pk]))
+
+        changed.parents.add(self.parent)
+        next_batch = self.sync(batch['next'])
+        self.assertEqual([row['id'] for row in next_batch['students']], [changed.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = jwt_client(self.admin).post('/api/students/bulk/', {'ids': [moved.pk], 'school_class': changed.school_class_id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in self.sync(next_batch['next'])['students']], [moved.pk])
+
+    def test_level_moved_to_another_school(self):
+        _, token = self.download()
+        level = Level.objects.filter(school=self.schools[0]).first()
+        students = Student.objects.filter(school_class__level=level).count()
+        level.school = self.schools[1]
+        level.name = 'CP1 bis'
+        level.save()
+        deleted = self.sync(token)['deleted']
+        self.assertEqual((len(deleted['students']), len(deleted['classes']), deleted['levels']), (students, 2, [level.pk]))
+
+    def test_invalid_and_expired_tokens(self):
+        _, token = self.download()
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'limit': '0'}).status_code, 400)
+        self.assertEqual(jwt_client(self.directors[1]).get('/api/sync/', {'since': token}).status_code, 410)
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        payload['c']['deleted'][0] = (timezone.now() - timedelta(days=100)).isoformat()
+        expired = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+        self.assertEqual(self.client.get('/api/sync/', {'since': expired}).status_code, 410)
+        self.assertEqual(jwt_client(self.parent).get('/api/sync/').status_code, 403)
+
+    def test_school_deletion_and_pruning(self):
+        client = jwt_client(self.admin)
+        _, token = self.download(client, limit=500)
+        school = School.objects.create(name='Closed', address='Bouaké')
+        Level.objects.create(name='CP1', school=school)
+        token = self.sync(token, client)['next']
+        school_id = school.pk
+        school.delete()
+        deleted = self.sync(token, client)['deleted']
+        self.assertEqual((deleted['schools'], len(deleted['levels'])), ([school_id], 1))
+
+        Tombstone.objects.update(created_at=timezone.now() - timedelta(days=100))
+        call_command('prune_sync_tombstones', stdout=io.StringIO())
+        self.assertFalse(Tombstone.objects.exists())
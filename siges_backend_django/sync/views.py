@@ -0,0 +1,36 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from schools.access import get_access_context
+from schools.permissions import CanManageSchoolContent
+from sharding.shards import shards, shards_for_schools
+from sharding.views import use_single_shard
+from .changes import SyncBatch
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline-capable clients (see sync/changes.py).
+    GET without ?since= starts a full download; then send the "next" token of
+    the previous response as ?since= to get what changed since. While
+    "has_more" is true, call again right away with the new token.
+    ?limit= caps the objects per response (default 500, at most 2000).
+    Directors get their schools, super admins the whole network.
+    With sharding, only for callers whose schools are on one shard (400 otherwise).
+    """
+    permission_classes = [CanManageSchoolContent]
+    query_budget = 12 # Checked by QueryBudgetMiddleware, auth included
+
+    def get(self, request):
+        limit = request.query_params.get('limit', str(DEFAULT_LIMIT))
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_LIMIT:
+            raise serializers.ValidationError({'limit': 'Expected a number between 1 and %d.' % MAX_LIMIT})
+        # With sharding, the student stream is read from the one shard of the caller's schools
+        access = get_access_context(request)
+        aliases = shards() if access.is_super_admin else shards_for_schools(access.school_ids) or shards()[:1]
+        with use_single_shard(aliases, 'Sync is not supported yet for schools on several shards.'):
+            return Response(SyncBatch(request, request.query_params.get('since'), int(limit)).run())
@@ -0,0 +1,19 @@
+"""Async current user (see siges_backend_django/asyncapi.py), the payload of UserDetailView."""
+from rest_framework.exceptions import NotFound
+
+from siges_backend_django.asyncapi import AsyncAPIView
+from .models import CustomUser
+from .serializers import UserDetailSerializer
+
+
+class AsyncUserDetailView(AsyncAPIView):
+    query_budget = 2 # A parent's children (AccessContext.aload()) and the user row (+1 per further shard with sharding)
+
+    async def get(self, request):
+        context = {'request': request}
+        queryset = UserDetailSerializer(context=context).project(CustomUser.objects.all())
+        try:
+            user = await queryset.aget(pk=request.user.pk)
+        except CustomUser.DoesNotExist:
+            raise NotFound('No CustomUser matches the given query.')
+        return UserDetailSerializer(user, context=context).data
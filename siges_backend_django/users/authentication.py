@@ -0,0 +1,79 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import AUTH_VERSION_CLAIM, aget_auth_version, get_auth_version
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the claims of a SchoolAccessToken.
+
+    Exposes what permission classes, views and AccessContext read (pk, role,
+    school_ids, is_staff); views needing the full CustomUser row load it
+    explicitly with CustomUser.objects.get(pk=request.user.pk).
+    """
+    is_active = True
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the user id claim as a string; CustomUser pks are integers
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+    @property
+    def school_ids(self):
+        """Ids of the schools the user directs, as of the token's auth_version."""
+        return frozenset(self.token.get('school_ids', ()))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the role and school claims of the token
+    instead of loading the user row: a request costs a cache lookup, and no
+    query unless the user's auth_version fell out of the cache.
+
+    Tokens without an auth_version claim (issued before SchoolAccessToken)
+    are authenticated the usual way, from the database.
+    """
+
+    def get_user(self, validated_token):
+        version = validated_token.get(AUTH_VERSION_CLAIM)
+        if version is None:
+            return super().get_user(validated_token)
+        return self.claims_user(validated_token, get_auth_version(self.claimed_user_id(validated_token)))
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views: the auth_version is read through the async cache and ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        version = validated_token.get(AUTH_VERSION_CLAIM)
+        if version is None:
+            return await sync_to_async(super().get_user)(validated_token)
+        return self.claims_user(validated_token, await aget_auth_version(self.claimed_user_id(validated_token)))
+
+    def claimed_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+    def claims_user(self, validated_token, current_version):
+        if current_version != validated_token[AUTH_VERSION_CLAIM]:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return ClaimsUser(validated_token)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import CustomUser
 from django.contrib.auth.password_validation import validate_password
+from schools.fieldsets import SparseFieldsetMixin
 # from django.core.exceptions import ValidationError # Not explicitly used, but good practice if custom validation needed it.
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -44,7 +45,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         )
         return user
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'date_joined', 'last_login')
+
+
+class ParentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """A student's parent as expanded in the student payload (?expand=parents): contact fields only."""
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'first_name', 'last_name', 'email')
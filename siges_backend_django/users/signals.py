@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from schools.models import School
+from schools.response_cache import invalidate_responses
+from .models import CustomUser
+from .tokens import invalidate_auth_versions
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    invalidate_auth_versions([instance.pk])
+
+
+@receiver(pre_save, sender=School)
+def remember_previous_director(sender, instance, raw=False, **kwargs):
+    # Reassigning a school changes the school_ids claim of both directors
+    if instance.pk and not raw:
+        instance._previous_director_id = School.objects.filter(pk=instance.pk).values_list('director_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=School)
+def school_director_changed(sender, instance, **kwargs):
+    invalidate_auth_versions({instance.director_id, getattr(instance, '_previous_director_id', None)})
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    if instance.pk and not raw and (update_fields is None or 'role' in update_fields):
+        instance._previous_role = CustomUser.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def user_role_changed(sender, instance, created=False, **kwargs):
+    # The cached responses a director could read are keyed by role, but the schools they direct change hands
+    previous_role = instance.__dict__.pop('_previous_role', instance.role)
+    if not created and previous_role != instance.role:
+        invalidate_responses(instance.directed_schools.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def remember_directed_schools(sender, instance, **kwargs):
+    instance._directed_school_ids = list(instance.directed_schools.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CustomUser)
+def director_deleted(sender, instance, **kwargs):
+    # School.director is set to NULL by an UPDATE that sends no School signal
+    if getattr(instance, '_directed_school_ids', None):
+        invalidate_responses(instance._directed_school_ids)
@@ -1,3 +1,81 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from schools.models import School
+from siges_backend_django.query_budget import query_budget
+from .models import CustomUser
+from .tokens import get_auth_version
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Requests are authorised from the token claims, revoked when the claims go stale (see users/tokens.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create_user(username='director', email='director@siges.ci', password='pass', role='director')
+        cls.successor = CustomUser.objects.create_user(username='successor', email='successor@siges.ci', password='pass', role='director')
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@siges.ci', password='pass', role='super_admin_group')
+        cls.school = School.objects.create(name='School', address='Abidjan', director=cls.director)
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, user):
+        response = APIClient().post('/api/token/', {'email': user.email, 'password': 'pass'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def bearer(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer %s' % access)
+        return client
+
+    def test_claims(self):
+        payload = AccessToken(self.login(self.director)['access']).payload
+        self.assertEqual(payload['role'], 'director')
+        self.assertEqual(payload['school_ids'], [self.school.pk])
+        self.assertIn('auth_version', payload)
+
+    def test_no_user_query_once_cached(self):
+        client = self.bearer(self.login(self.director)['access'])
+        self.assertEqual(client.get('/api/schools/').status_code, 200)
+        with query_budget(0, 'cached auth and cached response'):
+            self.assertEqual(client.get('/api/schools/').status_code, 200)
+        with query_budget(1, 'class list of a director'): # The director's levels, no user row
+            self.assertEqual(client.get('/api/classes/').status_code, 200)
+
+    def test_cold_cache_costs_one_query(self):
+        with self.assertNumQueries(1):
+            version = get_auth_version(self.director.pk)
+        self.assertEqual(version, AccessToken(self.login(self.director)['access']).payload['auth_version'])
+
+    def test_school_change_revokes_and_refresh_reissues(self):
+        tokens = self.login(self.director)
+        client = self.bearer(tokens['access'])
+        self.assertEqual(client.get('/api/schools/').status_code, 200)
+        self.school.director = self.successor
+        self.school.save()
+        self.assertEqual(client.get('/api/schools/').status_code, 401)
+
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access']).payload['school_ids'], [])
+        self.assertEqual(self.bearer(response.data['access']).get('/api/schools/').status_code, 200)
+
+    def test_deactivation_and_role_change_revoke(self):
+        tokens = self.login(self.admin)
+        client = self.bearer(tokens['access'])
+        self.assertEqual(client.get('/api/students/').status_code, 200)
+        self.admin.role = 'parent'
+        self.admin.save()
+        self.assertEqual(client.get('/api/students/').status_code, 401)
+
+        self.admin.is_active = False
+        self.admin.save()
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_without_claims_still_work(self):
+        self.assertEqual(self.bearer(AccessToken.for_user(self.admin)).get('/api/schools/').status_code, 200)
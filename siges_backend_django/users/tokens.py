@@ -0,0 +1,127 @@
+"""
+JWTs carrying the claims needed to authorise a request without loading the user.
+
+Access and refresh tokens embed the user's role, the ids of the schools they
+direct and an `auth_version` fingerprint of everything those claims depend on
+(is_active, role, directed schools, password hash). StatelessJWTAuthentication
+compares the fingerprint with the current one, kept in the cache, so a
+deactivation, a role change, a new school or a password change revokes the
+tokens issued before it.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from schools.models import School
+
+AUTH_VERSION_CLAIM = 'auth_version'
+
+
+def compute_auth_version(is_active, role, school_ids, password):
+    fingerprint = '%s:%s:%s:%s' % (is_active, role, ','.join(str(pk) for pk in sorted(school_ids)), password)
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def auth_version_key(user_id):
+    return 'user-auth:%s' % user_id
+
+
+def directed_school_ids(user_id):
+    return sorted(School.objects.filter(director_id=user_id).values_list('pk', flat=True))
+
+
+def auth_version_rows(user_id):
+    # LEFT JOIN on the directed schools: one round-trip gives the user's row and their schools
+    return get_user_model().objects.filter(pk=user_id).values_list('is_active', 'role', 'password', 'directed_schools__pk')
+
+
+def version_of_rows(rows):
+    """Fingerprint of the auth_version_rows() of a user ('' when the user is inactive or gone)."""
+    if not rows or not rows[0][0]:
+        return ''
+    _, role, password, _ = rows[0]
+    school_ids = [school_id for *_, school_id in rows if school_id is not None] if role == 'director' else []
+    return compute_auth_version(True, role, school_ids, password)
+
+
+def get_auth_version(user_id):
+    """
+    Current fingerprint of the user, or None when the user is inactive or gone.
+    Cached for settings.AUTH_VERSION_CACHE_TIMEOUT; one query on a miss.
+    """
+    key = auth_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = version_of_rows(list(auth_version_rows(user_id)))
+        cache.set(key, version, getattr(settings, 'AUTH_VERSION_CACHE_TIMEOUT', 300))
+    return version or None
+
+
+async def aget_auth_version(user_id):
+    """get_auth_version() for async views, through the async cache and ORM interfaces."""
+    key = auth_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = version_of_rows([row async for row in auth_version_rows(user_id)])
+        await cache.aset(key, version, getattr(settings, 'AUTH_VERSION_CACHE_TIMEOUT', 300))
+    return version or None
+
+
+def invalidate_auth_versions(user_ids):
+    cache.delete_many([auth_version_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def add_user_claims(token, user):
+    school_ids = directed_school_ids(user.pk) if user.role == 'director' else []
+    token['role'] = user.role
+    token['school_ids'] = school_ids
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[AUTH_VERSION_CLAIM] = compute_auth_version(user.is_active, user.role, school_ids, user.password)
+    return token
+
+
+class SchoolAccessToken(AccessToken):
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+class SchoolRefreshToken(RefreshToken):
+    access_token_class = SchoolAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+class SchoolTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = SchoolRefreshToken
+
+
+class SchoolTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Issues the new access token from the current state of the user rather than
+    copying the claims of the refresh token, so a refresh picks up role and
+    school changes instead of handing out a token that is already revoked.
+    """
+    token_class = SchoolRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(SchoolAccessToken.for_user(user))}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            data['refresh'] = str(self.token_class.for_user(user))
+        return data
@@ -12,4 +12,5 @@ class UserDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user is built from the token claims (see users/authentication.py)
+        return CustomUser.objects.get(pk=self.request.user.pk)